@@ -1,11 +1,16 @@
 # Functions
-from .main import camera2geo
+from .main import camera2geo, camera2geo_iter
+from .footprints import camera2geo_footprints
+from .elevation import warm_elevation_cache
 from .search import search_cameras, search_lenses
 from .metadata import apply_metadata, read_metadata
 from .prep import add_relative_altitude_to_csv
 
 __all__ = [
     "camera2geo",
+    "camera2geo_iter",
+    "camera2geo_footprints",
+    "warm_elevation_cache",
     "search_cameras",
     "search_lenses",
     "apply_metadata",
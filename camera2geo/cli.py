@@ -4,6 +4,9 @@ import inspect
 from importlib.metadata import version as get_version, PackageNotFoundError
 import sys
 
+# Short command names for functions in camera2geo.__all__
+_ALIASES = {"footprints": "camera2geo_footprints"}
+
 
 def _cli_version():
     try:
@@ -22,6 +25,9 @@ def _build_cli():
             func.__doc__ = inspect.getdoc(func) or "No description available."
             setattr(CLI, name, staticmethod(func))
 
+    for alias, name in _ALIASES.items():
+        setattr(CLI, alias, staticmethod(getattr(camera2geo, name)))
+
     return CLI
 
 
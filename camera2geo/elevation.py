@@ -0,0 +1,71 @@
+import numpy as np
+
+from .utils.elevation_cache import ElevationCache, resolve_elevation_cache
+from .utils.elevation_client import DEFAULT_ELEVATION_URL, ElevationClient
+
+# Points fetched per pass, so warming large areas keeps memory flat
+WARM_CHUNK_POINTS = 20_000
+
+
+def warm_elevation_cache(
+    bbox: list,
+    *,
+    elevation_url: str = DEFAULT_ELEVATION_URL,
+    elevation_cache: str | bool = True,
+    max_points: int = 1_000_000,
+) -> dict:
+    """
+    Fill the persistent elevation cache for a bounding box ahead of a flight, so later runs with elevation_data=True need no network for that area. Points already cached are not fetched again.
+
+    Args:
+        bbox (list, required): Area to fill as [min_lon, min_lat, max_lon, max_lat] in WGS84 degrees.
+        elevation_url: Open-Elevation compatible lookup endpoint to fill the cache from.
+        elevation_cache: If True, the default cache file under ~/.cache/camera2geo is filled; if a string, it is the cache file path.
+        max_points: Refuse boxes that need more grid points than this. The grid spacing is the cache cell size of 0.0001 degrees (about 11 m).
+
+    Returns:
+        dict: Number of grid points, cache hits and misses of this call, and the number of points in the cache.
+    """
+    cache_path = resolve_elevation_cache(elevation_cache)
+    if cache_path is None:
+        raise ValueError("elevation_cache must be True or a cache file path.")
+
+    min_lon, min_lat, max_lon, max_lat = (float(v) for v in bbox)
+    if min_lon > max_lon or min_lat > max_lat:
+        raise ValueError("bbox must be [min_lon, min_lat, max_lon, max_lat].")
+
+    cache = ElevationCache(cache_path)
+    client = ElevationClient(elevation_url, cache=cache)
+
+    # Grid of cache cells covering the box
+    scale = 10**client.precision
+    lats = _cells(min_lat, max_lat, scale)
+    lons = _cells(min_lon, max_lon, scale)
+    points = len(lats) * len(lons)
+    if points > max_points:
+        raise ValueError(
+            f"bbox needs {points} points, more than max_points={max_points}."
+        )
+
+    print(
+        f"Warm elevation cache {cache_path} with {points} points from {elevation_url}"
+    )
+    rows_per_pass = max(1, WARM_CHUNK_POINTS // len(lons))
+    try:
+        for start in range(0, len(lats), rows_per_pass):
+            grid_lats = lats[start : start + rows_per_pass]
+            client.prefetch(
+                zip(np.repeat(grid_lats, len(lons)), np.tile(lons, len(grid_lats)))
+            )
+            client.clear()
+        return {"points": points, **cache.stats()}
+    finally:
+        client.close()
+        cache.close()
+
+
+def _cells(low: float, high: float, scale: int) -> np.ndarray:
+    # Rounding first keeps bounds on a cell edge from gaining a float-error cell
+    start = np.floor(round(low * scale, 6))
+    stop = np.ceil(round(high * scale, 6))
+    return np.arange(start, stop + 1) / scale
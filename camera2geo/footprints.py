@@ -0,0 +1,124 @@
+import warnings
+
+from pathlib import Path
+from typing import List
+
+from .utils.elevation_cache import resolve_elevation_cache
+from .utils.elevation_client import DEFAULT_ELEVATION_URL
+from .utils.exif import read_metadata_chunks
+from .utils.io import _resolve_paths
+from .utils.metadata_cache import resolve_metadata_cache
+from .utils.sensors import DEFAULT_SENSOR_INFO_CSV, load_sensor_database
+from .utils.metadata import FlightTable, RunSettings, resolve_elevation_source
+from .utils.fov import compute_footprints
+from .utils.vector import write_features
+
+
+def camera2geo_footprints(
+    input_images: str | List[str],
+    output_path: str,
+    *,
+    sensor_width_mm: float | None = None,
+    sensor_height_mm: float | None = None,
+    correct_magnetic_declination: bool = False,
+    elevation_data: str | bool = False,
+    sensor_info_csv: str | List[str] = DEFAULT_SENSOR_INFO_CSV,
+    chunk_size: int = 100,
+    dsm_cache_mb: int = 256,
+    elevation_url: str = DEFAULT_ELEVATION_URL,
+    elevation_cache: str | bool = True,
+    metadata_cache: str | bool = True,
+    footprint_samples: int = 1,
+) -> str:
+    """
+    Compute image footprints from EXIF metadata only and write them to a single vector file. Pixels are never decoded, so this is suited to planning, QA and coverage checks over large image sets.
+
+    Args:
+        input_images (str | List[str], required): Defines input files from a glob path, folder, or list of paths. Specify like: "/input/files/*.JPG", "/input/folder" (assumes *.JPG), ["/input/one.JPG", "/input/two.JPG"].
+        output_path (str, required): Output vector file. The format is chosen by extension: ".gpkg" for GeoPackage, ".geojson" or ".json" for GeoJSON. Coordinates are WGS84 longitude, latitude.
+        sensor_width_mm: Sensor physical width in millimeters. If not provided, dimensions are inferred from the sensor info CSV.
+        sensor_height_mm: Sensor physical height in millimeters. If not provided, dimensions are inferred from the sensor info CSV.
+        correct_magnetic_declination: If True, adjust camera yaw using magnetic declination.
+        elevation_data: Controls elevation source. If False, no elevation is used; if True, an online elevation service is queried; if a string, it is interpreted as a local DSM path.
+        sensor_info_csv: CSV file containing known camera sensor dimensions with the following columns: DroneMake,DroneModel,CameraMake,SensorModel,RigCameraIndex,SensorWidth,SensorHeight,LensFOVw,LensFOVh. A list of CSVs is merged in order, later files replacing matching entries; databases saved with `SensorDatabase.save` (.pkl) are accepted too.
+        chunk_size: Number of images whose metadata is read from exiftool at a time.
+        dsm_cache_mb: Memory cap in megabytes for DSM blocks cached by each process when elevation_data is a DSM path.
+        elevation_url: Open-Elevation compatible lookup endpoint queried when elevation_data is True. Lookups are deduplicated and sent in bulk POST requests per chunk.
+        elevation_cache: Persistent cache of online elevations shared across runs. If True, the default cache file under ~/.cache/camera2geo is used; if a string, it is the cache file path; if False, every lookup goes to the network.
+        metadata_cache: Persistent cache of image metadata keyed by file path, size and modification time. If True, the default cache file under ~/.cache/camera2geo is used; if a string, it is the cache file path; if False, every image is read. Unchanged images in the cache need no exiftool.
+        footprint_samples: Points sampled along each image edge. Above 1, footprints are dense polygons whose edge rays are intersected with the DSM in one vectorized pass when elevation_data is a DSM path, so they follow the terrain instead of a flat plane.
+
+    Returns:
+        str: Path of the written vector file. Each polygon feature carries the image properties and a "photo" field with the image path.
+    """
+
+    print(f"Run camera2geo_footprints on {input_images} to {output_path}")
+
+    input_image_paths = _resolve_paths(
+        "search", input_images, kwargs={"default_file_pattern": "*.JPG"}
+    )
+
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be 1 or greater.")
+
+    if footprint_samples < 1:
+        raise ValueError("footprint_samples must be 1 or greater.")
+
+    # Footprints are always computed in WGS84
+    elevation_mode, dsm_path = resolve_elevation_source(elevation_data)
+    settings = RunSettings(
+        correct_magnetic_declination=correct_magnetic_declination,
+        elevation_mode=elevation_mode,
+        dsm_path=dsm_path,
+        dsm_cache_mb=dsm_cache_mb,
+        elevation_url=elevation_url,
+        elevation_cache=resolve_elevation_cache(elevation_cache),
+        footprint_samples=footprint_samples,
+    )
+
+    sensors = load_sensor_database(sensor_info_csv, sensor_width_mm, sensor_height_mm)
+
+    features = []
+    metadata = read_metadata_chunks(
+        input_image_paths,
+        chunk_size,
+        cache_path=resolve_metadata_cache(metadata_cache),
+    )
+    for start in range(0, len(input_image_paths), chunk_size):
+        paths = input_image_paths[start : start + chunk_size]
+        # Paths first, so zip never pulls metadata past the end of the chunk
+        table = FlightTable.from_metadata(
+            [exif for _, exif in zip(paths, metadata)], sensors, settings
+        )
+
+        images = []
+        for index, in_path in enumerate(paths):
+            try:
+                images.append((table.image(index), in_path))
+            except Exception as e:
+                _warn_failed(in_path, e)
+
+        # Corner rays and online elevations of the whole chunk in batches
+        footprints = compute_footprints([image for image, _ in images])
+
+        for (image, in_path), footprint in zip(images, footprints):
+            image.coord_array, image.footprint_coordinates = footprint
+            if not image.footprint_coordinates:
+                warnings.warn(f"No footprint computed for {in_path}", RuntimeWarning)
+                continue
+
+            # "photo" lets the QGIS click tool open the source image
+            features.append(
+                image.geojson_feature({**image.properties, "photo": str(in_path)})
+            )
+
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+    write_features(features, output_path, layer_name="footprints")
+    return output_path
+
+
+def _warn_failed(in_path: str, error: Exception):
+    warnings.warn(
+        f"Failed to compute footprint for {in_path}: {type(error).__name__}: {error}",
+        RuntimeWarning,
+    )
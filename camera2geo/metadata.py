@@ -5,15 +5,46 @@ import os
 
 from typing import Dict, Any, List
 
+from .utils.exif import read_metadata_chunks
 from .utils.io import _resolve_paths
-
-
-def read_metadata(input_images: str | List[str]):
+from .utils.metadata_cache import MetadataCache, resolve_metadata_cache
+
+# Parameters reported by read_metadata and the metadata fields contributing to each
+READ_METADATA_FIELDS = {
+    "file_name": ["File:FileName"],
+    "latitude": ["Composite:GPSLatitude", "EXIF:GPSLatitude"],
+    "longitude": ["Composite:GPSLongitude", "EXIF:GPSLongitude"],
+    "focal_length": ["EXIF:FocalLength"],
+    "focal_length35mm": ["EXIF:FocalLengthIn35mmFormat"],
+    "relative_altitude": ["XMP:RelativeAltitude", "Composite:GPSAltitude"],
+    "absolute_altitude": ["XMP:AbsoluteAltitude", "Composite:GPSAltitude"],
+    "gimbal_roll_degree": ["XMP:GimbalRollDegree", "MakerNotes:CameraRoll", "XMP:Roll"],
+    "gimbal_pitch_degree": [
+        "XMP:GimbalPitchDegree",
+        "MakerNotes:CameraPitch",
+        "XMP:Pitch",
+    ],
+    "gimbal_yaw_degree": ["XMP:GimbalYawDegree", "MakerNotes:CameraYaw", "XMP:Yaw"],
+    "flight_pitch_degree": ["XMP:FlightPitchDegree", "MakerNotes:Pitch"],
+    "flight_roll_degree": ["XMP:FlightRollDegree", "MakerNotes:Roll"],
+    "flight_yaw_degree": ["XMP:FlightYawDegree", "MakerNotes:Yaw"],
+    "image_width": ["EXIF:ImageWidth", "EXIF:ExifImageWidth"],
+    "image_height": ["EXIF:ImageHeight", "EXIF:ExifImageHeight"],
+    "max_aperture_value": ["EXIF:MaxApertureValue"],
+    "datetime_original": ["EXIF:DateTimeOriginal"],
+    "sensor_model_data": ["EXIF:Model"],
+    "sensor_index": ["XMP:RigCameraIndex", "XMP:SensorIndex"],
+    "sensor_make": ["EXIF:Make"],
+}
+
+
+def read_metadata(input_images: str | List[str], metadata_cache: str | bool = True):
     """
     Read metadata from one or more images and print the results as YAML and return values. Each parameter includes all metadata source fields that contribute to its value (primary + fallback).
 
     Args:
         input_images (str | List[str], required): Defines input files from a glob path, folder, or list of paths. Specify like: "/input/files/*.JPG", "/input/folder" (assumes *.JPG), ["/input/one.JPG", "/input/two.JPG"].
+        metadata_cache: Persistent cache of image metadata keyed by file path, size and modification time. If True, the default cache file under ~/.cache/camera2geo is used; if a string, it is the cache file path; if False, every image is read.
 
     Returns:
         dict: Mapping of image paths to grouped metadata key/value dictionaries.
@@ -26,67 +57,19 @@ def read_metadata(input_images: str | List[str]):
     )
 
     results = {}
-
-    with exiftool.ExifToolHelper() as et:
-
-        for image_path in input_image_paths:
-            md = et.get_metadata(image_path)[0]
-
-            def get_many(keys: List[str]):
-                return {k: md.get(k) for k in keys}
-
-            data = {
-                "file_name": get_many(["File:FileName"]),
-                "latitude": get_many(["Composite:GPSLatitude", "EXIF:GPSLatitude"]),
-                "longitude": get_many(["Composite:GPSLongitude", "EXIF:GPSLongitude"]),
-                "focal_length": get_many(["EXIF:FocalLength"]),
-                "focal_length35mm": get_many(["EXIF:FocalLengthIn35mmFormat"]),
-                "relative_altitude": get_many(
-                    ["XMP:RelativeAltitude", "Composite:GPSAltitude"]
-                ),
-                "absolute_altitude": get_many(
-                    ["XMP:AbsoluteAltitude", "Composite:GPSAltitude"]
-                ),
-                "gimbal_roll_degree": get_many(
-                    [
-                        "XMP:GimbalRollDegree",
-                        "MakerNotes:CameraRoll",
-                        "XMP:Roll",
-                    ]
-                ),
-                "gimbal_pitch_degree": get_many(
-                    [
-                        "XMP:GimbalPitchDegree",
-                        "MakerNotes:CameraPitch",
-                        "XMP:Pitch",
-                    ]
-                ),
-                "gimbal_yaw_degree": get_many(
-                    [
-                        "XMP:GimbalYawDegree",
-                        "MakerNotes:CameraYaw",
-                        "XMP:Yaw",
-                    ]
-                ),
-                "flight_pitch_degree": get_many(
-                    ["XMP:FlightPitchDegree", "MakerNotes:Pitch"]
-                ),
-                "flight_roll_degree": get_many(
-                    ["XMP:FlightRollDegree", "MakerNotes:Roll"]
-                ),
-                "flight_yaw_degree": get_many(
-                    ["XMP:FlightYawDegree", "MakerNotes:Yaw"]
-                ),
-                "image_width": get_many(["EXIF:ImageWidth", "EXIF:ExifImageWidth"]),
-                "image_height": get_many(["EXIF:ImageHeight", "EXIF:ExifImageHeight"]),
-                "max_aperture_value": get_many(["EXIF:MaxApertureValue"]),
-                "datetime_original": get_many(["EXIF:DateTimeOriginal"]),
-                "sensor_model_data": get_many(["EXIF:Model"]),
-                "sensor_index": get_many(["XMP:RigCameraIndex", "XMP:SensorIndex"]),
-                "sensor_make": get_many(["EXIF:Make"]),
-            }
-
-            results[str(image_path)] = data
+    tags = sorted({key for keys in READ_METADATA_FIELDS.values() for key in keys})
+    chunks = read_metadata_chunks(
+        input_image_paths,
+        tags=tags,
+        # Report MakerNotes fallbacks too, which only exiftool reads
+        fast_path=False,
+        cache_path=resolve_metadata_cache(metadata_cache),
+    )
+    for image_path, md in zip(input_image_paths, chunks):
+        results[str(image_path)] = {
+            name: {k: md.get(k) for k in keys}
+            for name, keys in READ_METADATA_FIELDS.items()
+        }
 
     print(yaml.dump(results, sort_keys=False))
     return results
@@ -98,6 +81,7 @@ def apply_metadata(
     output_images: str | List[str] | None = None,
     csv_metadata_path: str | None = None,
     csv_field_to_header: Dict[str, str] | None = None,
+    metadata_cache: str | bool = True,
 ):
     """
     Apply or remove metadata on one or more images. If `output_images` is not provided, edits are applied in-place; otherwise, input files are copied first.
@@ -108,6 +92,7 @@ def apply_metadata(
         output_images (str | List[str], optional): If not provided, input image metadata will be updated. If provided: defines output files from a template path, folder, or list of paths (with the same length as the input). Specify like: "/input/files/$.tif", "/input/folder" (assumes $_Meta.tif), ["/input/one.tif", "/input/two.tif"].
         csv_metadata_path (str | None): Optional CSV file containing per-image metadata rows. Must include a column with the basename (without the extension) of the image file (e.g., "image_0123").
         csv_field_to_header (Dict[str, str] | None): Mapping from metadata tag name to CSV column name. Required if `csv_metadata_path` is provided. Must include a "name":"<column_to_basename_of_image_to_match>" mapping. The same exif tag cannot be used in both `metadata` and `csv_metadata_path`. e.g. {"EXIF:FocalLength": "focal_length"}.
+        metadata_cache: Metadata cache whose entries of the modified images are dropped. If True, the default cache file under ~/.cache/camera2geo; if a string, the cache file path; if False, no cache is touched.
 
     Returns:
         list[str]: Paths of the modified images.
@@ -173,6 +158,13 @@ def apply_metadata(
                 if key:
                     csv_rows[key.lower()] = row
 
+    # Cached metadata of rewritten files must not outlive them, even when the
+    # file size and modification time happen to be unchanged
+    cache_path = resolve_metadata_cache(metadata_cache)
+    cache = None
+    if cache_path is not None and os.path.exists(cache_path):
+        cache = MetadataCache(cache_path)
+
     # Apply metadata
     matched_rows = 0
     with exiftool.ExifToolHelper() as et:
@@ -211,5 +203,10 @@ def apply_metadata(
                             csv_updates,
                             params=["-overwrite_original_in_place"],
                         )
+
+            if cache is not None:
+                cache.invalidate([out_path])
         print(f"Matched {matched_rows} images with CSV metadata")
+    if cache is not None:
+        cache.close()
     return output_image_paths
\ No newline at end of file
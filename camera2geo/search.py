@@ -1,6 +1,6 @@
-import lensfunpy
+from .utils.lens import lensfun_database
 
-db = lensfunpy.Database()
+db = lensfun_database()
 
 
 def search_cameras(
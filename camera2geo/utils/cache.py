@@ -0,0 +1,34 @@
+import os
+
+from pathlib import Path
+
+
+def default_cache_dir() -> Path:
+    """
+    Directory for camera2geo's persistent caches: $CAMERA2GEO_CACHE_DIR, else $XDG_CACHE_HOME/camera2geo, else ~/.cache/camera2geo.
+    """
+    if os.environ.get("CAMERA2GEO_CACHE_DIR"):
+        return Path(os.environ["CAMERA2GEO_CACHE_DIR"])
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "camera2geo"
+
+
+def resolve_cache_path(option: str | bool, file_name: str, name: str) -> str | None:
+    """
+    Map a user-facing cache option to a cache file path.
+
+    Args:
+        option (str | bool): False to disable the cache, True for `file_name` in the default cache directory, or a cache file path.
+        file_name (str): File name used for True.
+        name (str): Option name used in the error message.
+
+    Returns:
+        str | None: Path of the cache file, or None when disabled.
+    """
+    if option is False:
+        return None
+    if option is True:
+        return str(default_cache_dir() / file_name)
+    if isinstance(option, (str, os.PathLike)):
+        return str(option)
+    raise ValueError(f"{name} must be False, True, or a filesystem path string.")
@@ -0,0 +1,343 @@
+import threading
+import warnings
+import importlib.resources
+
+import numpy as np
+
+from collections import OrderedDict
+from datetime import date
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, List
+
+from magnetic_field_calculator import MagneticFieldCalculator
+
+from .cache import default_cache_dir
+
+# WMM models are valid for five years after their epoch
+MODEL_VALIDITY_YEARS = 5.0
+
+DECLINATION_CACHE_ENTRIES: int = 100_000
+
+# WGS84 ellipsoid and geomagnetic reference radius, in km
+WGS84_A = 6378.137
+WGS84_E2 = 1 / 298.257223563 * (2 - 1 / 298.257223563)
+GEOMAGNETIC_RADIUS = 6371.2
+
+
+def coefficient_dir() -> Path:
+    """
+    Directory searched for additional WMM coefficient files (e.g. WMM2015.COF from NOAA), which extend offline declinations to older imagery.
+    """
+    return default_cache_dir() / "wmm"
+
+
+class MagneticModel:
+    """
+    World Magnetic Model from one coefficient file in the NOAA WMM.COF format, evaluated for arrays of points at once.
+    """
+
+    def __init__(self, name: str, epoch: float, coefficients: np.ndarray):
+        """
+        Args:
+            name (str): Model name from the file header, such as "WMM-2025".
+            epoch (float): Decimal year the main field coefficients refer to.
+            coefficients (np.ndarray): Rows of (n, m, g, h, g_dot, h_dot).
+        """
+        self.name = name
+        self.epoch = float(epoch)
+        self.max_degree = int(coefficients[:, 0].max())
+        size = self.max_degree + 1
+        self.g, self.h, self.g_dot, self.h_dot = (
+            np.zeros((size, size)) for _ in range(4)
+        )
+        for n, m, g, h, g_dot, h_dot in coefficients:
+            n, m = int(n), int(m)
+            self.g[n, m], self.h[n, m] = g, h
+            self.g_dot[n, m], self.h_dot[n, m] = g_dot, h_dot
+
+    @classmethod
+    def from_file(cls, path) -> "MagneticModel":
+        """
+        Read a WMM.COF coefficient file.
+        """
+        lines = Path(path).read_text(encoding="utf-8").splitlines()
+        header = lines[0].split()
+        rows = []
+        for line in lines[1:]:
+            if line.startswith("9999"):
+                break
+            if line.strip():
+                rows.append([float(value) for value in line.split()[:6]])
+        return cls(header[1], float(header[0]), np.array(rows))
+
+    def covers(self, years: np.ndarray) -> np.ndarray:
+        """
+        Whether each decimal year lies in the model's validity period.
+        """
+        return (years >= self.epoch) & (years < self.epoch + MODEL_VALIDITY_YEARS)
+
+    def declination(self, lat, lon, alt_km, years) -> np.ndarray:
+        """
+        Magnetic declination in degrees, positive east.
+
+        Args:
+            lat, lon (array-like): Geodetic latitude and longitude in degrees.
+            alt_km (array-like): Height above the WGS84 ellipsoid in km.
+            years (array-like): Decimal years.
+
+        Returns:
+            np.ndarray: Declination per point.
+        """
+        lat, lon, alt_km, years = np.broadcast_arrays(
+            *(np.asarray(v, dtype=float) for v in (lat, lon, alt_km, years))
+        )
+        phi = np.radians(lat)
+        lam = np.radians(lon)
+        dt = years - self.epoch
+
+        # Geodetic to geocentric spherical coordinates
+        sin_phi = np.sin(phi)
+        rc = WGS84_A / np.sqrt(1 - WGS84_E2 * sin_phi**2)
+        p = (rc + alt_km) * np.cos(phi)
+        z = (rc * (1 - WGS84_E2) + alt_km) * sin_phi
+        r = np.hypot(p, z)
+        phi_c = np.arcsin(z / r)
+
+        # Schmidt semi-normalized Legendre functions of the colatitude and their derivatives
+        x = np.sin(phi_c)
+        s = np.maximum(np.cos(phi_c), 1e-10)
+        size = self.max_degree + 1
+        P = [[None] * size for _ in range(size)]
+        dP = [[None] * size for _ in range(size)]
+        P[0][0], dP[0][0] = np.ones_like(x), np.zeros_like(x)
+        for m in range(1, size):
+            k = 1.0 if m == 1 else np.sqrt((2 * m - 1) / (2 * m))
+            P[m][m] = k * s * P[m - 1][m - 1]
+            dP[m][m] = k * (x * P[m - 1][m - 1] + s * dP[m - 1][m - 1])
+        for m in range(size):
+            for n in range(m + 1, size):
+                a = (2 * n - 1) / np.sqrt(n * n - m * m)
+                b = (
+                    np.sqrt(((n - 1) ** 2 - m * m) / (n * n - m * m))
+                    if n > m + 1
+                    else 0.0
+                )
+                P[n][m] = a * x * P[n - 1][m]
+                dP[n][m] = a * (x * dP[n - 1][m] - s * P[n - 1][m])
+                if n > m + 1:
+                    P[n][m] = P[n][m] - b * P[n - 2][m]
+                    dP[n][m] = dP[n][m] - b * dP[n - 2][m]
+
+        north = np.zeros_like(x)
+        east = np.zeros_like(x)
+        down = np.zeros_like(x)
+        cos_m = [np.cos(m * lam) for m in range(size)]
+        sin_m = [np.sin(m * lam) for m in range(size)]
+        for n in range(1, size):
+            scale = (GEOMAGNETIC_RADIUS / r) ** (n + 2)
+            for m in range(n + 1):
+                g = self.g[n, m] + dt * self.g_dot[n, m]
+                h = self.h[n, m] + dt * self.h_dot[n, m]
+                cos_term = g * cos_m[m] + h * sin_m[m]
+                north += scale * cos_term * dP[n][m]
+                east += scale * m * (g * sin_m[m] - h * cos_m[m]) * P[n][m]
+                down -= scale * (n + 1) * cos_term * P[n][m]
+        east /= s
+
+        # Rotate the north component back to the geodetic frame
+        tilt = phi_c - phi
+        north = north * np.cos(tilt) - down * np.sin(tilt)
+        return np.degrees(np.arctan2(east, north))
+
+
+class DeclinationService:
+    """
+    Magnetic declinations for many images at once. Points are evaluated with offline WMM coefficients, one model instance per coefficient file, and results are memoized on a coarse grid of position, altitude and day, so a flight costs a handful of model evaluations. Dates outside every offline model fall back to the BGS web service, one request per grid cell.
+    """
+
+    def __init__(
+        self,
+        models: Iterable[MagneticModel],
+        grid_degrees: float = 0.01,
+        grid_km: float = 1.0,
+        max_entries: int = DECLINATION_CACHE_ENTRIES,
+        online: bool = True,
+    ):
+        """
+        Args:
+            models (Iterable[MagneticModel]): Offline models; for each date the newest model covering it is used.
+            grid_degrees (float): Latitude and longitude cell size of the memo; declination changes by well under 0.01° within a 0.01° cell outside polar regions.
+            grid_km (float): Altitude cell size of the memo.
+            max_entries (int): Maximum number of memoized cells, evicted least recently used first.
+            online (bool): If True, query the BGS web service for dates no offline model covers; otherwise those points are NaN.
+        """
+        self.models = sorted(models, key=lambda model: model.epoch)
+        self.grid_degrees = grid_degrees
+        self.grid_km = grid_km
+        self.max_entries = max_entries
+        self.online = online
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+        self._warned_online = False
+
+    def declinations(self, lat, lon, alt_m, dates) -> np.ndarray:
+        """
+        Magnetic declination in degrees for arrays of points.
+
+        Args:
+            lat, lon (array-like): Latitude and longitude in degrees.
+            alt_m (array-like): Altitude in meters.
+            dates (array-like): Capture dates as datetime64 values, dates or datetimes.
+
+        Returns:
+            np.ndarray: Declination per point, NaN where the date is missing or no source could provide a value.
+        """
+        days = np.asarray(dates, dtype="datetime64[D]")
+        lat, lon, alt_m, days = np.broadcast_arrays(
+            np.asarray(lat, dtype=float),
+            np.asarray(lon, dtype=float),
+            np.asarray(alt_m, dtype=float),
+            days,
+        )
+        valid = ~np.isnat(days) & np.isfinite(lat) & np.isfinite(lon)
+        alt_m = np.where(np.isfinite(alt_m), alt_m, 0.0)
+        result = np.full(lat.shape, np.nan)
+        if not valid.any():
+            return result
+
+        cells = np.stack(
+            [
+                np.round(lat[valid] / self.grid_degrees),
+                np.round(lon[valid] / self.grid_degrees),
+                np.round(alt_m[valid] / 1000 / self.grid_km),
+                days[valid].astype(np.int64),
+            ],
+            axis=1,
+        ).astype(np.int64)
+        unique, inverse = np.unique(cells, axis=0, return_inverse=True)
+        keys = [tuple(cell) for cell in unique.tolist()]
+
+        values = np.empty(len(keys))
+        missing = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                value = self._memo.get(key)
+                if value is None:
+                    missing.append(i)
+                else:
+                    self._memo.move_to_end(key)
+                    values[i] = value
+        if missing:
+            values[missing] = self._evaluate(unique[missing])
+            with self._lock:
+                for i in missing:
+                    # Failed online lookups are retried on the next call
+                    if not np.isnan(values[i]):
+                        self._memo[keys[i]] = values[i]
+                while len(self._memo) > self.max_entries:
+                    self._memo.popitem(last=False)
+
+        result[valid] = values[inverse.reshape(-1)]
+        return result
+
+    def declination(self, lat: float, lon: float, alt_m: float, when) -> float:
+        """
+        Magnetic declination in degrees for one point; see `declinations`.
+        """
+        return float(self.declinations([lat], [lon], [alt_m], [when])[0])
+
+    def _evaluate(self, cells: np.ndarray) -> np.ndarray:
+        # Cells are evaluated at their centre, so results do not depend on which image came first
+        lat = cells[:, 0] * self.grid_degrees
+        lon = cells[:, 1] * self.grid_degrees
+        alt_km = cells[:, 2] * self.grid_km
+        days = cells[:, 3].astype("datetime64[D]")
+        years = _decimal_years(days)
+
+        values = np.full(len(cells), np.nan)
+        pending = np.ones(len(cells), dtype=bool)
+        for model in reversed(self.models):
+            covered = pending & model.covers(years)
+            if covered.any():
+                values[covered] = model.declination(
+                    lat[covered], lon[covered], alt_km[covered], years[covered]
+                )
+                pending &= ~covered
+        if pending.any() and self.online:
+            self._warn_online()
+            for i in np.flatnonzero(pending):
+                values[i] = _online_declination(
+                    lat[i], lon[i], alt_km[i], days[i].item()
+                )
+        return values
+
+    def _warn_online(self):
+        if self._warned_online:
+            return
+        self._warned_online = True
+        covered = ", ".join(model.name for model in self.models) or "none"
+        warnings.warn(
+            f"Some capture dates are not covered by the offline magnetic models ({covered}); "
+            f"declinations are requested online. Add WMM coefficient files for those years to {coefficient_dir()} to work offline."
+        )
+
+
+@lru_cache(maxsize=1)
+def get_declination_service() -> DeclinationService:
+    """
+    Process-wide declination service using the WMM coefficients bundled with magnetismi plus any coefficient files in `coefficient_dir()`.
+    """
+    return DeclinationService(load_models())
+
+
+def load_models(paths: List[str] | None = None) -> List[MagneticModel]:
+    """
+    Load WMM coefficient files, by default the ones bundled with magnetismi and the *.COF files in `coefficient_dir()`. Files that cannot be read are skipped with a warning.
+    """
+    if paths is None:
+        bundled = importlib.resources.files("magnetismi") / "model"
+        paths = sorted(
+            str(path) for path in bundled.iterdir() if path.name.endswith(".txt")
+        )
+        if coefficient_dir().is_dir():
+            paths += sorted(
+                str(path)
+                for path in coefficient_dir().iterdir()
+                if path.suffix.lower() == ".cof"
+            )
+    models = {}
+    for path in paths:
+        try:
+            model = MagneticModel.from_file(path)
+        except Exception as e:
+            warnings.warn(f"Skipping magnetic model {path}: {e}")
+            continue
+        # Later files replace models with the same epoch
+        models[model.epoch] = model
+    return list(models.values())
+
+
+def _decimal_years(days: np.ndarray) -> np.ndarray:
+    year = days.astype("datetime64[Y]")
+    start = year.astype("datetime64[D]")
+    length = (year + 1).astype("datetime64[D]") - start
+    return (
+        year.astype(np.int64)
+        + 1970
+        + (days - start).astype(np.int64) / length.astype(np.int64)
+    )
+
+
+def _online_declination(lat: float, lon: float, alt_km: float, day: date) -> float:
+    try:
+        model = MagneticFieldCalculator().calculate(
+            latitude=float(lat),
+            longitude=float(lon),
+            altitude=float(alt_km),
+            date=day.isoformat(),
+        )
+        return float(model["field-value"]["declination"]["value"])
+    except Exception as e:
+        warnings.warn(f"Online declination lookup failed: {e}")
+        return np.nan
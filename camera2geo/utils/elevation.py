@@ -3,151 +3,261 @@
 #  __license__ = "AGPL"
 #  __version__ = "1.0"
 
-import json
+import os
+import threading
 import warnings
 
+import numpy as np
+
+from collections import OrderedDict
+from functools import lru_cache
 from rasterio import rasterio
-from rasterio.transform import rowcol
-from pyproj import Transformer
-from scipy.ndimage import map_coordinates
-from urllib.request import urlopen
-from urllib.error import HTTPError
-from time import sleep
+from rasterio.windows import Window
 
+from .elevation_client import get_elevation_client
+from .geospatial import get_transformer
 from .metadata import ImageClass
+from .timing import timed
 
-ATTEMPS_NUMBERS: int = 10
+DSM_CACHE_MB: int = 256
+DSM_BLOCK_SIZE: int = 512
 
 
-class ElevationAdjuster:
-    def __init__(self, elevation_data, crs, affine_transform, image: ImageClass):
-        self.elevation_data = elevation_data
-        self.crs = crs  # Store the CRS
-        self.affine_transform = affine_transform
-        self.image = image
+class DSMReader:
+    """
+    Read-only DSM handle that is opened once and serves every image of a run. Pixels are read in square blocks on demand and kept in an LRU cache bounded by `cache_mb`, so large survey DSMs are never loaded whole.
+    """
 
-    def terrain_adjustment(self, col, row):
-        try:
-            row_f, col_f = float(row), float(col)
-            interpolated_elevation = map_coordinates(
-                self.elevation_data, [[row_f], [col_f]], order=1, mode="nearest"
-            )[0]
-            return interpolated_elevation
-        except Exception as e:
-            warnings.warn(
-                f"Error calculating interpolated elevation: {e} for {self.image.file_name}. Switching to Default Altitudes."
+    def __init__(
+        self,
+        dsm_path: str,
+        cache_mb: int = DSM_CACHE_MB,
+        block_size: int = DSM_BLOCK_SIZE,
+    ):
+        self.path = dsm_path
+        self.block_size = block_size
+        self.cache_bytes = cache_mb * 1024 * 1024
+        self._src = rasterio.open(dsm_path)
+        self.crs = self._src.crs
+        self.transform = self._src.transform
+        self.nodata = self._src.nodata
+        self.height = self._src.height
+        self.width = self._src.width
+        self._blocks = OrderedDict()
+        self._cached_bytes = 0
+        # rasterio datasets must not be read from several threads at once
+        self._lock = threading.Lock()
+
+    def close(self):
+        with self._lock:
+            self._src.close()
+            self._blocks.clear()
+            self._cached_bytes = 0
+
+    def _block(self, block_row: int, block_col: int) -> np.ndarray:
+        key = (block_row, block_col)
+        with self._lock:
+            block = self._blocks.get(key)
+            if block is not None:
+                self._blocks.move_to_end(key)
+                return block
+
+            row_off = block_row * self.block_size
+            col_off = block_col * self.block_size
+            window = Window(
+                col_off,
+                row_off,
+                min(self.block_size, self.width - col_off),
+                min(self.block_size, self.height - row_off),
             )
-            return self.image.absolute_altitude
+            block = self._src.read(1, window=window).astype(np.float64)
+            if self.nodata is not None:
+                block[block == self.nodata] = np.nan
+
+            self._blocks[key] = block
+            self._cached_bytes += block.nbytes
+            # Keep at least the newest block even if it exceeds the cap
+            while self._cached_bytes > self.cache_bytes and len(self._blocks) > 1:
+                _, evicted = self._blocks.popitem(last=False)
+                self._cached_bytes -= evicted.nbytes
+            return block
+
+    def pixel_values(self, rows, cols) -> np.ndarray:
+        """
+        Values at integer pixel indices, read through the block cache. Indices must lie inside the raster.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+        values = np.empty(rows.shape, dtype=np.float64)
+        block_rows = rows // self.block_size
+        block_cols = cols // self.block_size
+        for block_row, block_col in set(zip(block_rows.tolist(), block_cols.tolist())):
+            in_block = (block_rows == block_row) & (block_cols == block_col)
+            block = self._block(block_row, block_col)
+            values[in_block] = block[
+                rows[in_block] - block_row * self.block_size,
+                cols[in_block] - block_col * self.block_size,
+            ]
+        return values
 
+    def sample_pixels(self, rows, cols) -> np.ndarray:
+        """
+        Bilinear interpolation at fractional pixel positions (pixel centers at integer indices), clamping to the nearest edge pixel like `map_coordinates(order=1, mode="nearest")`.
 
-def load_elevation_data_and_crs():
-    if ImageClass.dsm_path is None:
-        return None, None, None, None
+        Args:
+            rows (array-like): Fractional row positions.
+            cols (array-like): Fractional column positions.
 
-    with rasterio.open(ImageClass.dsm_path) as src:
-        elevation_data = src.read(1)
-        crs = src.crs
-        affine_transform = src.transform
+        Returns:
+            np.ndarray: Interpolated elevations; NaN where a contributing pixel is nodata.
+        """
+        rows = np.clip(np.asarray(rows, dtype=np.float64), 0, self.height - 1)
+        cols = np.clip(np.asarray(cols, dtype=np.float64), 0, self.width - 1)
+        row0 = np.floor(rows).astype(np.int64)
+        col0 = np.floor(cols).astype(np.int64)
+        row1 = np.minimum(row0 + 1, self.height - 1)
+        col1 = np.minimum(col0 + 1, self.width - 1)
+        dr = rows - row0
+        dc = cols - col0
 
-    return elevation_data, crs, affine_transform
+        top = (1 - dc) * self.pixel_values(row0, col0) + dc * self.pixel_values(
+            row0, col1
+        )
+        bottom = (1 - dc) * self.pixel_values(row1, col0) + dc * self.pixel_values(
+            row1, col1
+        )
+        return (1 - dr) * top + dr * bottom
 
+    def sample(self, xs, ys, crs=None) -> np.ndarray:
+        """
+        Bilinear elevations at an array of map coordinates.
 
-def translate_geo_to_utm(drone_longitude, drone_latitude, image: ImageClass):
-    elevation_data, crs, _, affine_transform = load_elevation_data_and_crs()
-    adjuster = ElevationAdjuster(elevation_data, crs, affine_transform, image)
+        Args:
+            xs (array-like): X coordinates (easting or longitude).
+            ys (array-like): Y coordinates (northing or latitude).
+            crs: CRS of the coordinates in any form accepted by `get_transformer`. Defaults to the DSM's CRS.
 
-    # Initialize transformer to convert from geographic coordinates to the CRS of the raster
-    transformer = Transformer.from_crs("EPSG:4326", adjuster.crs, always_xy=True)
+        Returns:
+            np.ndarray: Elevations; NaN outside the DSM or over nodata.
+        """
+        xs = np.atleast_1d(np.asarray(xs, dtype=np.float64))
+        ys = np.atleast_1d(np.asarray(ys, dtype=np.float64))
+        if crs is not None:
+            xs, ys = get_transformer(crs, self.crs).transform(xs, ys)
+            xs, ys = np.asarray(xs), np.asarray(ys)
 
-    # Transform drone coordinates
-    utm_x, utm_y = transformer.transform(drone_longitude, drone_latitude)
-    adjuster = ElevationAdjuster(elevation_data, crs, affine_transform, image)
-    return utm_x, utm_y, adjuster
+        # Fractional pixel positions with pixel centers at integer indices
+        cols, rows = ~self.transform * (xs, ys)
+        rows, cols = np.asarray(rows) - 0.5, np.asarray(cols) - 0.5
+        inside = (
+            (rows >= -0.5)
+            & (rows <= self.height - 0.5)
+            & (cols >= -0.5)
+            & (cols <= self.width - 0.5)
+        )
 
+        elevations = np.full(xs.shape, np.nan)
+        if inside.any():
+            elevations[inside] = self.sample_pixels(rows[inside], cols[inside])
+        return elevations
 
-def get_altitude_at_point(x, y, image: ImageClass):
-    elevation_data, _, _, affine_transform = load_elevation_data_and_crs()
-    row, col = rowcol(affine_transform, x, y)
-    if 0 <= row < elevation_data.shape[0] and 0 <= col < elevation_data.shape[1]:
-        elevation = elevation_data[row, col]
-        return image.absolute_altitude - elevation
 
-    warnings.warn(
-        f"Point ({x}, {y}) is outside the elevation data bounds for file {image.file_name}. Switching to default elevation."
+def get_dsm_reader(dsm_path: str, cache_mb: int = DSM_CACHE_MB) -> DSMReader:
+    """
+    Return the shared DSMReader of this process for `dsm_path`. A new reader is opened if the file has changed since it was first opened.
+    """
+    stat = os.stat(dsm_path)
+    return _open_dsm(
+        os.path.abspath(dsm_path), stat.st_mtime_ns, stat.st_size, cache_mb
     )
-    return None
 
 
-def get_altitude_from_open(lat: float, long: float, image: ImageClass) -> float:
+@lru_cache(maxsize=4)
+def _open_dsm(dsm_path: str, mtime_ns: int, size: int, cache_mb: int) -> DSMReader:
+    return DSMReader(dsm_path, cache_mb=cache_mb)
+
+
+@timed("elevation")
+def get_altitude_at_point(x, y, image: ImageClass, crs=None):
     """
-    Get GPS terrain altitude from open-elevation.com using input lat and long
-    Returns corrected altitude.
+    Height of the drone above the DSM surface at a point.
+
+    Args:
+        x (float): X coordinate of the point.
+        y (float): Y coordinate of the point.
+        image (ImageClass): Image providing the DSM path and absolute altitude.
+        crs: CRS of the coordinates. Defaults to the DSM's CRS.
+
+    Returns:
+        float | None: Absolute altitude minus the DSM elevation, or None outside the DSM.
     """
+    return get_altitudes_at_points([(x, y)], image, crs)[0]
 
-    nb_of_failed_connection = 0
-    while nb_of_failed_connection < ATTEMPS_NUMBERS:
-        try:
-            url = f"https://api.open-elevation.com/api/v1/lookup?locations={lat},{long}"
-            with urlopen(url) as response:
-                data = response.read().decode("utf-8")
-            elevation = json.loads(data)["results"][0]["elevation"]
-            print(
-                f"Successfull connection to OpenElevation for file{image.file_name} with coordinates {lat},{long}"
-            )
-            return image.absolute_altitude - elevation
-        except HTTPError as err:
+
+@timed("elevation")
+def get_altitudes_at_points(points, image: ImageClass, crs=None) -> list:
+    """
+    Height of the drone above the DSM surface at many points, sampled in one vectorized call.
+
+    Args:
+        points (list): (x, y) coordinates.
+        image (ImageClass): Image providing the DSM path and absolute altitude.
+        crs: CRS of the coordinates. Defaults to the DSM's CRS.
+
+    Returns:
+        list: Absolute altitude minus the DSM elevation per point, or None where the point is outside the DSM.
+    """
+    dsm = get_dsm_reader(image.settings.dsm_path, image.settings.dsm_cache_mb)
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    elevations = dsm.sample(points[:, 0], points[:, 1], crs)
+
+    altitudes = []
+    for (x, y), elevation in zip(points, elevations):
+        if np.isnan(elevation):
             warnings.warn(
-                f"Connexion error for OpenElevation file:{image.file_name} coordinates {lat},{long}. Error: {err}"
+                f"Point ({x}, {y}) is outside the elevation data bounds for file {image.file_name}. Switching to default elevation."
             )
-            nb_of_failed_connection += 1
-            # Sleep random time before next try
-            sleep(nb_of_failed_connection)
-    print(
-        f"Too many failures for file {image.file_name}. Switching to default elevation."
-    )
-    image.elevation_mode = "plane"
-    return None
+            altitudes.append(None)
+        else:
+            altitudes.append(image.absolute_altitude - float(elevation))
+    return altitudes
+
+
+@timed("elevation")
+def get_altitude_from_open(lat: float, long: float, image: ImageClass) -> float:
+    """
+    Get GPS terrain altitude from the online elevation service using input lat and long
+    Returns corrected altitude, or None if the service failed.
+    """
+    altitudes = get_altitudes_from_open([(lat, long)], image)
+    return altitudes[0] if altitudes else None
 
 
+@timed("elevation")
 def get_altitudes_from_open(
     latlon_tupples: list[tuple], image: ImageClass
 ) -> list[float]:
     """
-    Get GPS terrain altitude from open-elevation.com from a list of latlon tupples [(lat1,lon1),(lat2,lon2),...]
-    Returns list of corrected altitude.
+    Get GPS terrain altitude from the online elevation service from a list of latlon tupples [(lat1,lon1),(lat2,lon2),...]
+    Points already fetched, e.g. by `prefetch_open_elevations`, are answered from memory.
+    Returns list of corrected altitude, or None if the service failed for any point.
     """
-    url_coordinates = ""
-    nb_of_coordinates = 0
-    # Prepare url values
-    for coordinates in latlon_tupples:
-        url_coordinates += f"{coordinates[0]},{coordinates[1]}|"
-        nb_of_coordinates += 1
-    # remove last |
-    url_coordinates = url_coordinates.rstrip("|")
-
-    nb_of_failed_connection = 0
-    while nb_of_failed_connection < ATTEMPS_NUMBERS:
-        try:
-            url = f"https://api.open-elevation.com/api/v1/lookup?locations={url_coordinates}"
-            with urlopen(url) as response:
-                data = response.read().decode("utf-8")
-
-            print(
-                f"Successfull connection to OpenElevation for file {image.file_name} with coordinates {latlon_tupples}"
-            )
-            # Extract altitude corrections
-            alitude_list = []
-            for result in json.loads(data)["results"]:
-                alitude_list.append(image.absolute_altitude - result["elevation"])
-            return alitude_list
-        except HTTPError as err:
-            warnings.warn(
-                f"Unable to Connect to OpenElevation for file {image.file_name} with coordinates {latlon_tupples}. Error: {err}"
-            )
-            nb_of_failed_connection += 1
-            # Sleep random time before next try
-            sleep(nb_of_failed_connection)
+    client = get_elevation_client(
+        image.settings.elevation_url, image.settings.elevation_cache
+    )
+    elevations = client.lookup(latlon_tupples)
+    if None in elevations:
+        warnings.warn(
+            f"Unable to get elevations from {client.url} for file {image.file_name}. Switching to default elevation."
+        )
+        return None
+    return [image.absolute_altitude - elevation for elevation in elevations]
+
 
-    print(f"Too many failures for file {image.filez}. Switching to default elevation.")
-    image.elevation_mode = "plane"
-    return None
+def prefetch_open_elevations(
+    latlon_tupples: list[tuple], url: str, cache_path: str | None = None
+):
+    """
+    Fetch elevations of many points from the online elevation service in deduplicated bulk requests, so later per-image lookups are answered from memory.
+    """
+    get_elevation_client(url, cache_path).prefetch(latlon_tupples)
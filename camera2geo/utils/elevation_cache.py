@@ -0,0 +1,152 @@
+import time
+import sqlite3
+import threading
+
+from pathlib import Path
+
+from .cache import resolve_cache_path
+
+ELEVATION_CACHE_ENTRIES: int = 5_000_000
+
+
+def resolve_elevation_cache(elevation_cache: str | bool) -> str | None:
+    """
+    Map the user-facing `elevation_cache` option to a cache file path.
+
+    Args:
+        elevation_cache (str | bool): False to disable the cache, True for the default cache file, or a cache file path.
+
+    Returns:
+        str | None: Path of the SQLite cache file, or None when disabled.
+    """
+    return resolve_cache_path(elevation_cache, "elevation.sqlite", "elevation_cache")
+
+
+class ElevationCache:
+    """
+    SQLite store of elevations returned by online elevation services, shared by every run on the machine. Entries are keyed by service URL and quantized (lat, lon) cell and evicted least recently used first once `max_entries` is exceeded.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = ELEVATION_CACHE_ENTRIES,
+        precision: int = 4,
+    ):
+        """
+        Args:
+            path (str): SQLite file, created if missing.
+            max_entries (int): Maximum number of cached points.
+            precision (int): Decimal places of the (lat, lon) cells; must match the client's rounding.
+        """
+        self.path = str(path)
+        self.max_entries = max_entries
+        self.precision = precision
+        self.hits = 0
+        self.misses = 0
+
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        # One connection guarded by a lock; lookups come from client worker threads
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS elevations (
+                    source TEXT NOT NULL,
+                    lat INTEGER NOT NULL,
+                    lon INTEGER NOT NULL,
+                    elevation REAL NOT NULL,
+                    used REAL NOT NULL,
+                    PRIMARY KEY (source, lat, lon)
+                ) WITHOUT ROWID
+                """)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS elevations_used ON elevations (used)"
+            )
+            self._entries = self._count()
+
+    def get_many(self, source: str, keys: list) -> dict:
+        """
+        Cached elevations for (lat, lon) keys from `source`. Hits are marked as recently used.
+
+        Returns:
+            dict: Elevation per key found in the cache.
+        """
+        found = {}
+        cells = {self._cell(key): key for key in keys}
+        items = list(cells.items())
+        with self._lock:
+            # Stay below SQLite's bound parameter limit
+            for start in range(0, len(items), 300):
+                chunk = items[start : start + 300]
+                where = " OR ".join(["(lat = ? AND lon = ?)"] * len(chunk))
+                params = [source] + [v for cell, _ in chunk for v in cell]
+                rows = self._conn.execute(
+                    f"SELECT lat, lon, elevation FROM elevations WHERE source = ? AND ({where})",
+                    params,
+                ).fetchall()
+                for lat, lon, elevation in rows:
+                    found[cells[(lat, lon)]] = elevation
+
+            if found:
+                now = time.time()
+                with self._conn:
+                    self._conn.executemany(
+                        "UPDATE elevations SET used = ? WHERE source = ? AND lat = ? AND lon = ?",
+                        [(now, source, *self._cell(key)) for key in found],
+                    )
+            self.hits += len(found)
+            self.misses += len(cells) - len(found)
+        return found
+
+    def put_many(self, source: str, elevations: dict):
+        """
+        Store elevations of (lat, lon) keys from `source`, evicting the least recently used entries beyond `max_entries`. None values are not stored.
+        """
+        now = time.time()
+        rows = [
+            (source, *self._cell(key), float(elevation), now)
+            for key, elevation in elevations.items()
+            if elevation is not None
+        ]
+        if not rows:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO elevations (source, lat, lon, elevation, used) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            # Rows are only counted once the running estimate passes the cap
+            self._entries += len(rows)
+            if self._entries > self.max_entries:
+                self._entries = self._count()
+                excess = self._entries - self.max_entries
+                if excess > 0:
+                    self._conn.execute(
+                        "DELETE FROM elevations WHERE (source, lat, lon) IN "
+                        "(SELECT source, lat, lon FROM elevations ORDER BY used LIMIT ?)",
+                        (excess,),
+                    )
+                    self._entries -= excess
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._count()
+
+    def stats(self) -> dict:
+        """
+        Hit and miss counts of this process and the number of cached points.
+        """
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self)}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM elevations").fetchone()[0]
+
+    def _cell(self, key: tuple) -> tuple:
+        scale = 10**self.precision
+        return round(key[0] * scale), round(key[1] * scale)
@@ -0,0 +1,291 @@
+import json
+import random
+import sqlite3
+import threading
+import time
+import warnings
+import http.client
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+from .elevation_cache import ElevationCache
+
+DEFAULT_ELEVATION_URL = "https://api.open-elevation.com/api/v1/lookup"
+RETRY_STATUS = {408, 429, 500, 502, 503, 504}
+# Points kept in memory per client; older points are answered by the persistent cache
+ELEVATION_MEMO_ENTRIES: int = 1_000_000
+
+
+class ElevationServiceError(Exception):
+    def __init__(self, message: str, retry: bool):
+        super().__init__(message)
+        self.retry = retry
+
+
+class ElevationClient:
+    """
+    Client for Open-Elevation compatible lookup services. Points are rounded to `precision` decimal places, deduplicated and memoized; points missing from memory are looked up in the optional persistent `cache` and only the rest are sent as bulk POST requests over one keep-alive connection per thread. Failed batches are retried with exponential backoff and full jitter; points that still fail are remembered as failed until `reset_failures` is called at the end of the run, so a bad endpoint cannot stall every image while the next run tries again. The in-memory results are evicted least recently used first once `memo_entries` is exceeded.
+    """
+
+    def __init__(
+        self,
+        url: str = DEFAULT_ELEVATION_URL,
+        batch_size: int = 500,
+        max_concurrency: int = 4,
+        max_attempts: int = 5,
+        backoff_seconds: float = 0.5,
+        max_backoff_seconds: float = 30.0,
+        timeout: float = 30.0,
+        precision: int = 4,
+        cache: ElevationCache | None = None,
+        memo_entries: int = ELEVATION_MEMO_ENTRIES,
+    ):
+        """
+        Args:
+            url (str): POST endpoint accepting {"locations": [{"latitude", "longitude"}, ...]} and returning {"results": [{"elevation"}, ...]} in the same order.
+            batch_size (int): Maximum number of points per request.
+            max_concurrency (int): Maximum number of requests in flight at once.
+            max_attempts (int): Attempts per batch before its points are given up on.
+            backoff_seconds (float): Base delay of the exponential backoff.
+            max_backoff_seconds (float): Upper bound of a single backoff delay.
+            timeout (float): Socket timeout per request in seconds.
+            precision (int): Decimal places coordinates are rounded to before lookup (4 is about 11 m, finer than the 30 m SRTM grid behind the public service). The rounded point is what is queried, so cached and fresh answers agree.
+            cache (ElevationCache | None): Persistent cache consulted before any network request.
+            memo_entries (int): Maximum number of points kept in memory.
+        """
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"Unsupported elevation service URL: {url}")
+
+        self.url = url
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.timeout = timeout
+        self.precision = precision
+        self.cache = cache
+        self.memo_entries = memo_entries
+        self.requests_sent = 0
+
+        self._scheme = parts.scheme
+        self._host = parts.hostname
+        self._port = parts.port
+        self._path = parts.path or "/"
+        if parts.query:
+            self._path += f"?{parts.query}"
+
+        self._cache = OrderedDict()
+        self._failed = set()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # Long-lived workers keep their keep-alive connections between lookups
+        self._pool = None
+        self._connections = []
+
+    def lookup(self, latlons) -> list:
+        """
+        Elevations of (latitude, longitude) points in meters, fetching only points not seen before.
+
+        Returns:
+            list: Elevation per point, or None where the service could not provide one.
+        """
+        keys = [self._key(lat, lon) for lat, lon in latlons]
+        # Answered from what was found, as the memo may evict points meanwhile
+        elevations = self._fetch_missing(keys)
+        return [elevations.get(key) for key in keys]
+
+    def prefetch(self, latlons):
+        """
+        Fetch and memoize elevations of many points ahead of `lookup`.
+        """
+        self._fetch_missing([self._key(lat, lon) for lat, lon in latlons])
+
+    def clear(self):
+        """
+        Forget the in-memory results. Persistently cached points are kept.
+        """
+        with self._lock:
+            self._cache.clear()
+
+    def reset_failures(self):
+        """
+        Forget the points the service failed for, so the next lookup asks for them again.
+        """
+        with self._lock:
+            self._failed.clear()
+
+    def close(self):
+        """
+        Stop the worker threads and close every open connection.
+        """
+        with self._lock:
+            pool, self._pool = self._pool, None
+            connections, self._connections = self._connections, []
+        if pool is not None:
+            pool.shutdown()
+        for connection in connections:
+            connection.close()
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_concurrency)
+            return self._pool
+
+    def _key(self, lat, lon) -> tuple:
+        return round(float(lat), self.precision), round(float(lon), self.precision)
+
+    def _remember(self, elevations: dict):
+        with self._lock:
+            self._cache.update(elevations)
+            for key in elevations:
+                self._cache.move_to_end(key)
+            while len(self._cache) > self.memo_entries:
+                self._cache.popitem(last=False)
+
+    def _fetch_missing(self, keys: list) -> dict:
+        found = {}
+        missing = []
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    found[key] = self._cache[key]
+                elif key not in self._failed:
+                    missing.append(key)
+        if missing and self.cache is not None:
+            cached = self.cache.get_many(self.url, missing)
+            self._remember(cached)
+            found.update(cached)
+            missing = [key for key in missing if key not in cached]
+        if not missing:
+            return found
+
+        batches = [
+            missing[start : start + self.batch_size]
+            for start in range(0, len(missing), self.batch_size)
+        ]
+        if len(batches) == 1 or self.max_concurrency == 1:
+            for batch in batches:
+                found.update(self._fetch_batch(batch))
+        else:
+            for fetched in self._executor().map(self._fetch_batch, batches):
+                found.update(fetched)
+        return found
+
+    def _fetch_batch(self, batch: list) -> dict:
+        body = json.dumps(
+            {"locations": [{"latitude": lat, "longitude": lon} for lat, lon in batch]}
+        ).encode("utf-8")
+
+        elevations, error = None, None
+        for attempt in range(self.max_attempts):
+            if attempt:
+                # Full jitter keeps concurrent clients from retrying in lockstep
+                cap = min(self.max_backoff_seconds, self.backoff_seconds * 2**attempt)
+                time.sleep(random.uniform(0, cap))
+            try:
+                elevations = self._post(body, len(batch))
+                break
+            except ElevationServiceError as e:
+                error = e
+                if not e.retry:
+                    break
+            except (OSError, http.client.HTTPException, ValueError, KeyError) as e:
+                error = e
+                self._reset_connection()
+
+        if elevations is None:
+            warnings.warn(
+                f"Elevation service {self.url} failed for {len(batch)} points: {error}. Switching to default elevation."
+            )
+            elevations = [None] * len(batch)
+
+        found = {
+            key: elevation
+            for key, elevation in zip(batch, elevations)
+            if elevation is not None
+        }
+        self._remember(found)
+        with self._lock:
+            self._failed.update(key for key in batch if key not in found)
+        if self.cache is not None:
+            self.cache.put_many(self.url, found)
+        return found
+
+    def _post(self, body: bytes, count: int) -> list:
+        connection = self._connection()
+        connection.request(
+            "POST",
+            self._path,
+            body=body,
+            headers={
+                "Content-Type": "application/json",
+                "Accept": "application/json",
+                "Connection": "keep-alive",
+            },
+        )
+        response = connection.getresponse()
+        payload = response.read()
+        with self._lock:
+            self.requests_sent += 1
+
+        if response.status != 200:
+            if response.will_close:
+                self._reset_connection()
+            raise ElevationServiceError(
+                f"HTTP {response.status}", response.status in RETRY_STATUS
+            )
+        if response.will_close:
+            self._reset_connection()
+
+        results = json.loads(payload.decode("utf-8"))["results"]
+        if len(results) != count:
+            raise ValueError(f"expected {count} results, got {len(results)}")
+        return [
+            None if r.get("elevation") is None else float(r["elevation"])
+            for r in results
+        ]
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            cls = (
+                http.client.HTTPSConnection
+                if self._scheme == "https"
+                else http.client.HTTPConnection
+            )
+            connection = cls(self._host, self._port, timeout=self.timeout)
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    def _reset_connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+            with self._lock:
+                self._connections.remove(connection)
+
+
+@lru_cache(maxsize=8)
+def get_elevation_client(
+    url: str = DEFAULT_ELEVATION_URL, cache_path: str | None = None
+) -> ElevationClient:
+    """
+    Return the shared ElevationClient of this process for `url`, backed by the persistent cache at `cache_path` if given.
+    """
+    cache = None
+    if cache_path:
+        try:
+            cache = ElevationCache(cache_path)
+        except (OSError, sqlite3.Error) as e:
+            warnings.warn(f"Elevation cache {cache_path} is unavailable: {e}")
+    return ElevationClient(url, cache=cache)
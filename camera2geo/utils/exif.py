@@ -0,0 +1,90 @@
+import time
+import sqlite3
+import warnings
+import exiftool
+
+from contextlib import ExitStack
+from typing import Iterable, Iterator, List
+
+from .jpeg_metadata import read_jpeg_metadata
+from .metadata import IMAGE_METADATA_KEYS
+from .metadata_cache import MetadataCache
+
+# "-fast" stops scanning at the end of the JPEG image data. "-fast2" would also
+# skip MakerNotes, which hold the camera angle fallbacks of some drones.
+EXIFTOOL_PARAMS = ["-fast"]
+
+
+def read_metadata_chunks(
+    input_image_paths: List[str],
+    chunk_size: int = 100,
+    with_seconds: bool = False,
+    tags: Iterable[str] | None = IMAGE_METADATA_KEYS,
+    fast_path: bool = True,
+    cache_path: str | None = None,
+) -> Iterator[dict]:
+    """
+    Read EXIF metadata `chunk_size` images at a time. Images found unchanged in the metadata cache are not read at all. JPEGs whose tags all sit in their EXIF and XMP segments are read in-process; the rest go to a single exiftool process, started only when the first such image is met. Only the requested tags are extracted, so MakerNotes and thumbnail blobs are never converted or held in memory.
+
+    Args:
+        input_image_paths (List[str]): Image paths to read.
+        chunk_size (int): Number of images read per call.
+        with_seconds (bool): If True, yield (metadata, seconds) where seconds is the chunk's read time divided evenly across its images.
+        tags (Iterable[str] | None): Group-qualified tags to extract. Defaults to the tags read by ImageClass; None extracts every tag with exiftool.
+        fast_path (bool): If False, read every image with exiftool.
+        cache_path (str | None): SQLite metadata cache consulted before reading and filled with what is read; None disables caching.
+
+    Yields:
+        dict: Metadata of each image in input order.
+    """
+    tags = list(tags) if tags is not None else None
+    with ExitStack() as stack:
+        et = None
+        cache = _open_cache(cache_path)
+        if cache is not None:
+            stack.callback(cache.close)
+        for start in range(0, len(input_image_paths), chunk_size):
+            chunk = input_image_paths[start : start + chunk_size]
+            chunk_start = time.perf_counter()
+
+            metadata = [None] * len(chunk)
+            if cache is not None:
+                identities = {path: cache.identify(str(path)) for path in chunk}
+                cached = cache.get_many(tags, identities)
+                metadata = [cached.get(path) for path in chunk]
+            missing = [i for i, md in enumerate(metadata) if md is None]
+
+            if fast_path and tags is not None:
+                for i in missing:
+                    metadata[i] = read_jpeg_metadata(str(chunk[i]), tags)
+            fallback = [i for i in missing if metadata[i] is None]
+            if fallback:
+                if et is None:
+                    et = stack.enter_context(exiftool.ExifToolHelper())
+                read = et.get_tags(
+                    [chunk[i] for i in fallback], tags, params=EXIFTOOL_PARAMS
+                )
+                for i, md in zip(fallback, read):
+                    metadata[i] = md
+            if cache is not None and missing:
+                cache.put_many(
+                    tags,
+                    {chunk[i]: (identities[chunk[i]], metadata[i]) for i in missing},
+                )
+
+            seconds = (time.perf_counter() - chunk_start) / len(chunk)
+            # Hand each dict over without keeping a reference in the chunk list
+            metadata.reverse()
+            while metadata:
+                md = metadata.pop()
+                yield (md, seconds) if with_seconds else md
+
+
+def _open_cache(cache_path: str | None) -> MetadataCache | None:
+    if cache_path is None:
+        return None
+    try:
+        return MetadataCache(cache_path)
+    except (OSError, sqlite3.Error) as e:
+        warnings.warn(f"Metadata cache {cache_path} is unavailable: {e}")
+        return None
@@ -0,0 +1,319 @@
+import threading
+
+import numpy as np
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from scipy.spatial.transform import Rotation
+
+CAMERA_MODEL_ENTRIES: int = 1024
+
+_camera_models = OrderedDict()
+_camera_models_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class CameraModel:
+    """
+    Geometry shared by every image of one camera body, lens and focal length: the field of view and the unit corner rays in camera space.
+    """
+
+    fov_w: float
+    fov_h: float
+    rays: np.ndarray
+
+
+def fov_dimensions(
+    sensor_width,
+    sensor_height,
+    focal_length,
+    lens_fov_width=1.0,
+    lens_fov_height=1.0,
+):
+    """
+    Angular field of view of one or many cameras, scaled by the lens FOV correction factors.
+
+    Parameters:
+    - sensor_width, sensor_height: Sensor size in millimeters (scalars or arrays of length N).
+    - focal_length: Focal length in millimeters.
+    - lens_fov_width, lens_fov_height: Lens FOV correction factors from the sensor table.
+
+    Returns:
+    - tuple: (horizontal FOV, vertical FOV) arrays in radians.
+    """
+    focal_length = np.asarray(focal_length, dtype=float)
+    fov_w = 2 * np.arctan(np.asarray(sensor_width, dtype=float) / (2 * focal_length))
+    fov_h = 2 * np.arctan(np.asarray(sensor_height, dtype=float) / (2 * focal_length))
+    return fov_w * lens_fov_width, fov_h * lens_fov_height
+
+
+def orientation_radians(yaw_deg, pitch_deg, roll_deg, declination_deg=0.0):
+    """
+    Convert gimbal angles to the Z-Y-Z Euler angles used to rotate camera rays. Yaw is shifted by the declination and wrapped to [0, 2π); pitch is measured from nadir for near-nadir gimbals and from the horizon otherwise.
+
+    Parameters:
+    - yaw_deg, pitch_deg, roll_deg: Gimbal angles in degrees (scalars or arrays of length N).
+    - declination_deg: Magnetic declination added to the yaw, in degrees.
+
+    Returns:
+    - numpy.ndarray: (N, 3) array of yaw, pitch and roll in radians.
+    """
+    yaw = np.atleast_1d(np.asarray(yaw_deg, dtype=float) + declination_deg)
+    pitch = np.atleast_1d(np.asarray(pitch_deg, dtype=float))
+    roll = np.atleast_1d(np.asarray(roll_deg, dtype=float))
+
+    near_nadir = (pitch >= -120) & (pitch <= -60)
+    pitch_rad = np.where(near_nadir, np.radians(90 - pitch), np.radians(180 - pitch))
+    yaw_rad = np.mod(np.pi / 2 - np.radians(yaw), 2 * np.pi)
+    roll_rad = np.radians(roll)
+
+    return np.stack(np.broadcast_arrays(yaw_rad, pitch_rad, roll_rad), axis=-1)
+
+
+def camera_rays(fov_w, fov_h):
+    """
+    Unit rays through the four image corners in camera space, in the order used for footprints.
+
+    Parameters:
+    - fov_w, fov_h: Horizontal and vertical field of view in radians (scalars or arrays of length N).
+
+    Returns:
+    - numpy.ndarray: (N, 4, 3) array of unit rays.
+    """
+    tan_w, tan_h = np.broadcast_arrays(
+        np.tan(np.atleast_1d(np.asarray(fov_w, dtype=float)) / 2),
+        np.tan(np.atleast_1d(np.asarray(fov_h, dtype=float)) / 2),
+    )
+    ones = np.ones_like(tan_w)
+    rays = np.stack(
+        [
+            np.stack([-tan_h, tan_w, ones], axis=-1),
+            np.stack([-tan_h, -tan_w, ones], axis=-1),
+            np.stack([tan_h, -tan_w, ones], axis=-1),
+            np.stack([tan_h, tan_w, ones], axis=-1),
+        ],
+        axis=1,
+    )
+    return rays / np.linalg.norm(rays, axis=-1, keepdims=True)
+
+
+def edge_rays(fov_w, fov_h, samples: int):
+    """
+    Unit rays through `samples` evenly spaced points along each image edge in camera space, starting at each corner in the order of `camera_rays`. With one sample per edge these are the corner rays.
+
+    Parameters:
+    - fov_w, fov_h: Horizontal and vertical field of view in radians (scalars or arrays of length N).
+    - samples: Points per edge.
+
+    Returns:
+    - numpy.ndarray: (N, 4 * samples, 3) array of unit rays.
+    """
+    corners = camera_rays(fov_w, fov_h)
+    # Interpolate on the image plane (z = 1) so the samples lie on straight image edges
+    plane = corners / corners[..., 2:]
+    steps = np.arange(samples) / samples
+    edges = [
+        plane[:, i, None, :] * (1 - steps[:, None])
+        + plane[:, (i + 1) % 4, None, :] * steps[:, None]
+        for i in range(4)
+    ]
+    rays = np.concatenate(edges, axis=1)
+    return rays / np.linalg.norm(rays, axis=-1, keepdims=True)
+
+
+def camera_models(
+    drone_hash,
+    sensor_width,
+    sensor_height,
+    focal_length,
+    lens_fov_width=1.0,
+    lens_fov_height=1.0,
+) -> list:
+    """
+    Camera model of each image, built once per `drone_hash` and shared by every image of that camera for the rest of the process. Images with a zero hash (unknown sensor) get an uncached model.
+
+    Parameters:
+    - drone_hash: Camera hash per image, as computed by FlightTable.
+    - sensor_width, sensor_height, focal_length, lens_fov_width, lens_fov_height: Camera values per image, as for `fov_dimensions`.
+
+    Returns:
+    - list: CameraModel per image.
+    """
+    hashes = np.atleast_1d(np.asarray(drone_hash, dtype=np.int64))
+    values = np.broadcast_arrays(
+        hashes,
+        *(
+            np.atleast_1d(np.asarray(v, dtype=float))
+            for v in (
+                sensor_width,
+                sensor_height,
+                focal_length,
+                lens_fov_width,
+                lens_fov_height,
+            )
+        ),
+    )[1:]
+    models = [None] * len(hashes)
+    missing = {}
+    with _camera_models_lock:
+        for i, key in enumerate(hashes.tolist()):
+            model = _camera_models.get(key) if key else None
+            if model is None:
+                missing.setdefault(key if key else ("uncached", i), i)
+            else:
+                _camera_models.move_to_end(key)
+                models[i] = model
+
+    if missing:
+        # One vectorized pass over the first image of each new camera
+        first = list(missing.values())
+        fov_w, fov_h = fov_dimensions(*(v[first] for v in values))
+        rays = camera_rays(fov_w, fov_h)
+        # Templates are shared, so they must not be modified in place
+        rays.setflags(write=False)
+        built = {
+            key: CameraModel(float(w), float(h), r)
+            for key, w, h, r in zip(missing, fov_w, fov_h, rays)
+        }
+        with _camera_models_lock:
+            for key, model in built.items():
+                if isinstance(key, int):
+                    _camera_models[key] = model
+            while len(_camera_models) > CAMERA_MODEL_ENTRIES:
+                _camera_models.popitem(last=False)
+        for i, key in enumerate(hashes.tolist()):
+            if models[i] is None:
+                models[i] = built[key if key else ("uncached", i)]
+    return models
+
+
+def rotate_rays(rays, angles):
+    """
+    Rotate camera rays of N images with one batched Z-Y-Z rotation.
+
+    Parameters:
+    - rays: (N, K, 3) array of rays.
+    - angles: (N, 3) array of yaw, pitch and roll in radians from `orientation_radians`.
+
+    Returns:
+    - numpy.ndarray: (N, K, 3) array of rotated rays.
+    """
+    matrices = Rotation.from_euler("ZYZ", np.atleast_2d(angles)).as_matrix()
+    return np.einsum("nij,nkj->nki", matrices, np.asarray(rays, dtype=float))
+
+
+def ground_intersections(rays, altitude):
+    """
+    Intersect rays cast from a camera at `altitude` above a flat ground plane.
+
+    Parameters:
+    - rays: (N, K, 3) array of rotated rays.
+    - altitude: Camera height above the ground in meters (scalar or array of length N).
+
+    Returns:
+    - numpy.ndarray: (N, K, 2) array of east/north offsets in meters from the point below the camera. Rays parallel to the ground are NaN.
+    """
+    rays = np.asarray(rays, dtype=float)
+    altitude = np.atleast_1d(np.asarray(altitude, dtype=float))[:, None]
+    z = rays[..., 2]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = np.where(z != 0, -altitude / z, np.nan)
+    return rays[..., :2] * t[..., None]
+
+
+def terrain_intersections(
+    rays,
+    altitude,
+    surface,
+    max_range: float = 4.0,
+    steps: int = 32,
+    iterations: int = 8,
+):
+    """
+    Intersect rays with a terrain surface in one vectorized pass for all images and rays. Each ray is marched in `steps` equal steps out to `max_range` times its flat-ground distance to find the first step below the terrain, and the crossing is then refined by regula falsi. Rays that never reach the terrain fall back to the flat ground plane.
+
+    Parameters:
+    - rays: (N, K, 3) array of rotated rays.
+    - altitude: Camera height above the ground under the camera in meters (scalar or array of length N).
+    - surface: Callable mapping an (N, J, 2) array of east/north offsets from the point below each camera to an (N, J) array of terrain heights relative to that point, NaN where unknown (treated as flat ground).
+    - max_range: Farthest marched distance as a multiple of the flat-ground distance.
+    - steps: Number of march steps per ray.
+    - iterations: Number of refinement steps per ray.
+
+    Returns:
+    - numpy.ndarray: (N, K, 2) array of east/north offsets in meters. Rays pointing at or above the horizon are NaN.
+    """
+    rays = np.asarray(rays, dtype=float)
+    altitude = np.atleast_1d(np.asarray(altitude, dtype=float))[:, None]
+    n, k = rays.shape[:2]
+    z = rays[..., 2]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        flat = np.where(z < 0, -altitude / z, np.nan)
+
+    rays_xy = rays[..., :2]
+
+    def clearance(t):
+        # Height of each ray above the terrain at distances t
+        shape = t.shape
+        t = t.reshape(n, k, -1)
+        offsets = rays_xy[:, :, None, :] * t[..., None]
+        terrain = np.asarray(surface(offsets.reshape(n, -1, 2)), dtype=float)
+        terrain = np.nan_to_num(terrain.reshape(t.shape), nan=0.0)
+        return (altitude[..., None] + z[..., None] * t - terrain).reshape(shape)
+
+    # March every ray at once
+    fractions = np.arange(1, steps + 1) / steps
+    t_steps = np.nan_to_num(flat)[..., None] * max_range * fractions
+    above = clearance(t_steps)
+    below = above <= 0
+    hit = below.any(axis=-1) & np.isfinite(flat)
+    first = np.argmax(below, axis=-1)
+
+    # Bracket the first crossing; the camera itself is above the terrain
+    t_hi = np.take_along_axis(t_steps, first[..., None], axis=-1)[..., 0]
+    f_hi = np.take_along_axis(above, first[..., None], axis=-1)[..., 0]
+    previous = np.maximum(first - 1, 0)[..., None]
+    t_lo = np.where(first > 0, np.take_along_axis(t_steps, previous, -1)[..., 0], 0.0)
+    f_lo = np.where(
+        first > 0, np.take_along_axis(above, previous, -1)[..., 0], altitude
+    )
+
+    for _ in range(iterations):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t_mid = t_lo - f_lo * (t_hi - t_lo) / (f_hi - f_lo)
+        t_mid = np.where(np.isfinite(t_mid), t_mid, (t_lo + t_hi) / 2)
+        f_mid = clearance(t_mid)
+        lower = f_mid > 0
+        t_lo, f_lo = np.where(lower, t_mid, t_lo), np.where(lower, f_mid, f_lo)
+        t_hi, f_hi = np.where(lower, t_hi, t_mid), np.where(lower, f_hi, f_mid)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = t_lo - f_lo * (t_hi - t_lo) / (f_hi - f_lo)
+    t = np.where(hit & np.isfinite(t), t, flat)
+    return rays_xy * t[..., None]
+
+
+def footprint_offsets(
+    focal_length,
+    sensor_width,
+    sensor_height,
+    yaw_deg,
+    pitch_deg,
+    roll_deg,
+    altitude,
+    lens_fov_width=1.0,
+    lens_fov_height=1.0,
+    declination_deg=0.0,
+):
+    """
+    Ground corner offsets for a whole flight in one vectorized pass. Every argument is a scalar or an array of length N.
+
+    Returns:
+    - numpy.ndarray: (N, 4, 2) array of east/north corner offsets in meters from the point below each camera.
+    """
+    fov_w, fov_h = fov_dimensions(
+        sensor_width, sensor_height, focal_length, lens_fov_width, lens_fov_height
+    )
+    angles = orientation_radians(yaw_deg, pitch_deg, roll_deg, declination_deg)
+    rays = rotate_rays(camera_rays(fov_w, fov_h), angles)
+    return ground_intersections(rays, altitude)
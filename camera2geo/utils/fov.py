@@ -3,56 +3,84 @@
 #  __license__ = "AGPL"
 #  __version__ = "1.0"
 
-from scipy.spatial.transform import Rotation as R
 import warnings
 
-from mpmath import mp, radians, sqrt
-from vector3d.vector import Vector
+from math import sqrt
 
+import numpy as np
+
+from .footprint import (
+    CameraModel,
+    camera_models,
+    camera_rays,
+    edge_rays,
+    ground_intersections,
+    orientation_radians,
+    rotate_rays,
+    terrain_intersections,
+)
 from .geospatial import (
     find_geodetic_intersections,
     gps_to_utm,
     translate_to_wgs84,
+    utm_proj,
     utm_to_latlon,
 )
 from .elevation import (
     get_altitude_at_point,
+    get_altitudes_at_points,
     get_altitude_from_open,
     get_altitudes_from_open,
+    get_dsm_reader,
+    prefetch_open_elevations,
 )
-from .metadata import ImageClass
+from .metadata import ImageClass, find_declinations
+from .timing import record_timings, timed
 
 
 class FOVCalculator:
-    def __init__(self, image: ImageClass):
+    """
+    Footprint of one image. Every input comes from the image and its run settings and only the image's own results are written, so calculators for different images can run concurrently on any number of threads.
+    """
 
-        mp.dps = 50  # set a higher precision
-        global latitude, longitude, lens_FOVh, lens_FOVw
+    def __init__(self, image: ImageClass, rays=None):
+        """
+        Parameters:
+        - image: ImageClass to compute the footprint of.
+        - rays: Optional (4, 3) array of rotated corner rays, e.g. from `compute_footprints`. Computed from the image when omitted.
+        """
         self.image = image
+        self.rays = rays
         self.drone_gps = (image.latitude, image.longitude)
-        latitude = image.latitude
-        longitude = image.longitude
+        # Set by `get_utm_bbox`
+        self.altitude = None
+        self.utm_origin = None
+        self.utm_crs = None
 
-        lens_FOVh = self.image.lens_FOV_height
-        lens_FOVw = self.image.lens_FOV_width
+    def camera_model(self) -> CameraModel:
+        """
+        Cached field of view and corner rays of the image's camera.
+        """
+        return camera_models(
+            self.image.drone_hash,
+            self.image.sensor_width,
+            self.image.sensor_height,
+            self.image.focal_length,
+            self.image.lens_FOV_width,
+            self.image.lens_FOV_height,
+        )[0]
 
     def calculate_fov_dimensions(self):
-        FOVw = 2 * mp.atan(
-            mp.mpf(self.image.sensor_width) / (2 * self.image.focal_length)
-        )
-        FOVh = 2 * mp.atan(
-            mp.mpf(self.image.sensor_height) / (2 * self.image.focal_length)
-        )
-
-        # _sensor_lens_correction now inside this function
-        corrected_fov_width = FOVw * lens_FOVw
-        corrected_fov_height = FOVh * lens_FOVh
-
-        return corrected_fov_width, corrected_fov_height
+        camera = self.camera_model()
+        return camera.fov_w, camera.fov_h
 
     @staticmethod
     def calculate_rads_from_angles(
-        gimbal_yaw_deg, gimbal_pitch_deg, gimbal_roll_deg, declination
+        gimbal_yaw_deg,
+        gimbal_pitch_deg,
+        gimbal_roll_deg,
+        declination,
+        correct_magnetic_declination=False,
     ):
         """
         Adjusts the gimbal's angles for magnetic declination and normalizes the roll orientation.
@@ -65,24 +93,19 @@ class FOVCalculator:
         - gimbal_pitch_deg (float): The gimbal's pitch angle in degrees.
         - gimbal_roll_deg (float): The gimbal's roll angle in degrees.
         - declination (float): Magnetic declination in degrees.
+        - correct_magnetic_declination (bool): Whether to apply the declination to the yaw.
 
         Returns:
         - tuple: Adjusted yaw, pitch, and roll angles in radians.
         """
-        # Normalize yaw for magnetic declination
-        if -120 <= gimbal_pitch_deg <= -60:
-            pitch_rad = radians(90 - gimbal_pitch_deg)
-        else:
-            pitch_rad = radians(180 - gimbal_pitch_deg)
-
-        if ImageClass.correct_magnetic_declination:
-            yaw_rad = (mp.pi / 2) - radians(gimbal_yaw_deg + declination)
-        else:
-            yaw_rad = (mp.pi / 2) - radians(gimbal_yaw_deg)
-        yaw_rad = yaw_rad % (2 * mp.pi)
-        roll_rad = radians(gimbal_roll_deg)
-
-        return yaw_rad, pitch_rad, roll_rad
+        angles = orientation_radians(
+            gimbal_yaw_deg,
+            gimbal_pitch_deg,
+            gimbal_roll_deg,
+            declination if correct_magnetic_declination else 0.0,
+        )
+        yaw_rad, pitch_rad, roll_rad = angles[0]
+        return float(yaw_rad), float(pitch_rad), float(roll_rad)
 
     def get_bounding_polygon(self, FOVh, FOVv):
         """
@@ -91,229 +114,407 @@ class FOVCalculator:
         Parameters:
             FOVh (float): The horizontal field of view in radians.
             FOVv (float): The vertical field of view in radians.
-            altitude (float): The altitude above ground in meters.
-            roll (float): The roll angle in radians.
-            pitch (float): The pitch angle in radians.
-            yaw (float): The yaw angle in radians.
 
         Returns:
-            list: A list of Vector objects representing the corners of the bounding polygon on the ground.
+            numpy.ndarray: (4, 3) array of rotated rays through the image corners.
         """
-
         # Define camera rays based on field of view
-        rays = [
-            Vector(
-                -mp.tan(FOVv / 2), mp.tan(FOVh / 2), 1
-            ).normalize(),  # Flip horizontally
-            Vector(
-                -mp.tan(FOVv / 2), -mp.tan(FOVh / 2), 1
-            ).normalize(),  # Flip horizontally
-            Vector(
-                mp.tan(FOVv / 2), -mp.tan(FOVh / 2), 1
-            ).normalize(),  # Flip horizontally
-            Vector(
-                mp.tan(FOVv / 2), mp.tan(FOVh / 2), 1
-            ).normalize(),  # Flip horizontally
-        ]
+        rays = camera_rays(FOVh, FOVv)[0]
         # Rotate rays according to camera orientation
-        rotated_vectors = self.rotate_rays(rays)
-
-        return rotated_vectors
+        return self.rotate_rays(rays)
 
     def rotate_rays(self, rays):
-        # Calculate adjusted angles for gimbal and flight orientations
-        self.image.find_declination()
-        declination = self.image.declination
+        # Declination is only looked up when it is applied
+        declination = 0.0
+        if self.image.settings.correct_magnetic_declination:
+            self.image.find_declination()
+            declination = self.image.declination
 
-        adj_yaw, adj_pitch, adj_roll = self.calculate_rads_from_angles(
+        angles = self.calculate_rads_from_angles(
             self.image.gimbal_yaw_degree,
             self.image.gimbal_pitch_degree,
             self.image.gimbal_roll_degree,
             declination,
+            self.image.settings.correct_magnetic_declination,
         )
 
         # Match the old quaternion from_euler_angles convention (Z–Y–Z style)
-        r = R.from_euler(
-            "ZYZ",
-            [float(adj_yaw), float(adj_pitch), float(adj_roll)],
-            degrees=False,
-        )
-
-        rotated = r.apply([(float(ray.x), float(ray.y), float(ray.z)) for ray in rays])
-        return [Vector(*vec) for vec in rotated]
-
+        return rotate_rays(np.asarray(rays)[None], np.asarray(angles)[None])[0]
 
     def get_fov_bbox(self, image: ImageClass):
         try:
-            FOVw, FOVh = self.calculate_fov_dimensions()
-            rotated_vectors = self.get_bounding_polygon(FOVw, FOVh)
-            utmx, utmy, zone_number, zone_letter = gps_to_utm(latitude, longitude)
-            new_altitude = None
-            # Determine new altitude based on different data sources
-            if ImageClass.dsm_path:
-                new_altitude = get_altitude_at_point(utmx, utmy)
-            if ImageClass.global_elevation:
-                new_altitude = get_altitude_from_open(latitude, longitude, image)
-            if image.relative_altitude == 0.0:
-                new_altitude = image.absolute_altitude
-            if new_altitude and abs(new_altitude - image.relative_altitude) > 20:
-                new_altitude = image.relative_altitude
-            if image.absolute_altitude == image.relative_altitude:
-                new_altitude = get_altitude_from_open(latitude, longitude, image)
-            if (
-                new_altitude is None
-            ):  # and not config.dtm_path or not config.global_elevation is False or config.rtk:
-                new_altitude = image.relative_altitude
-                if ImageClass.global_elevation is True or ImageClass.dsm_path:
-                    warnings.warn(
-                        f"Failed to get elevation for {image.file_name}, using drone altitude."
-                    )
-
-            corrected_altitude = self._atmospheric_refraction_correction(new_altitude)
-
-            elevation_bbox = FOVCalculator.get_ray_ground_intersections(
-                rotated_vectors, Vector(0, 0, float(corrected_altitude))
-            )
-            translated_bbox = find_geodetic_intersections(
-                elevation_bbox, longitude, latitude
-            )
-            self.image.center_distance = drone_distance_to_polygon_center(
-                translated_bbox, (utmx, utmy), corrected_altitude
+            utm_bbox = self.get_utm_bbox(image)
+            self.check_terrain(image, utm_bbox)
+            return translate_to_wgs84(
+                utm_bbox, image.longitude, image.latitude, image.settings.epsg
             )
-            new_translated_bbox = translated_bbox
-            if ImageClass.dsm_path:
-                altitudes = [
-                    get_altitude_at_point(*box[:2]) for box in new_translated_bbox
-                ]
-                if None in altitudes:
-                    warnings.warn(
-                        f"Failed to get elevation for image {image.file_name}. See log for details."
-                    )
-                    return translate_to_wgs84(new_translated_bbox, longitude, latitude)
-
-                # Calculate the ratios of distances to check the 5 times condition
-                distances = [
-                    sqrt(
-                        (
-                            new_translated_bbox[(i + 1) % len(new_translated_bbox)][0]
-                            - box[0]
-                        )
-                        ** 2
-                        + (
-                            new_translated_bbox[(i + 1) % len(new_translated_bbox)][1]
-                            - box[1]
-                        )
-                        ** 2
-                    )
-                    for i, box in enumerate(new_translated_bbox)
-                ]
-                for dist in distances:
-                    if any(
-                        other_dist * 6 < dist
-                        for other_dist in distances
-                        if other_dist != dist
-                    ):
-                        warnings.warn(
-                            f"One side of the polygon for {image.file_name} is at least 5 times longer than another."
-                        )
-                        return translate_to_wgs84(
-                            new_translated_bbox, longitude, latitude
-                        )
-
-            if ImageClass.global_elevation is True:
-                trans_utmbox = [
-                    utm_to_latlon(box[0], box[1], zone_number, zone_letter)
-                    for box in new_translated_bbox
-                ]
-                altitudes = get_altitudes_from_open(trans_utmbox)
-
-                if None in altitudes:
-                    warnings.warn(
-                        f"Failed to get elevation at point for {image.file_name}."
-                    )
-                    return translate_to_wgs84(new_translated_bbox, longitude, latitude)
-
-                # Calculate the ratios of distances to check the 5 times condition
-                distances = [
-                    sqrt(
-                        (
-                            new_translated_bbox[(i + 1) % len(new_translated_bbox)][0]
-                            - box[0]
-                        )
-                        ** 2
-                        + (
-                            new_translated_bbox[(i + 1) % len(new_translated_bbox)][1]
-                            - box[1]
-                        )
-                        ** 2
-                    )
-                    for i, box in enumerate(new_translated_bbox)
-                ]
-                for dist in distances:
-                    if any(
-                        other_dist * 5 < dist
-                        for other_dist in distances
-                        if other_dist != dist
-                    ):
-                        warnings.warn(
-                            f"One side of the polygon for {image.file_name} is at least 5 times longer than another."
-                        )
-                        return translate_to_wgs84(
-                            new_translated_bbox, longitude, latitude
-                        )
-
-            # If no special conditions are met, process normally
-            return translate_to_wgs84(new_translated_bbox, longitude, latitude)
-
         except Exception as e:
             warnings.warn(f"Error in get_fov_bbox: {e}")
             return None, None
 
-    @staticmethod
-    def get_ray_ground_intersections(rays, origin):
+    def get_utm_bbox(self, image: ImageClass):
         """
-        Calculates the intersection points of the given rays with the ground plane.
-
-        Parameters:
-            rays (list): A list of Vector objects representing the rays.
-            origin (Vector): The origin point of the rays.
+        Intersect the corner rays with flat ground below the drone, after picking the drone's height above ground from the DSM, the online elevation service or the metadata.
 
         Returns:
-            list: A list of Vector objects representing the intersection points on the ground.
+            list: Footprint corners as (easting, northing) in the image's UTM zone.
         """
+        if self.rays is not None:
+            rotated_vectors = self.rays
+        else:
+            rotated_vectors = self.rotate_rays(self.camera_model().rays)
+        latitude, longitude = self.drone_gps
+        utmx, utmy, zone_number, zone_letter = gps_to_utm(latitude, longitude)
+        utm_crs = utm_proj(zone_number, zone_letter == "south")
+        settings = image.settings
+        online = settings.elevation_mode == "online"
+        new_altitude = None
+        # Determine new altitude based on different data sources
+        if settings.dsm_path:
+            new_altitude = get_altitude_at_point(utmx, utmy, image, utm_crs)
+        if online:
+            new_altitude = get_altitude_from_open(latitude, longitude, image)
+        if image.relative_altitude == 0.0:
+            new_altitude = image.absolute_altitude
+        if new_altitude and abs(new_altitude - image.relative_altitude) > 20:
+            new_altitude = image.relative_altitude
+        if image.absolute_altitude == image.relative_altitude:
+            new_altitude = get_altitude_from_open(latitude, longitude, image)
+        if (
+            new_altitude is None
+        ):  # and not config.dtm_path or not config.global_elevation is False or config.rtk:
+            new_altitude = image.relative_altitude
+            if online or settings.dsm_path:
+                warnings.warn(
+                    f"Failed to get elevation for {image.file_name}, using drone altitude."
+                )
+
+        corrected_altitude = self._atmospheric_refraction_correction(new_altitude)
+        self.altitude = float(corrected_altitude)
+        self.utm_origin = (utmx, utmy)
+        self.utm_crs = utm_crs
+
+        elevation_bbox = FOVCalculator.get_ray_ground_intersections(
+            rotated_vectors, float(corrected_altitude)
+        )
+        translated_bbox = find_geodetic_intersections(
+            elevation_bbox, longitude, latitude, settings.epsg
+        )
+        self.image.center_distance = drone_distance_to_polygon_center(
+            translated_bbox, (utmx, utmy), corrected_altitude
+        )
+        return translated_bbox
 
-        intersections = [
-            FOVCalculator.find_ray_ground_intersection(ray, origin)
-            for ray in rays
-            if FOVCalculator.find_ray_ground_intersection(ray, origin) is not None
-        ]
-
-        return intersections
+    def check_terrain(self, image: ImageClass, utm_bbox):
+        """
+        Warn when the terrain under the footprint corners is unknown or the footprint is badly skewed. The footprint itself is left unchanged.
+        """
+        settings = image.settings
+        latitude, longitude = self.drone_gps
+        if settings.dsm_path:
+            _, _, zone_number, zone_letter = gps_to_utm(latitude, longitude)
+            altitudes = get_altitudes_at_points(
+                [box[:2] for box in utm_bbox],
+                image,
+                utm_proj(zone_number, zone_letter == "south"),
+            )
+            if None in altitudes:
+                warnings.warn(
+                    f"Failed to get elevation for image {image.file_name}. See log for details."
+                )
+                return
+            if _has_skewed_side(utm_bbox, 6):
+                warnings.warn(
+                    f"One side of the polygon for {image.file_name} is at least 5 times longer than another."
+                )
+                return
+
+        if settings.elevation_mode == "online":
+            altitudes = get_altitudes_from_open(corner_latlons(image, utm_bbox), image)
+            if altitudes is None:
+                warnings.warn(
+                    f"Failed to get elevation at point for {image.file_name}."
+                )
+                return
+            if _has_skewed_side(utm_bbox, 5):
+                warnings.warn(
+                    f"One side of the polygon for {image.file_name} is at least 5 times longer than another."
+                )
 
     @staticmethod
-    def find_ray_ground_intersection(ray, origin):
+    def get_ray_ground_intersections(rays, altitude):
         """
-        Finds the intersection point of a single ray with the ground plane.
+        Calculates the intersection points of the given rays with the ground plane.
 
         Parameters:
-            ray (Vector): The ray vector.
-            origin (Vector): The origin point of the ray.
+            rays (numpy.ndarray): (K, 3) array of rays.
+            altitude (float): Height of the ray origin above the ground.
 
         Returns:
-            Vector: The intersection point with the ground, or None if the ray is parallel to the ground.
+            numpy.ndarray: (M, 2) array of east/north ground offsets, skipping rays parallel to the ground.
         """
-
-        if ray.z == 0:  # Ray is parallel to ground
-            return None
-
-        # Calculate intersection parameter t
-        t = -origin.z / ray.z
-        return Vector(origin.x + ray.x * t, origin.y + ray.y * t, 0)
+        intersections = ground_intersections(np.asarray(rays)[None], altitude)[0]
+        return intersections[np.isfinite(intersections).all(axis=1)]
 
     def _atmospheric_refraction_correction(self, altitude):
         return altitude + (altitude * 0.0001)
 
 
+def _chunk_orientation(images: list) -> tuple:
+    """
+    Camera models, rotation angles and declinations of a chunk of images, with one declination lookup for the chunk. Declinations are None where the lookup failed.
+    """
+    declinations = [0.0] * len(images)
+    corrected = [
+        i
+        for i, image in enumerate(images)
+        if image.settings.correct_magnetic_declination
+    ]
+    if corrected:
+        # One vectorized lookup for the chunk; failures are left to the image
+        values = find_declinations([images[i] for i in corrected])
+        for i, value in zip(corrected, values):
+            if np.isnan(value):
+                declinations[i] = None
+                continue
+            image = images[i]
+            if image.relative_altitude < 0 or image.focal_length <= 0:
+                warnings.warn("Altitude and focal length must be positive.")
+            image.declination = declinations[i] = float(value)
+
+    cameras = camera_models(
+        [image.drone_hash for image in images],
+        [image.sensor_width for image in images],
+        [image.sensor_height for image in images],
+        [image.focal_length for image in images],
+        [image.lens_FOV_width for image in images],
+        [image.lens_FOV_height for image in images],
+    )
+    angles = orientation_radians(
+        [image.gimbal_yaw_degree for image in images],
+        [image.gimbal_pitch_degree for image in images],
+        [image.gimbal_roll_degree for image in images],
+        np.array([d or 0.0 for d in declinations], dtype=float),
+    )
+    return cameras, angles, declinations
+
+
+def compute_footprints(images: list, timings: list | None = None) -> list:
+    """
+    Footprints of a chunk of images. Corner rays are rotated in one batch, and every online elevation lookup of the chunk (drone positions, then footprint corners) is deduplicated and sent in bulk before the per-image steps run.
+
+    Parameters:
+    - images: List of ImageClass objects.
+    - timings: Optional list of per-image timing dicts receiving the "fov" and "elevation" stages. Time spent on bulk lookups is split evenly across the images that needed them.
+
+    Returns:
+    - list: (coord_array, footprint_coordinates) per image, (None, None) where the footprint failed.
+    """
+    if not images:
+        return []
+    timings = timings if timings is not None else [{} for _ in images]
+    cameras, angles, declinations = _chunk_orientation(images)
+    all_rays = rotate_rays(np.stack([camera.rays for camera in cameras]), angles)
+    all_rays = [r if d is not None else None for r, d in zip(all_rays, declinations)]
+    calculators = [
+        FOVCalculator(image, rays=rays) for image, rays in zip(images, all_rays)
+    ]
+
+    _prefetch_elevations(
+        [
+            (image, [(image.latitude, image.longitude)])
+            for image in images
+            if _uses_open_elevation(image)
+        ],
+        images,
+        timings,
+    )
+
+    utm_bboxes = []
+    for calculator, image, image_timings in zip(calculators, images, timings):
+        with record_timings(image_timings), timed("fov"):
+            try:
+                utm_bboxes.append(calculator.get_utm_bbox(image))
+            except Exception as e:
+                warnings.warn(f"Error in get_fov_bbox: {e}")
+                utm_bboxes.append(None)
+
+    _prefetch_elevations(
+        [
+            (image, corner_latlons(image, bbox))
+            for image, bbox in zip(images, utm_bboxes)
+            if bbox is not None and image.settings.elevation_mode == "online"
+        ],
+        images,
+        timings,
+    )
+
+    dense = _dense_footprints(images, calculators, utm_bboxes, cameras, angles, timings)
+
+    footprints = []
+    for i, (calculator, image, bbox, image_timings) in enumerate(
+        zip(calculators, images, utm_bboxes, timings)
+    ):
+        if bbox is None:
+            footprints.append((None, None))
+            continue
+        with record_timings(image_timings), timed("fov"):
+            try:
+                calculator.check_terrain(image, bbox)
+                footprint = translate_to_wgs84(
+                    bbox, image.longitude, image.latitude, image.settings.epsg
+                )
+                if i in dense:
+                    # Warping needs the four corners; the footprint keeps every edge point
+                    samples = image.settings.footprint_samples
+                    coords, polygon = translate_to_wgs84(
+                        dense[i], image.longitude, image.latitude, image.settings.epsg
+                    )
+                    footprint = (coords[::samples], polygon)
+                footprints.append(footprint)
+            except Exception as e:
+                warnings.warn(f"Error in get_fov_bbox: {e}")
+                footprints.append((None, None))
+    return footprints
+
+
+def _dense_footprints(
+    images: list,
+    calculators: list,
+    utm_bboxes: list,
+    cameras: list,
+    angles,
+    timings: list,
+) -> dict:
+    """
+    Edge-sampled footprints of the images whose `footprint_samples` is above 1. Rays through `footprint_samples` points per image edge are intersected with the DSM in one vectorized ray-marching pass per group of images sharing a UTM zone and DSM, or with the flat ground plane when no DSM is set. The elapsed time is split evenly across those images as "fov".
+
+    Returns:
+    - dict: 4 * footprint_samples UTM footprint points per image index, for images whose corner footprint succeeded and whose edge rays all reach the ground.
+    """
+    groups = {}
+    for i, (image, calculator, bbox) in enumerate(zip(images, calculators, utm_bboxes)):
+        settings = image.settings
+        if settings.footprint_samples > 1 and bbox is not None:
+            key = (
+                settings.footprint_samples,
+                calculator.utm_crs,
+                settings.dsm_path,
+                settings.dsm_cache_mb,
+            )
+            groups.setdefault(key, []).append(i)
+    if not groups:
+        return {}
+
+    dense = {}
+    elapsed = {}
+    with record_timings(elapsed), timed("fov"):
+        for (samples, utm_crs, dsm_path, dsm_cache_mb), indices in groups.items():
+            rays = rotate_rays(
+                edge_rays(
+                    [cameras[i].fov_w for i in indices],
+                    [cameras[i].fov_h for i in indices],
+                    samples,
+                ),
+                angles[indices],
+            )
+            heights = [calculators[i].altitude for i in indices]
+            origins = np.array([calculators[i].utm_origin for i in indices])
+            if dsm_path:
+                offsets = terrain_intersections(
+                    rays,
+                    heights,
+                    _dsm_surface(dsm_path, dsm_cache_mb, origins, utm_crs),
+                )
+            else:
+                offsets = ground_intersections(rays, heights)
+            for i, points in zip(indices, offsets):
+                if np.isfinite(points).all():
+                    image = images[i]
+                    dense[i] = find_geodetic_intersections(
+                        points, image.longitude, image.latitude, image.settings.epsg
+                    )
+
+    share = elapsed.get("fov", 0.0) / sum(len(indices) for indices in groups.values())
+    for indices in groups.values():
+        for i in indices:
+            timings[i]["fov"] = timings[i].get("fov", 0.0) + share
+    return dense
+
+
+def _dsm_surface(dsm_path: str, dsm_cache_mb: int, origins, utm_crs):
+    """
+    Terrain heights relative to the ground under each camera, for `terrain_intersections`.
+    """
+    dsm = get_dsm_reader(dsm_path, dsm_cache_mb)
+    ground = dsm.sample(origins[:, 0], origins[:, 1], utm_crs)
+
+    def surface(offsets):
+        points = origins[:, None, :] + offsets
+        heights = dsm.sample(points[..., 0].ravel(), points[..., 1].ravel(), utm_crs)
+        return heights.reshape(points.shape[:2]) - ground[:, None]
+
+    return surface
+
+
+def corner_latlons(image: ImageClass, utm_bbox) -> list:
+    """
+    (latitude, longitude) of footprint corners given in the image's UTM zone.
+    """
+    _, _, zone_number, zone_letter = gps_to_utm(image.latitude, image.longitude)
+    eastings, northings = np.asarray(utm_bbox, dtype=float)[:, :2].T
+    return list(zip(*utm_to_latlon(eastings, northings, zone_number, zone_letter)))
+
+
+def _uses_open_elevation(image: ImageClass) -> bool:
+    return (
+        image.settings.elevation_mode == "online"
+        or image.absolute_altitude == image.relative_altitude
+    )
+
+
+def _prefetch_elevations(requests: list, images: list, timings: list):
+    """
+    Send the (image, latlons) requests as bulk lookups, one per elevation service, and charge the elapsed time to the requesting images.
+    """
+    if not requests:
+        return
+    by_source = {}
+    for image, latlons in requests:
+        source = (image.settings.elevation_url, image.settings.elevation_cache)
+        by_source.setdefault(source, []).extend(latlons)
+
+    elapsed = {}
+    with record_timings(elapsed), timed("elevation"):
+        for (url, cache_path), latlons in by_source.items():
+            prefetch_open_elevations(latlons, url, cache_path)
+
+    share = elapsed.get("elevation", 0.0) / len(requests)
+    index = {id(image): i for i, image in enumerate(images)}
+    for image, _ in requests:
+        image_timings = timings[index[id(image)]]
+        image_timings["elevation"] = image_timings.get("elevation", 0.0) + share
+
+
+def _has_skewed_side(polygon, ratio) -> bool:
+    """
+    Whether one side of the polygon is more than `ratio` times longer than another.
+    """
+    distances = [
+        sqrt(
+            (polygon[(i + 1) % len(polygon)][0] - box[0]) ** 2
+            + (polygon[(i + 1) % len(polygon)][1] - box[1]) ** 2
+        )
+        for i, box in enumerate(polygon)
+    ]
+    return any(
+        other_dist * ratio < dist
+        for dist in distances
+        for other_dist in distances
+        if other_dist != dist
+    )
+
+
 def calculate_centroid(polygon_coords):
     """Calculate the centroid of a polygon given its vertices in UTM coordinates."""
     x_sum = 0
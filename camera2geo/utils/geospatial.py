@@ -6,9 +6,57 @@
 import math
 import warnings
 
+import numpy as np
+
+from functools import lru_cache
 from pyproj import Transformer, CRS, Geod
 
-from .metadata import ImageClass
+# Distinct CRS pairs kept alive; a flight rarely spans more than a few UTM zones
+TRANSFORMER_CACHE_SIZE = 128
+
+
+@lru_cache(maxsize=TRANSFORMER_CACHE_SIZE)
+def get_crs(definition) -> CRS:
+    """
+    Return a process-wide cached CRS for an EPSG code, "epsg:XXXX" string, PROJ string or WKT.
+    """
+    return CRS.from_user_input(definition)
+
+
+def get_transformer(src_crs, dst_crs) -> Transformer:
+    """
+    Return a process-wide cached Transformer (always_xy) between two CRS. The cache is LRU-bounded and safe to use from multiple threads.
+
+    Parameters:
+    - src_crs: Source CRS as an EPSG code, "epsg:XXXX" string, PROJ string, WKT or CRS object.
+    - dst_crs: Destination CRS in any of the same forms.
+
+    Returns:
+    Transformer: Transformer from `src_crs` to `dst_crs`.
+    """
+    return _cached_transformer(_crs_key(src_crs), _crs_key(dst_crs))
+
+
+@lru_cache(maxsize=TRANSFORMER_CACHE_SIZE)
+def _cached_transformer(src_crs, dst_crs) -> Transformer:
+    return Transformer.from_crs(get_crs(src_crs), get_crs(dst_crs), always_xy=True)
+
+
+def _crs_key(crs):
+    # pyproj and rasterio CRS objects are keyed by their WKT
+    if isinstance(crs, (str, int)):
+        return crs
+    if hasattr(crs, "to_wkt"):
+        return crs.to_wkt()
+    return str(crs)
+
+
+def utm_proj(zone_number, is_southern) -> str:
+    """
+    PROJ string of a WGS84 UTM zone, as used throughout this module.
+    """
+    south = " +south" if is_southern else ""
+    return f"+proj=utm +zone={zone_number}{south} +ellps=WGS84 +datum=WGS84 +units=m +no_defs"
 
 
 def decimal_degrees_to_utm(latitude, longitude):
@@ -24,12 +72,8 @@ def decimal_degrees_to_utm(latitude, longitude):
     """
     zone_number = int((longitude + 180) / 6) + 1
     is_southern = latitude < 0
-    utm_crs = CRS(
-        proj="utm", zone=zone_number, ellps="WGS84", datum="WGS84", south=is_southern
-    )
-    wgs84_crs = CRS.from_epsg(4326)
 
-    transformer = Transformer.from_crs(wgs84_crs, utm_crs, always_xy=True)
+    transformer = get_transformer(4326, utm_proj(zone_number, is_southern))
     easting, northing = transformer.transform(longitude, latitude)
     hemisphere = "south" if is_southern else "north"
 
@@ -44,11 +88,9 @@ def gps_to_utm(latitude, longitude):
     zone_number = longitude_to_utm_zone(longitude)
     hemisphere = "north" if latitude >= 0 else "south"
     is_southern = latitude < 0
-    utm_crs = CRS(
-        proj="utm", zone=zone_number, ellps="WGS84", datum="WGS84", south=is_southern
+    transformer = get_transformer(
+        "+proj=latlong +datum=WGS84", utm_proj(zone_number, is_southern)
     )
-    wgs84_crs = CRS(proj="latlong", datum="WGS84")
-    transformer = Transformer.from_crs(wgs84_crs, utm_crs, always_xy=True)
     x, y = transformer.transform(longitude, latitude)  # Corrected order
     return float(x), float(y), zone_number, hemisphere
 
@@ -56,12 +98,9 @@ def gps_to_utm(latitude, longitude):
 def get_utm_transformer(latitude, longitude):
     zone_number = longitude_to_utm_zone(longitude)
     is_southern = latitude < 0
-    utm_crs = CRS(
-        proj="utm", zone=zone_number, ellps="WGS84", datum="WGS84", south=is_southern
+    return get_transformer(
+        "+proj=latlong +datum=WGS84", utm_proj(zone_number, is_southern)
     )
-    wgs84_crs = CRS(proj="latlong", datum="WGS84")
-    transformer = Transformer.from_crs(wgs84_crs, utm_crs, always_xy=True)
-    return transformer
 
 
 def find_epsg_code(utm_x, utm_y):
@@ -86,22 +125,19 @@ def utm_to_latlon(easting, northing, zone_number, hemi):
     Convert UTM coordinates to latitude and longitude.
 
     Parameters:
-    - easting (float): UTM easting.
-    - northing (float): UTM northing.
+    - easting (float | array): UTM easting.
+    - northing (float | array): UTM northing.
     - zone_number (int): UTM zone number.
     - hemisphere (str): Hemisphere indicator ('N' for north, 'S' for south).
 
     Returns:
-    tuple: Latitude and longitude in decimal degrees.
+    tuple: Latitude and longitude in decimal degrees, as floats or as arrays when arrays are passed.
     """
     is_southern = hemi.lower().startswith("s")
-    utm_crs = CRS(
-        proj="utm", zone=zone_number, ellps="WGS84", datum="WGS84", south=is_southern
-    )
-    wgs84_crs = CRS.from_epsg(4326)
-
-    transformer = Transformer.from_crs(utm_crs, wgs84_crs, always_xy=True)
+    transformer = get_transformer(utm_proj(zone_number, is_southern), 4326)
     lon, lat = transformer.transform(easting, northing)
+    if np.ndim(lon):
+        return np.asarray(lat), np.asarray(lon)
     return float(lat), float(lon)
 
 
@@ -145,15 +181,9 @@ def proj_stuff(center_latitude, zone_number):
     is_southern = center_latitude < 0
 
     try:
-        utm_crs = CRS(
-            proj="utm",
-            zone=zone_number,
-            ellps="WGS84",
-            datum="WGS84",
-            south=is_southern,
+        transformer = get_transformer(
+            utm_proj(zone_number, is_southern), "+proj=latlong +datum=WGS84"
         )
-        wgs84_crs = CRS(proj="latlong", datum="WGS84")
-        transformer = Transformer.from_crs(utm_crs, wgs84_crs, always_xy=True)
     except Exception as e:
         warnings.warn(f"Error initializing transformer: {e}")
     return transformer
@@ -172,7 +202,7 @@ def proj_stuff2(zone_number, hemisphere):
     """
     south_flag = "+south" if hemisphere == "S" else ""
     proj_utm = f"+proj=utm +zone={zone_number} {south_flag} +ellps=WGS84 +datum=WGS84 +units=m +no_defs"
-    transformer = Transformer.from_proj(proj_utm, "epsg:3857", always_xy=True)
+    transformer = get_transformer(proj_utm, "epsg:3857")
     return transformer
 
 
@@ -199,7 +229,30 @@ def calculate_geographic_offset(latitude, longitude, distance_meters, bearing_de
     return new_latitude, new_longitude
 
 
-def translate_to_wgs84(bbox, drone_lon, drone_lat):
+def metres_to_crs_units(distance_m, crs, x, y):
+    """
+    Express a ground distance as x and y extents in the units of a CRS.
+
+    Parameters:
+    - distance_m (float): Ground distance in meters.
+    - crs: CRS as an EPSG code, "epsg:XXXX" string, PROJ string or WKT.
+    - x (float): X coordinate in `crs` of the point the distance is measured at. Longitude for geographic CRS.
+    - y (float): Y coordinate in `crs`. Latitude for geographic CRS.
+
+    Returns:
+    tuple: (x extent, y extent) in `crs` units. Degrees east and north for geographic CRS.
+    """
+    crs = get_crs(crs)
+    if crs.is_geographic:
+        geod = Geod(ellps="WGS84")
+        east, _, _ = geod.fwd(x, y, 90, distance_m)
+        _, north, _ = geod.fwd(x, y, 0, distance_m)
+        return abs(east - x), abs(north - y)
+    extent = distance_m / crs.axis_info[0].unit_conversion_factor
+    return extent, extent
+
+
+def translate_to_wgs84(bbox, drone_lon, drone_lat, epsg=4326):
     """
     Translates a bounding box to geographic coordinates based on the drone's location.
 
@@ -207,13 +260,14 @@ def translate_to_wgs84(bbox, drone_lon, drone_lat):
     - bbox (list): List of bounding box coordinates in UTM.
     - drone_lon (float): Drone's longitude in decimal degrees.
     - drone_lat (float): Drone's latitude in decimal degrees.
+    - epsg (int): EPSG code of the output coordinate reference system.
 
     Returns:
     List of tuples containing translated bounding box points in geographic coordinates.
     """
     # Determine UTM zone and hemisphere from drone's coordinates
     crs_geo_outDD = "epsg:4326"
-    crs_geo_out = f"epsg:{ImageClass.epsg}"
+    crs_geo_out = f"epsg:{epsg}"
     # crs_utm = f"+proj=utm +zone={utm_zone} +{hemisphere} +ellps=WGS84 +datum=WGS84 +units=m +no_defs"
     # utm_crs_code = find_epsg_code(bbox[0][0], bbox[0][1])
     utm_zone = int((drone_lon + 180) / 6) + 1
@@ -221,32 +275,16 @@ def translate_to_wgs84(bbox, drone_lon, drone_lat):
     crs_geo_outDD = "epsg:4326"
     crs_utm = f"+proj=utm +zone={utm_zone} +{hemisphere} +ellps=WGS84 +datum=WGS84 +units=m +no_defs"
 
-    # Initialize transformers for coordinate conversion
-    # transformer_to_utm = Transformer.from_crs(crs_geo_in, crs_utm, always_xy=True)
-    transformer_to_geo = Transformer.from_crs(crs_utm, crs_geo_out, always_xy=True)
-    transformer_to_decdree = Transformer.from_crs(
-        crs_utm, crs_geo_outDD, always_xy=True
-    )
+    # Cached transformers for coordinate conversion
+    transformer_to_geo = get_transformer(crs_utm, crs_geo_out)
+    transformer_to_decdree = get_transformer(crs_utm, crs_geo_outDD)
 
-    # Convert drone's location to UTM coordinates
-    # drone_easting, drone_northing = transformer_to_utm.transform(drone_lon, drone_lat)
-    translated_bbox = []
-    polybox = []
-    for point in bbox:
-        # Unpack the point tuple into x and y
-        x, y = point
-        # Translate bounding box points
-        # point_easting, point_northing = drone_easting + x, drone_northing + y
-
-        # Convert points back to geographic coordinates
-        point_lat, point_lon = transformer_to_geo.transform(x, y)
-        dd_lat, dd_lon = transformer_to_decdree.transform(x, y)
-        # print("UTM CRS:", crs_utm)
-        # print("Input UTM coordinates:", point_lon, point_lat)
-        # print("Output geographic coordinates:", point_lon, point_lat)
-        # exit()
-        translated_bbox.append((point_lat, point_lon))
-        polybox.append((dd_lat, dd_lon))
+    # Convert every point back to geographic coordinates in one call per CRS
+    points = np.asarray(bbox, dtype=float).reshape(-1, 2)
+    point_lat, point_lon = transformer_to_geo.transform(points[:, 0], points[:, 1])
+    dd_lat, dd_lon = transformer_to_decdree.transform(points[:, 0], points[:, 1])
+    translated_bbox = list(zip(point_lat.tolist(), point_lon.tolist()))
+    polybox = list(zip(dd_lat.tolist(), dd_lon.tolist()))
     return translated_bbox, polybox
 
 
@@ -270,24 +308,22 @@ def translate_points_to_utm(bbox, drone_lon, drone_lat):
     crs_utm = f"+proj=utm +zone={utm_zone} +{hemisphere} +ellps=WGS84 +datum=WGS84 +units=m +no_defs"
 
     # Initialize transformers for coordinate conversion
-    transformer_to_utm = Transformer.from_crs(crs_geo, crs_utm, always_xy=True)
+    transformer_to_utm = get_transformer(crs_geo, crs_utm)
 
     # Convert drone's location to UTM coordinates
     drone_easting, drone_northing = transformer_to_utm.transform(drone_lon, drone_lat)
 
-    translated_bbox = []
-    for point in bbox:
-        # Translate bounding box points based on drone's UTM coordinates
-        point_easting, point_northing = (
-            drone_easting + point[0],
-            drone_northing + point[1],
+    # Translate bounding box points based on drone's UTM coordinates
+    points = np.asarray(bbox, dtype=float).reshape(-1, 2)
+    return list(
+        zip(
+            (drone_easting + points[:, 0]).tolist(),
+            (drone_northing + points[:, 1]).tolist(),
         )
-        translated_bbox.append((point_easting, point_northing))
-
-    return translated_bbox
+    )
 
 
-def geographic_to_utm(lon, lat):
+def geographic_to_utm(lon, lat, epsg=4326):
     # print(lon, lat)
     utm_zone = int((lon + 180) / 6) + 1
     # print(utm_zone)
@@ -295,13 +331,12 @@ def geographic_to_utm(lon, lat):
     hemisphere_prefix = 326 if lat >= 0 else 327
     epsg_code = int(f"{hemisphere_prefix}{utm_zone}")
     # print(epsg_code)
-    crs_utm = CRS.from_epsg(epsg_code)
-    transformer = Transformer.from_crs(crs_utm, ImageClass.epsg, always_xy=True)
+    transformer = get_transformer(epsg_code, epsg)
     easting, northing = transformer.transform(lon, lat)
     return easting, northing, epsg_code, hemisphere
 
 
-def find_geodetic_intersections(bbox, drone_lon, drone_lat):
+def find_geodetic_intersections(bbox, drone_lon, drone_lat, epsg=4326):
     """
     Translates a bounding box to geographic coordinates based on the drone's location.
 
@@ -309,9 +344,10 @@ def find_geodetic_intersections(bbox, drone_lon, drone_lat):
     - bbox (list): List of bounding box coordinates in UTM.
     - drone_lon (float): Drone's longitude in decimal degrees.
     - drone_lat (float): Drone's latitude in decimal degrees.
+    - epsg (int): Unused; the output stays in UTM. Kept for call compatibility.
 
     Returns:
-    List of tuples containing translated bounding box points in geographic coordinates.
+    List of (easting, northing) tuples of the bounding box points in the drone's UTM zone.
     """
     # Determine UTM zone and hemisphere from drone's coordinates
     utm_zone = int((drone_lon + 180) / 6) + 1
@@ -319,26 +355,18 @@ def find_geodetic_intersections(bbox, drone_lon, drone_lat):
     crs_geo_in = "epsg:4326"
     crs_utm = f"+proj=utm +zone={utm_zone} +{hemisphere} +ellps=WGS84 +datum=WGS84 +units=m +no_defs"
 
-    # Initialize transformers for coordinate conversion
-    transformer_to_utm = Transformer.from_crs(crs_geo_in, crs_utm, always_xy=True)
-    transformer_to_geo = Transformer.from_crs(crs_utm, ImageClass.epsg, always_xy=True)
-
     # Convert drone's location to UTM coordinates
+    transformer_to_utm = get_transformer(crs_geo_in, crs_utm)
     drone_easting, drone_northing = transformer_to_utm.transform(drone_lon, drone_lat)
 
-    translated_bbox = []
-    for point in bbox:
-        # Translate and rotate bounding box points
-        point_easting, point_northing = (
-            drone_easting + point.x,
-            drone_northing + point.y,
+    # Translate bounding box points; the result stays in UTM
+    points = np.asarray(bbox, dtype=float).reshape(-1, 2)
+    translated_bbox = list(
+        zip(
+            (drone_easting + points[:, 0]).tolist(),
+            (drone_northing + points[:, 1]).tolist(),
         )
-
-        # Convert points back to geographic coordinates
-        point_lon, point_lat = transformer_to_geo.transform(
-            point_easting, point_northing
-        )
-        translated_bbox.append((point_easting, point_northing))
+    )
 
     return translated_bbox
 
@@ -351,8 +379,8 @@ def translate_to_geo_tgt(intersection, drone_lon, drone_lat):
     crs_utm = f"+proj=utm +zone={utm_zone} +{hemisphere} +ellps=WGS84 +datum=WGS84 +units=m +no_defs"
 
     # Initialize transformers for coordinate conversion
-    transformer_to_utm = Transformer.from_crs(crs_geo_in, crs_utm, always_xy=True)
-    transformer_to_geo = Transformer.from_crs(crs_utm, crs_geo_in, always_xy=True)
+    transformer_to_utm = get_transformer(crs_geo_in, crs_utm)
+    transformer_to_geo = get_transformer(crs_utm, crs_geo_in)
 
     # Convert drone's location to UTM coordinates
     drone_easting, drone_northing = transformer_to_utm.transform(drone_lon, drone_lat)
@@ -4,13 +4,14 @@
 # __version__ = "1.0"
 
 import os
-import csv
 import re
 import glob
 import warnings
 
 from typing import List, Optional, Literal, Tuple
 
+from .sensors import SensorDatabase
+
 
 def read_sensor_dimensions_from_csv(
     csv_filepath,
@@ -33,67 +34,15 @@ def read_sensor_dimensions_from_csv(
     Returns:
     - dict: A dictionary with (sensor model, rig camera index) as keys and sensor dimensions as values.
     """
-    sensor_dimensions = {}
-
-    try:
-        with open(csv_filepath, newline="", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-
-            for row in reader:
-                drone_make = row.get("DroneMake", "Unknown")
-                drone_model = row.get("DroneModel", "Unknown")
-                camera_make = row.get("CameraMake", "Unknown")
-                sensor_model = row.get("SensorModel", "default")
-
-                cam_index = row.get("RigCameraIndex", "default")
-                width = float(
-                    row.get("SensorWidth", default_sensor_width) or default_sensor_width
-                )
-                height = float(
-                    row.get("SensorHeight", default_sensor_height)
-                    or default_sensor_height
-                )
-                lens_FOVw = float(
-                    row.get("LensFOVw", default_lens_FOVw) or default_lens_FOVw
-                )
-                lens_FOVh = float(
-                    row.get("LensFOVh", default_lens_FOVh) or default_lens_FOVh
-                )
-
-                key = (sensor_model, str(cam_index))
-                sensor_dimensions[key] = (
-                    drone_make,
-                    drone_model,
-                    camera_make,
-                    sensor_model,
-                    str(cam_index),
-                    width,
-                    height,
-                    lens_FOVw,
-                    lens_FOVh,
-                )
-
-        # Ensure fallback default entry exists
-        if ("default", "default") not in sensor_dimensions:
-            sensor_dimensions[("default", "default")] = (
-                "Unknown",
-                "Unknown",
-                "Unknown",
-                "default",
-                "default",
-                default_sensor_width,
-                default_sensor_height,
-                default_lens_FOVw,
-                default_lens_FOVh,
-            )
-
-    except FileNotFoundError:
-        warnings.warn(f"Error: The file {csv_filepath} was not found.")
-
-    except Exception as e:
-        warnings.warn(f"An unexpected error occurred while reading {csv_filepath}: {e}")
-
-    return sensor_dimensions
+    return dict(
+        SensorDatabase.from_csv(
+            csv_filepath,
+            default_sensor_width,
+            default_sensor_height,
+            default_lens_FOVw,
+            default_lens_FOVh,
+        ).entries
+    )
 
 
 def _resolve_paths(
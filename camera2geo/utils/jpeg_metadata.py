@@ -0,0 +1,299 @@
+import os
+import re
+import struct
+
+from typing import Iterable
+from xml.etree import ElementTree
+
+from .metadata import IMAGE_METADATA_KEYS
+
+# Segments are skipped by seeking; give up on files whose metadata runs past this
+MAX_HEADER_BYTES = 1024 * 1024
+
+EXIF_HEADER = b"Exif\x00\x00"
+XMP_HEADER = b"http://ns.adobe.com/xap/1.0/\x00"
+
+# Numbers exiftool prints unquoted in its JSON output; everything else is a string
+_JSON_NUMBER = re.compile(r"^-?(\d|[1-9]\d{1,14})(\.\d{1,16})?(e[-+]?\d{1,3})?$", re.I)
+
+_TIFF_FORMATS = {
+    1: ("B", 1),
+    2: ("s", 1),
+    3: ("H", 2),
+    4: ("L", 4),
+    5: ("LL", 8),
+    6: ("b", 1),
+    7: ("s", 1),
+    8: ("h", 2),
+    9: ("l", 4),
+    10: ("ll", 8),
+    11: ("f", 4),
+    12: ("d", 8),
+}
+
+_IFD0_TAGS = {
+    0x0100: "ImageWidth",
+    0x0101: "ImageHeight",
+    0x010F: "Make",
+    0x0110: "Model",
+}
+_EXIF_TAGS = {
+    0x9003: "DateTimeOriginal",
+    0x9205: "MaxApertureValue",
+    0x920A: "FocalLength",
+    0xA002: "ExifImageWidth",
+    0xA003: "ExifImageHeight",
+    0xA405: "FocalLengthIn35mmFormat",
+}
+_GPS_TAGS = {
+    0x0001: "GPSLatitudeRef",
+    0x0002: "GPSLatitude",
+    0x0003: "GPSLongitudeRef",
+    0x0004: "GPSLongitude",
+    0x0005: "GPSAltitudeRef",
+    0x0006: "GPSAltitude",
+}
+_EXIF_IFD_POINTER = 0x8769
+_GPS_IFD_POINTER = 0x8825
+_MAKER_NOTE = 0x927C
+
+# XMP properties read by ImageClass; exiftool names them by their local name
+_XMP_TAGS = {
+    key.split(":", 1)[1] for key in IMAGE_METADATA_KEYS if key.startswith("XMP:")
+}
+
+# XMP tags that take priority over every MakerNotes fallback in ImageClass
+_MAKER_NOTE_OVERRIDES = (
+    "XMP:GimbalRollDegree",
+    "XMP:GimbalPitchDegree",
+    "XMP:GimbalYawDegree",
+    "XMP:FlightPitchDegree",
+    "XMP:FlightRollDegree",
+    "XMP:FlightYawDegree",
+)
+
+
+def read_jpeg_metadata(
+    path: str, tags: Iterable[str] = IMAGE_METADATA_KEYS
+) -> dict | None:
+    """
+    Read EXIF, GPS and XMP metadata straight from the APP1 segments of a JPEG, without starting exiftool. Keys and values match `exiftool -G -n -j` so the result can stand in for `ExifToolHelper.get_tags`.
+
+    Args:
+        path (str): Image path.
+        tags (Iterable[str]): Group-qualified tags to return.
+
+    Returns:
+        dict | None: Metadata with "SourceFile" and the requested tags that are present, or None when the file is not a JPEG, cannot be parsed, or needs values only exiftool can provide (such as MakerNotes fallbacks).
+    """
+    try:
+        tiff, xmp = _read_app1(path)
+        if tiff is None:
+            return None
+        ifds = _read_ifds(tiff)
+    except (OSError, ValueError, struct.error, ElementTree.ParseError):
+        return None
+
+    metadata = {"File:FileName": os.path.basename(path)}
+    metadata.update(_exif_metadata(*ifds))
+    metadata.update({f"XMP:{name}": value for name, value in xmp.items()})
+
+    if not _is_complete(metadata, has_maker_note=_MAKER_NOTE in ifds[1]):
+        return None
+
+    result = {"SourceFile": str(path)}
+    for tag in tags:
+        if tag in metadata:
+            result[tag] = metadata[tag]
+    return result
+
+
+def _is_complete(metadata: dict, has_maker_note: bool) -> bool:
+    """
+    Whether exiftool could not produce a different value for any tag ImageClass relies on.
+    """
+
+    def has(*keys):
+        return any(metadata.get(k) not in (None, "") for k in keys)
+
+    if not (
+        has("EXIF:GPSLatitude")
+        and has("EXIF:GPSLongitude")
+        and has("EXIF:FocalLength")
+        and has("EXIF:FocalLengthIn35mmFormat")
+        and has("EXIF:ImageWidth", "EXIF:ExifImageWidth")
+        and has("EXIF:ImageHeight", "EXIF:ExifImageHeight")
+        and has("XMP:RelativeAltitude", "Composite:GPSAltitude")
+        and has("XMP:AbsoluteAltitude", "Composite:GPSAltitude")
+    ):
+        return False
+    # MakerNotes are only consulted when the XMP value is missing
+    return not has_maker_note or all(has(key) for key in _MAKER_NOTE_OVERRIDES)
+
+
+def _read_app1(path: str) -> tuple:
+    """
+    Collect the EXIF TIFF block and XMP properties from the APP1 segments before the image data.
+
+    Returns:
+        tuple: (TIFF bytes or None, dict of XMP properties).
+    """
+    exif = None
+    xmp = {}
+    with open(path, "rb") as f:
+        if f.read(2) != b"\xff\xd8":
+            raise ValueError("not a JPEG")
+        while f.tell() < MAX_HEADER_BYTES:
+            marker = f.read(2)
+            if len(marker) < 2 or marker[0] != 0xFF:
+                raise ValueError("corrupt JPEG marker")
+            # Fill bytes before a marker
+            while marker[1] == 0xFF:
+                marker = marker[1:] + f.read(1)
+            if marker[1] in (0xD9, 0xDA):
+                break
+            if 0xD0 <= marker[1] <= 0xD7 or marker[1] == 0x01:
+                continue
+            (length,) = struct.unpack(">H", f.read(2))
+            if marker[1] != 0xE1:
+                f.seek(length - 2, os.SEEK_CUR)
+                continue
+            segment = f.read(length - 2)
+            if segment.startswith(EXIF_HEADER) and exif is None:
+                exif = segment[len(EXIF_HEADER) :]
+            elif segment.startswith(XMP_HEADER):
+                for name, value in _xmp_properties(segment[len(XMP_HEADER) :]):
+                    xmp.setdefault(name, value)
+    return exif, xmp
+
+
+def _xmp_properties(packet: bytes):
+    """
+    Yield (local name, value) of the XMP properties read by ImageClass, stored either as rdf:Description attributes or as simple child elements.
+    """
+    root = ElementTree.fromstring(packet.strip(b"\x00 \r\n\t"))
+    for element in root.iter():
+        for key, value in element.attrib.items():
+            name = key.rsplit("}", 1)[-1]
+            if name in _XMP_TAGS:
+                yield name, _json_value(value)
+        name = element.tag.rsplit("}", 1)[-1]
+        if name in _XMP_TAGS and len(element) == 0 and element.text:
+            yield name, _json_value(element.text.strip())
+
+
+def _exif_metadata(ifd0: dict, exif_ifd: dict, gps: dict) -> dict:
+    """
+    Convert the EXIF and GPS tags read by ImageClass like exiftool's ValueConv, including the signed Composite GPS tags.
+    """
+    metadata = {}
+
+    for name, value in [
+        *((_IFD0_TAGS[t], v) for t, v in ifd0.items() if t in _IFD0_TAGS),
+        *((_EXIF_TAGS[t], v) for t, v in exif_ifd.items() if t in _EXIF_TAGS),
+    ]:
+        if name == "MaxApertureValue":
+            value = _number(2 ** (_scalar(value) / 2))
+        elif isinstance(value, str):
+            value = _json_value(value)
+        else:
+            value = _number(_scalar(value))
+        metadata[f"EXIF:{name}"] = value
+
+    gps = {_GPS_TAGS[t]: v for t, v in gps.items() if t in _GPS_TAGS}
+    for axis in ("Latitude", "Longitude"):
+        if f"GPS{axis}" not in gps:
+            continue
+        d, m, s = (list(gps[f"GPS{axis}"]) + [0.0, 0.0])[:3]
+        # Same operation order as exiftool's ToDegrees
+        degrees = _number(d + (m + s / 60) / 60)
+        metadata[f"EXIF:GPS{axis}"] = degrees
+        ref = gps.get(f"GPS{axis}Ref")
+        if ref:
+            sign = -1 if ref[:1].upper() in ("S", "W") else 1
+            metadata[f"EXIF:GPS{axis}Ref"] = ref[:1]
+            metadata[f"Composite:GPS{axis}"] = sign * degrees
+    if "GPSAltitude" in gps:
+        altitude = _number(_scalar(gps["GPSAltitude"]))
+        metadata["EXIF:GPSAltitude"] = altitude
+        below_sea_level = _scalar(gps.get("GPSAltitudeRef", 0)) == 1
+        metadata["Composite:GPSAltitude"] = -altitude if below_sea_level else altitude
+    return metadata
+
+
+def _read_ifds(tiff: bytes) -> tuple:
+    """
+    Parse IFD0, the Exif IFD and the GPS IFD of a TIFF block into {tag: value} dicts.
+    """
+    if tiff[:2] == b"II":
+        order = "<"
+    elif tiff[:2] == b"MM":
+        order = ">"
+    else:
+        raise ValueError("bad TIFF byte order")
+    (ifd0_offset,) = struct.unpack(order + "L", tiff[4:8])
+
+    ifd0 = _read_ifd(tiff, ifd0_offset, order)
+    exif_ifd = gps = {}
+    if _EXIF_IFD_POINTER in ifd0:
+        exif_ifd = _read_ifd(tiff, _scalar(ifd0[_EXIF_IFD_POINTER]), order)
+    if _GPS_IFD_POINTER in ifd0:
+        gps = _read_ifd(tiff, _scalar(ifd0[_GPS_IFD_POINTER]), order)
+    return ifd0, exif_ifd, gps
+
+
+def _read_ifd(tiff: bytes, offset: int, order: str) -> dict:
+    (count,) = struct.unpack(order + "H", tiff[offset : offset + 2])
+    entries = {}
+    for i in range(count):
+        entry = offset + 2 + 12 * i
+        tag, fmt, n = struct.unpack(order + "HHL", tiff[entry : entry + 8])
+        if fmt not in _TIFF_FORMATS:
+            continue
+        code, size = _TIFF_FORMATS[fmt]
+        total = size * n
+        if total <= 4:
+            start = entry + 8
+        else:
+            (start,) = struct.unpack(order + "L", tiff[entry + 8 : entry + 12])
+        data = tiff[start : start + total]
+        if len(data) < total:
+            raise ValueError("truncated TIFF entry")
+
+        if tag == _MAKER_NOTE:
+            entries[tag] = True
+        elif fmt == 2:
+            # exiftool drops everything from the first null
+            entries[tag] = data.split(b"\x00", 1)[0].decode("utf-8", "replace")
+        elif fmt == 7:
+            entries[tag] = data
+        elif fmt in (5, 10):
+            values = struct.unpack(f"{order}{2 * n}{code[0]}", data)
+            entries[tag] = tuple(
+                num / den if den else float("inf") if num else 0.0
+                for num, den in zip(values[::2], values[1::2])
+            )
+        else:
+            entries[tag] = struct.unpack(f"{order}{n}{code}", data)
+    return entries
+
+
+def _scalar(value):
+    if isinstance(value, (tuple, list)):
+        return value[0]
+    return value
+
+
+def _number(value):
+    """
+    Round-trip a number through exiftool's 15 significant digit output.
+    """
+    text = f"{value:.15g}"
+    return _json_value(text) if _JSON_NUMBER.match(text) else float(text)
+
+
+def _json_value(text: str):
+    if _JSON_NUMBER.match(text):
+        number = float(text)
+        return int(number) if number.is_integer() and "." not in text else number
+    return text
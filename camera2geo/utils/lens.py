@@ -0,0 +1,265 @@
+import math
+import threading
+import warnings
+
+import cv2
+import lensfunpy
+import numpy as np
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+
+LENS_CACHE_MB: int = 512
+
+# Focus distances are bucketed in steps of 10 percent; distortion changes far less in between
+DISTANCE_STEP = 1.1
+
+# Pixel spacing of LensNodes; distortion is interpolated bilinearly in between
+LENS_NODE_STEP = 8
+
+
+@lru_cache(maxsize=1)
+def lensfun_database() -> lensfunpy.Database:
+    """
+    The lensfun database, loaded once per process.
+    """
+    return lensfunpy.Database()
+
+
+@lru_cache(maxsize=256)
+def lens_profile(cam_maker: str, cam_model: str) -> tuple | None:
+    """
+    Lensfun camera and lens of a camera make and model, or None if the database has no match.
+    """
+    db = lensfun_database()
+    cameras = db.find_cameras(cam_maker, cam_model, True)
+    if not cameras:
+        return None
+    lenses = db.find_lenses(cameras[0], cam_maker, cam_model, True)
+    if not lenses:
+        return None
+    return cameras[0], lenses[0]
+
+
+def distance_bucket(distance: float | None) -> float | None:
+    """
+    Focus distance rounded to its bucket, so images of a flight at similar heights share one map.
+    """
+    if distance is None or not distance > 0:
+        return distance
+    return DISTANCE_STEP ** round(math.log(distance, DISTANCE_STEP))
+
+
+@dataclass(frozen=True)
+class LensNodes:
+    """
+    Undistortion displacement sampled every LENS_NODE_STEP pixels plus the last row and column. Lens distortion is smooth, so interpolating these nodes bilinearly stands in for the full-size maps.
+    """
+
+    nodes_x: np.ndarray
+    nodes_y: np.ndarray
+    displacement: np.ndarray
+
+    @property
+    def nbytes(self) -> int:
+        return self.nodes_x.nbytes + self.nodes_y.nbytes + self.displacement.nbytes
+
+
+class LensMapCache:
+    """
+    Undistortion maps in cv2's fixed-point CV_16SC2 format, and their LensNodes, shared by every image taken with the same camera, lens, focal length, aperture, focus distance bucket and size. Entries are built on first use and evicted least recently used first once they exceed `cache_mb`.
+    """
+
+    def __init__(self, cache_mb: int = LENS_CACHE_MB):
+        self.cache_bytes = cache_mb * 1024 * 1024
+        self.hits = 0
+        self.misses = 0
+        self._maps = OrderedDict()
+        self._cached_bytes = 0
+        # Events of entries being built, so each is built by one thread only
+        self._building = {}
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        cam_maker: str,
+        cam_model: str,
+        focal_length: float,
+        aperture: float,
+        distance: float | None,
+        width: int,
+        height: int,
+    ) -> tuple | None:
+        """
+        Undistortion maps for one image size and camera setting.
+
+        Returns:
+            tuple | None: (map1, map2) for `cv2.remap`, or None if the camera is not in the lensfun database.
+        """
+        return self._lookup(
+            _build_maps,
+            cam_maker,
+            cam_model,
+            focal_length,
+            aperture,
+            distance,
+            width,
+            height,
+        )
+
+    def nodes(
+        self,
+        cam_maker: str,
+        cam_model: str,
+        focal_length: float,
+        aperture: float,
+        distance: float | None,
+        width: int,
+        height: int,
+    ) -> LensNodes | None:
+        """
+        Undistortion displacement nodes for one image size and camera setting. Only the node rows are computed, so no full-size map is ever allocated.
+
+        Returns:
+            LensNodes | None: Nodes, or None if the camera is not in the lensfun database.
+        """
+        return self._lookup(
+            _build_nodes,
+            cam_maker,
+            cam_model,
+            focal_length,
+            aperture,
+            distance,
+            width,
+            height,
+        )
+
+    def _lookup(
+        self,
+        build,
+        cam_maker,
+        cam_model,
+        focal_length,
+        aperture,
+        distance,
+        width,
+        height,
+    ):
+        distance = distance_bucket(distance)
+        key = (
+            build.__name__,
+            cam_maker,
+            cam_model,
+            focal_length,
+            aperture,
+            distance,
+            width,
+            height,
+        )
+        while True:
+            with self._lock:
+                entry = self._maps.get(key)
+                if entry is not None:
+                    self._maps.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+
+                profile = lens_profile(cam_maker, cam_model)
+                if profile is None:
+                    return None
+                building = self._building.get(key)
+                if building is None:
+                    self._building[key] = building = threading.Event()
+                    self.misses += 1
+                    break
+            # Another thread builds this entry; look again once it is done
+            building.wait()
+
+        # Built outside the lock so other entries are served meanwhile
+        try:
+            camera, lens = profile
+            modifier = lensfunpy.Modifier(lens, camera.crop_factor, width, height)
+            modifier.initialize(focal_length, aperture, distance)
+            value, nbytes = build(modifier, width, height)
+
+            with self._lock:
+                self._maps[key] = (value, nbytes)
+                self._cached_bytes += nbytes
+                # Keep at least the newest entry even if it exceeds the cap
+                while self._cached_bytes > self.cache_bytes and len(self._maps) > 1:
+                    _, (_, evicted) = self._maps.popitem(last=False)
+                    self._cached_bytes -= evicted
+            return value
+        finally:
+            with self._lock:
+                del self._building[key]
+            building.set()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._maps)
+
+
+def _build_maps(modifier, width: int, height: int) -> tuple:
+    coordinates = modifier.apply_geometry_distortion()
+    # Converted as one two-channel map, so no per-axis float copies are made
+    maps = cv2.convertMaps(coordinates, None, cv2.CV_16SC2)
+    return maps, sum(m.nbytes for m in maps)
+
+
+def _build_nodes(modifier, width: int, height: int) -> tuple:
+    nodes_x = np.unique(np.append(np.arange(0, width, LENS_NODE_STEP), width - 1))
+    nodes_y = np.unique(np.append(np.arange(0, height, LENS_NODE_STEP), height - 1))
+    rows = [
+        modifier.apply_geometry_distortion(0, y, width, 1)[0, nodes_x] for y in nodes_y
+    ]
+    grid = np.stack(np.meshgrid(nodes_x, nodes_y), axis=-1)
+    nodes = LensNodes(nodes_x, nodes_y, (np.stack(rows) - grid).astype(np.float32))
+    return nodes, nodes.nbytes
+
+
+@lru_cache(maxsize=4)
+def get_lens_map_cache(cache_mb: int = LENS_CACHE_MB) -> LensMapCache:
+    """
+    Return the shared LensMapCache of this process for a memory cap.
+    """
+    return LensMapCache(cache_mb)
+
+
+def image_lens_maps(image, width: int, height: int) -> tuple | None:
+    """
+    Cached undistortion maps of an ImageClass's camera setting at a decoded image size, warning if the camera has no lensfun profile.
+
+    Returns:
+        tuple | None: (map1, map2) for `cv2.remap`, or None if the camera is not in the lensfun database.
+    """
+    return _image_lens(
+        image, get_lens_map_cache(image.settings.lens_cache_mb).get, width, height
+    )
+
+
+def image_lens_nodes(image, width: int, height: int) -> LensNodes | None:
+    """
+    Cached undistortion nodes of an ImageClass's camera setting at a decoded image size, warning if the camera has no lensfun profile.
+    """
+    return _image_lens(
+        image, get_lens_map_cache(image.settings.lens_cache_mb).nodes, width, height
+    )
+
+
+def _image_lens(image, lookup, width: int, height: int):
+    value = lookup(
+        image.camera_make,
+        image.sensor_model,
+        image.focal_length,
+        image.max_aperture_value,
+        image.center_distance,
+        width,
+        height,
+    )
+    if value is None:
+        warnings.warn(
+            f"Cannot correct lens distortion of {image.image_path}: no lensfun profile for {image.camera_make} {image.sensor_model}."
+        )
+    return value
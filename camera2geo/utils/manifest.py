@@ -0,0 +1,152 @@
+import os
+import json
+import hashlib
+import warnings
+
+from dataclasses import asdict
+from pathlib import Path
+
+from .metadata import IMAGE_METADATA_KEYS, RunSettings
+from .sensors import SensorDatabase
+
+MANIFEST_NAME = "camera2geo_manifest.json"
+MANIFEST_VERSION = 2
+
+# RunSettings fields that only affect speed or memory, never the output
+PERFORMANCE_SETTINGS = {"dsm_cache_mb", "elevation_cache", "lens_cache_mb"}
+
+
+def settings_fingerprint(
+    settings: RunSettings,
+    sensors: SensorDatabase,
+    sensor_width_mm: float | None = None,
+    sensor_height_mm: float | None = None,
+) -> str:
+    """
+    Hash every run-wide setting that affects output pixels or footprints.
+
+    Args:
+        settings (RunSettings): Run settings passed to each image.
+        sensors (SensorDatabase): Sensor table loaded from the sensor info CSV.
+        sensor_width_mm (float | None): Sensor width override.
+        sensor_height_mm (float | None): Sensor height override.
+
+    Returns:
+        str: Hex digest identifying the settings.
+    """
+    dsm_stat = None
+    if settings.dsm_path and os.path.exists(settings.dsm_path):
+        stat = os.stat(settings.dsm_path)
+        dsm_stat = [stat.st_size, stat.st_mtime_ns]
+
+    payload = {
+        "settings": {
+            k: v for k, v in asdict(settings).items() if k not in PERFORMANCE_SETTINGS
+        },
+        "dsm": dsm_stat,
+        "sensor_width_mm": sensor_width_mm,
+        "sensor_height_mm": sensor_height_mm,
+        "sensor_dimensions": sorted(
+            [list(key), list(value)] for key, value in sensors.entries.items()
+        ),
+    }
+    return _hash(payload)
+
+
+def image_fingerprint(input_path: str, metadata: dict, settings_hash: str) -> dict:
+    """
+    Describe an input image and the settings it is converted with.
+
+    Args:
+        input_path (str): Path to the input image.
+        metadata (dict): Metadata of the image as returned by exiftool.
+        settings_hash (str): Digest from `settings_fingerprint`.
+
+    Returns:
+        dict: File size, modification time, metadata digest and settings digest.
+    """
+    try:
+        stat = os.stat(input_path)
+        size, mtime_ns = stat.st_size, stat.st_mtime_ns
+    except OSError:
+        size = mtime_ns = None
+    return {
+        "size": size,
+        "mtime_ns": mtime_ns,
+        "metadata": _hash({k: metadata.get(k) for k in IMAGE_METADATA_KEYS}),
+        "settings": settings_hash,
+    }
+
+
+class RunManifest:
+    """
+    Sidecar JSON files, one per output directory, recording the fingerprint and footprint of each output written by a previous run.
+    """
+
+    def __init__(self, output_paths: list):
+        # Load every manifest up front so lookups never modify shared state
+        self._manifests = {
+            directory: _load_entries(directory / MANIFEST_NAME)
+            for directory in {Path(p).parent for p in output_paths}
+        }
+        self._dirty = set()
+
+    def lookup(self, output_path: str, fingerprint: dict) -> dict | None:
+        """
+        Return the recorded entry for `output_path` if it exists on disk and was produced from an identical fingerprint, otherwise None.
+        """
+        if not os.path.exists(output_path):
+            return None
+        entries = self._manifests.get(Path(output_path).parent, {})
+        entry = entries.get(Path(output_path).name)
+        if entry is None or entry.get("fingerprint") != fingerprint:
+            return None
+        return entry
+
+    def record(self, output_path: str, fingerprint: dict, footprint: list):
+        """
+        Record a freshly written output. Call `save` to write the changes to disk.
+        """
+        directory = Path(output_path).parent
+        self._manifests.setdefault(directory, {})[Path(output_path).name] = {
+            "fingerprint": fingerprint,
+            "footprint": [list(point) for point in footprint],
+        }
+        self._dirty.add(directory)
+
+    def save(self):
+        """
+        Write every modified manifest to its output directory.
+        """
+        for directory in self._dirty:
+            path = directory / MANIFEST_NAME
+            tmp_path = path.with_name(f".{MANIFEST_NAME}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(
+                    {
+                        "version": MANIFEST_VERSION,
+                        "entries": self._manifests[directory],
+                    },
+                    f,
+                )
+            os.replace(tmp_path, path)
+        self._dirty.clear()
+
+
+def _load_entries(path: Path) -> dict:
+    if not path.exists():
+        return {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        warnings.warn(f"Ignoring unreadable manifest {path}: {e}")
+        return {}
+    if data.get("version") != MANIFEST_VERSION:
+        return {}
+    return data.get("entries", {})
+
+
+def _hash(payload) -> str:
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
@@ -1,225 +1,407 @@
 import warnings
-import magnetismi.magnetismi as api
+import numpy as np
 
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import ClassVar
 from datetime import datetime
-from magnetic_field_calculator import MagneticFieldCalculator
+from typing import Iterable
 from shapely.geometry import Polygon, mapping
 from shapely.geometry.polygon import orient
 
+from .declination import get_declination_service
+from .elevation_client import DEFAULT_ELEVATION_URL
+from .sensors import SensorDatabase
+from .timing import timed
+
+# Metadata keys read by ImageClass, in priority order per value
+IMAGE_METADATA_KEYS = (
+    "File:FileName",
+    "Composite:GPSLatitude",
+    "EXIF:GPSLatitude",
+    "Composite:GPSLongitude",
+    "EXIF:GPSLongitude",
+    "EXIF:FocalLength",
+    "EXIF:FocalLengthIn35mmFormat",
+    "XMP:RelativeAltitude",
+    "XMP:AbsoluteAltitude",
+    "Composite:GPSAltitude",
+    "XMP:GimbalRollDegree",
+    "MakerNotes:CameraRoll",
+    "XMP:Roll",
+    "XMP:GimbalPitchDegree",
+    "MakerNotes:CameraPitch",
+    "XMP:Pitch",
+    "XMP:GimbalYawDegree",
+    "MakerNotes:CameraYaw",
+    "XMP:Yaw",
+    "XMP:FlightPitchDegree",
+    "MakerNotes:Pitch",
+    "XMP:FlightRollDegree",
+    "MakerNotes:Roll",
+    "XMP:FlightYawDegree",
+    "MakerNotes:Yaw",
+    "EXIF:ImageWidth",
+    "EXIF:ExifImageWidth",
+    "EXIF:ImageHeight",
+    "EXIF:ExifImageHeight",
+    "EXIF:MaxApertureValue",
+    "EXIF:DateTimeOriginal",
+    "EXIF:Model",
+    "XMP:RigCameraIndex",
+    "XMP:SensorIndex",
+)
+
+
+@dataclass(frozen=True)
+class RunSettings:
+    """
+    Run-wide options shared by every image. Passed explicitly to each image so runs can be split across worker processes.
+    """
+
+    epsg: int = 4326
+    correct_magnetic_declination: bool = False
+    cog: bool = False
+    image_equalize: bool = False
+    lens_correction: bool = False
+    elevation_mode: str = "plane"
+    dsm_path: str | None = None
+    elevation_url: str = DEFAULT_ELEVATION_URL
+    elevation_cache: str | None = None
+    dsm_cache_mb: int = 256
+    lens_cache_mb: int = 512
+    footprint_samples: int = 1
+    fused_warp: bool = False
+    resolution_m: float | None = None
+    gsd_multiple: float | None = None
+    preview: int | None = None
+    memory_budget_mb: int | None = None
+
+
+def resolve_elevation_source(elevation_data: str | bool) -> tuple:
+    """
+    Map the user-facing `elevation_data` option to an elevation mode and DSM path.
+
+    Args:
+        elevation_data (str | bool): False for no elevation, True for the online elevation service, or a local DSM path.
+
+    Returns:
+        tuple: (elevation mode, DSM path or None).
+    """
+    if elevation_data is False:
+        return "none", None
+    if elevation_data is True:
+        return "online", None
+    if isinstance(elevation_data, str):
+        return "local", elevation_data
+    raise ValueError("elevation_data must be False, True, or a filesystem path string.")
+
 
 @dataclass
-class ImageClass:
-    # Class vars
-    epsg: ClassVar[int] = 4326
-    correct_magnetic_declination: ClassVar[bool] = False
-    cog: ClassVar[bool] = False
-    image_equalize: ClassVar[bool] = False
-    lens_correction: ClassVar[bool] = False
-    elevation_mode: ClassVar[str] = "plane"
-    dsm_path: ClassVar[str | None] = None
-    global_elevation: ClassVar[bool] = False
-
-    # Instance vars
-    metadata: dict
-    sensor_dimensions: dict
-    declination: float = None
-    drone_hash: int = None
-    feature_point: dict = field(default_factory=dict)
-    feature_polygon: dict = field(default_factory=dict)
-    properties: dict = field(default_factory=dict)
-    coord_array: list = field(default_factory=list)
-    footprint_coordinates: list = field(default_factory=list)
-    image_path: str = ""
-    output_file: str = ""
-    geotiff_file: str = ""
-
-    def __post_init__(self):
-        self.file_name = str(self.metadata.get("File:FileName"))
-
-        # Extract detailed sensor and drone info for the current image
-        # Extracting latitude, longitude, and altitude details
-        self.latitude = float(
-            self.metadata.get("Composite:GPSLatitude")
-            or self.metadata.get("EXIF:GPSLatitude")
-        )
-        self.longitude = float(
-            self.metadata.get("Composite:GPSLongitude")
-            or self.metadata.get("EXIF:GPSLongitude")
-        )
-        self.focal_length = float(self.metadata.get("EXIF:FocalLength"))
-        self.focal_length35mm = float(self.metadata.get("EXIF:FocalLengthIn35mmFormat"))
+class ImageResult:
+    """
+    Outcome of converting a single image.
+    """
 
-        self.relative_altitude = float(
-            self.metadata.get("XMP:RelativeAltitude")
-            or self.metadata.get("Composite:GPSAltitude")
-        )
-        self.absolute_altitude = float(
-            self.metadata.get("XMP:AbsoluteAltitude")
-            or self.metadata.get("Composite:GPSAltitude")
-        )
+    input_path: str
+    output_path: str
+    footprint: list = field(default_factory=list)
+    seconds: float = 0.0
+    error: str | None = None
+    skipped: bool = False
+    timings: dict = field(default_factory=dict)
 
-        # Extracting gimbal and flight orientation details
-        self.gimbal_roll_degree = _get_float(
-            self.metadata, "XMP:GimbalRollDegree", "MakerNotes:CameraRoll", "XMP:Roll"
-        )
-        self.gimbal_pitch_degree = _get_float(
-            self.metadata,
-            "XMP:GimbalPitchDegree",
-            "MakerNotes:CameraPitch",
-            "XMP:Pitch",
-        )
-        self.gimbal_yaw_degree = _get_float(
-            self.metadata, "XMP:GimbalYawDegree", "MakerNotes:CameraYaw", "XMP:Yaw"
-        )
 
-        self.flight_pitch_degree = _get_float(
-            self.metadata, "XMP:FlightPitchDegree", "MakerNotes:Pitch", default=999
-        )
-        self.flight_roll_degree = _get_float(
-            self.metadata, "XMP:FlightRollDegree", "MakerNotes:Roll", default=999
-        )
-        self.flight_yaw_degree = _get_float(
-            self.metadata, "XMP:FlightYawDegree", "MakerNotes:Yaw", default=999
-        )
+# Per-image values parsed from metadata, one NumPy array each in a FlightTable
+FLOAT_COLUMNS = (
+    "latitude",
+    "longitude",
+    "focal_length",
+    "focal_length35mm",
+    "relative_altitude",
+    "absolute_altitude",
+    "gimbal_roll_degree",
+    "gimbal_pitch_degree",
+    "gimbal_yaw_degree",
+    "flight_pitch_degree",
+    "flight_roll_degree",
+    "flight_yaw_degree",
+)
+INT_COLUMNS = ("image_width", "image_height")
+OBJECT_COLUMNS = (
+    "file_name",
+    "max_aperture_value",
+    "datetime_original",
+    "sensor_model_data",
+    "sensor_index",
+)
+# Fields of a sensor info tuple from the sensor info CSV
+SENSOR_FIELDS = (
+    "drone_make",
+    "drone_model",
+    "camera_make",
+    "sensor_model",
+    "cam_index",
+    "sensor_width",
+    "sensor_height",
+    "lens_FOV_width",
+    "lens_FOV_height",
+)
 
-        # Extracting image and sensor details
-        self.image_width = int(
-            self.metadata.get("EXIF:ImageWidth")
-            or self.metadata.get("EXIF:ExifImageWidth")
-        )  # pixels
-        self.image_height = int(
-            self.metadata.get("EXIF:ImageHeight")
-            or self.metadata.get("EXIF:ExifImageHeight")
-        )  # pixels
-        self.max_aperture_value = self.metadata.get("EXIF:MaxApertureValue")
-        # date/time of original image capture
-        self.datetime_original = self.metadata.get("EXIF:DateTimeOriginal")
-        # Get sensor model and rig camera index from metadata
-        self.sensor_model_data = self.metadata.get("EXIF:Model")
-        self.sensor_index = str(
-            self.metadata.get("XMP:RigCameraIndex")
-            or self.metadata.get("XMP:SensorIndex")
-        )
-        self.sensor_make = ""
-
-        if self.sensor_model_data:
-            # Prioritize direct match with sensor model and rig camera index
-            key = (self.sensor_model_data, self.sensor_index)
-            self.sensor_info = self.sensor_dimensions.get((key))
-            # from IPython import embed; embed()
-            # If no direct match, try just with sensor model (for cases without multiple entries)
-            if self.sensor_info is None:
-                self.sensor_info = next(
-                    (
-                        value
-                        for (model, idx), value in self.sensor_dimensions.items()
-                        if model == self.sensor_model_data
-                    ),
-                    None,
-                )
-        else:
-            # Use default when sensor_model_data is 'default'
-            self.sensor_info = self.sensor_dimensions.get(("default", "nan"))
 
-        # Ensure we have valid sensor_info; otherwise, log error or take necessary action
-        if not self.sensor_info:
-            #            logger.error(
+@dataclass
+class FlightTable:
+    """
+    Columnar per-image values of a set of images: one NumPy array per value, plus each image's index into the distinct sensors of the set. Rows are parsed from metadata once and the raw metadata dicts are not kept; `image(i)` returns a lightweight ImageClass view of a row.
+    """
 
-            print(
-                f"No sensor information found for {self.file_name} with sensor model {self.sensor_model_data} and rig camera index {self.sensor_index}. Using defaults."
+    columns: dict
+    sensors: list
+    sensor: np.ndarray
+    errors: list
+    settings: RunSettings = field(default_factory=RunSettings)
+
+    @classmethod
+    def from_metadata(
+        cls,
+        metadata: Iterable[dict],
+        sensor_database: SensorDatabase | dict,
+        settings: RunSettings = RunSettings(),
+    ) -> "FlightTable":
+        """
+        Parse metadata dicts into columns. Rows that cannot be parsed keep their exception in `errors` and hold placeholder values.
+
+        Args:
+            metadata (Iterable[dict]): Metadata of each image, as read by exiftool.
+            sensor_database (SensorDatabase | dict): Sensor database, or sensor info tuples per (sensor model, rig camera index).
+            settings (RunSettings): Run settings shared by every image.
+
+        Returns:
+            FlightTable: One row per metadata dict, in input order.
+        """
+        if isinstance(sensor_database, dict):
+            sensor_database = SensorDatabase(sensor_database)
+        rows = []
+        errors = []
+        sensors = []
+        sensor_ids = []
+        # Sensor id, or the lookup error, per (model, rig camera index)
+        lookups = {}
+        for md in metadata:
+            try:
+                row = _parse_row(md)
+            except Exception as e:
+                row, sensor_id = {}, e
+            else:
+                key = (row["sensor_model_data"], row["sensor_index"])
+                if key not in lookups:
+                    lookups[key] = _lookup_sensor(row, sensor_database, sensors)
+                sensor_id = lookups[key]
+            failed = isinstance(sensor_id, Exception)
+            rows.append(row)
+            sensor_ids.append(-1 if failed else sensor_id)
+            errors.append(sensor_id if failed else None)
+
+        columns = {}
+        for names, dtype, empty in (
+            (FLOAT_COLUMNS, float, np.nan),
+            (INT_COLUMNS, np.int64, 0),
+            (OBJECT_COLUMNS, object, None),
+        ):
+            for name in names:
+                columns[name] = np.array(
+                    [row.get(name, empty) for row in rows], dtype=dtype
+                )
+        sensor = np.array(sensor_ids, dtype=np.int32)
+
+        # Sensor dimensions per image; the extra last row serves sensor id -1
+        dimensions = np.array([info[5:9] for info in sensors] + [[np.nan] * 4])
+        sensor_values = dimensions[sensor]
+        for i, name in enumerate(SENSOR_FIELDS[5:9]):
+            columns[name] = sensor_values[:, i]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # GSD over whole columns
+            denominator = columns["focal_length"] * columns["image_width"]
+            columns["gsd"] = (
+                columns["sensor_width"] * columns["relative_altitude"] / denominator
             )
-            self.sensor_info = self.sensor_dimensions.get(("default", "nan"))
-
-        self.drone_make = self.sensor_info[0]
-        self.drone_model = self.sensor_info[1]
-        self.camera_make = self.sensor_info[2]
-        self.sensor_model = self.sensor_info[3]
-        self.cam_index = self.sensor_info[4]
-        self.sensor_width = self.sensor_info[5]
-        self.sensor_height = self.sensor_info[6]
-        self.lens_FOV_width = self.sensor_info[7]
-        self.lens_FOV_height = self.sensor_info[8]
-
-        # Special case
-        if self.sensor_model in ["FC2103", "FC220", "FC300X", "FC200"]:
-            self.sensor_model = f"{self.drone_model} {self.sensor_model}"
-
-        if self.sensor_model and self.drone_make is None:
-            self.drone_model = ""
-            self.drone_make = "Unknown Drone"
-
-        self.gsd = (self.sensor_width * self.relative_altitude) / (
-            self.focal_length * self.image_width
+        columns["capture_time"] = np.array(
+            [_capture_time(value) for value in columns["datetime_original"]],
+            dtype="datetime64[s]",
         )
-        self.create_properties()
-        self.create_hash()
+        for i in np.flatnonzero(denominator == 0):
+            if errors[i] is None:
+                errors[i] = ZeroDivisionError("float division by zero")
 
-    # def find_declination(altitude, focal_length, drone_latitude, drone_longitude, datetime_original):
-    def find_declination(self):
-        str_date = datetime.strptime(self.datetime_original, "%Y:%m:%d %H:%M:%S")
-
-        if str(str_date.year) > str(2019):
-            mag_date = api.dti.date(str_date.year, str_date.month, str_date.day)
-            # Find the magnetic declination reference
-            model = api.Model(mag_date.year)
-            field_point = model.at(
-                lat_dd=self.latitude,
-                lon_dd=self.longitude,
-                alt_ft=self.relative_altitude,
-                date=mag_date,
-            )
-            declination = field_point.dec
-        else:
-            calculator = MagneticFieldCalculator()
-            model = calculator.calculate(
-                latitude=self.latitude, longitude=self.longitude
-            )
-            dec = model["field-value"]["declination"]
-            declination = dec["value"]
+        columns["drone_hash"] = np.array(
+            [
+                _drone_hash(sensors[s], focal, aperture) if s >= 0 else 0
+                for s, focal, aperture in zip(
+                    sensor_ids,
+                    columns["focal_length"],
+                    columns["max_aperture_value"],
+                )
+            ],
+            dtype=np.int64,
+        )
+        return cls(columns, sensors, sensor, errors, settings)
 
-        if self.relative_altitude < 0 or self.focal_length <= 0:
-            warnings.warn("Altitude and focal length must be positive.")
-        self.declination = declination
+    def __len__(self) -> int:
+        return len(self.sensor)
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def image(self, index: int) -> "ImageClass":
+        """
+        ImageClass view of row `index`. Raises the row's parse error, if any.
+        """
+        if self.errors[index] is not None:
+            raise self.errors[index]
+        return ImageClass(self, index)
 
-    def create_geojson_feature(self, properties):
+    def take(self, indices) -> "FlightTable":
         """
-        Create GeoJSON features from image metadata **without geojson or geojson_rewind**.
-        Uses shapely + json (standard library).
+        New table holding only the rows at `indices`.
         """
+        indices = np.asarray(indices, dtype=np.intp)
+        return FlightTable(
+            columns={name: values[indices] for name, values in self.columns.items()},
+            sensors=self.sensors,
+            sensor=self.sensor[indices],
+            errors=[self.errors[i] for i in indices],
+            settings=self.settings,
+        )
 
-        # Create polygon
-        polygon = Polygon(self.footprint_coordinates)
 
-        # Ensure proper right-hand rule (counter-clockwise winding)
-        polygon = orient(polygon, sign=1)
+def _column(name: str):
+    def get(self):
+        return self.table.columns[name].item(self.index)
 
-        # GeoJSON polygon
-        type_polygon = {
-            "type": "Polygon",
-            "coordinates": mapping(polygon)["coordinates"],
-        }
+    return property(get)
 
-        # GeoJSON point
-        type_point = {"type": "Point", "coordinates": [self.longitude, self.latitude]}
 
-        # Store as feature dicts
-        self.feature_point = {
-            "type": "Feature",
-            "geometry": type_point,
-            "properties": properties,
-        }
+def _sensor_field(name: str):
+    position = SENSOR_FIELDS.index(name)
+
+    def get(self):
+        return self.table.sensors[self.table.sensor[self.index]][position]
+
+    return property(get)
+
+
+class ImageClass:
+    """
+    One image of a FlightTable. Per-image values are read from the table's columns; only values computed later in the pipeline (declination, footprint, paths) are stored on the view itself.
+    """
+
+    __slots__ = (
+        "table",
+        "index",
+        "declination",
+        "center_distance",
+        "coord_array",
+        "footprint_coordinates",
+        "image_path",
+        "output_file",
+        "geotiff_file",
+    )
+
+    file_name = _column("file_name")
+    latitude = _column("latitude")
+    longitude = _column("longitude")
+    focal_length = _column("focal_length")
+    focal_length35mm = _column("focal_length35mm")
+    relative_altitude = _column("relative_altitude")
+    absolute_altitude = _column("absolute_altitude")
+    gimbal_roll_degree = _column("gimbal_roll_degree")
+    gimbal_pitch_degree = _column("gimbal_pitch_degree")
+    gimbal_yaw_degree = _column("gimbal_yaw_degree")
+    flight_pitch_degree = _column("flight_pitch_degree")
+    flight_roll_degree = _column("flight_roll_degree")
+    flight_yaw_degree = _column("flight_yaw_degree")
+    image_width = _column("image_width")
+    image_height = _column("image_height")
+    max_aperture_value = _column("max_aperture_value")
+    datetime_original = _column("datetime_original")
+    sensor_model_data = _column("sensor_model_data")
+    sensor_index = _column("sensor_index")
+    sensor_width = _column("sensor_width")
+    sensor_height = _column("sensor_height")
+    lens_FOV_width = _column("lens_FOV_width")
+    lens_FOV_height = _column("lens_FOV_height")
+    gsd = _column("gsd")
+    capture_time = _column("capture_time")
+    drone_hash = _column("drone_hash")
+    drone_make = _sensor_field("drone_make")
+    drone_model = _sensor_field("drone_model")
+    camera_make = _sensor_field("camera_make")
+    sensor_model = _sensor_field("sensor_model")
+    cam_index = _sensor_field("cam_index")
+    sensor_make = ""
+
+    def __init__(self, table: FlightTable, index: int):
+        self.table = table
+        self.index = index
+        self.declination = None
+        self.center_distance = None
+        self.coord_array = []
+        self.footprint_coordinates = []
+        self.image_path = ""
+        self.output_file = ""
+        self.geotiff_file = ""
 
-        self.feature_polygon = {
+    def __getstate__(self):
+        # Ship only this image's row to worker processes
+        state = {slot: getattr(self, slot) for slot in self.__slots__}
+        state["table"] = self.table.take([self.index])
+        state["index"] = 0
+        return state
+
+    def __setstate__(self, state):
+        for slot, value in state.items():
+            setattr(self, slot, value)
+
+    @property
+    def settings(self) -> RunSettings:
+        return self.table.settings
+
+    # def find_declination(altitude, focal_length, drone_latitude, drone_longitude, datetime_original):
+    @timed("find_declination")
+    def find_declination(self):
+        declination = find_declinations([self])[0]
+        if np.isnan(declination):
+            if np.isnat(self.table["capture_time"][self.index]):
+                raise ValueError(
+                    f"Invalid DateTimeOriginal {self.datetime_original!r}."
+                )
+            raise ValueError(
+                f"No magnetic declination available for {self.datetime_original}."
+            )
+
+        if self.relative_altitude < 0 or self.focal_length <= 0:
+            warnings.warn("Altitude and focal length must be positive.")
+        self.declination = float(declination)
+
+    def geojson_feature(self, properties: dict) -> dict:
+        """
+        GeoJSON polygon feature of the footprint, wound counter-clockwise, built with shapely instead of geojson or geojson_rewind.
+        """
+        polygon = orient(Polygon(self.footprint_coordinates), sign=1)
+        return {
             "type": "Feature",
-            "geometry": type_polygon,
+            "geometry": {
+                "type": "Polygon",
+                "coordinates": mapping(polygon)["coordinates"],
+            },
             "properties": properties,
         }
 
-    def create_properties(self):
-        self.properties = dict(
+    @property
+    def properties(self) -> dict:
+        """
+        Image properties written with footprint features, built on demand.
+        """
+        properties = dict(
             File_Name=self.file_name,
             Focal_Length=self.focal_length,
             Image_Width=self.image_width,
@@ -248,25 +430,145 @@ class ImageClass:
             GSD=self.gsd,
         )
         if self.gimbal_pitch_degree == 999:
-            self.properties["FlightYawDegree"] = self.gimbal_yaw_degree
-            self.properties["FlightPitchDegree"] = self.gimbal_pitch_degree
-            self.properties["FlightRollDegree"] = self.gimbal_roll_degree
-
-    def create_hash(self) -> bool:
-        self.drone_hash = hash(
-            (
-                self.drone_make,
-                self.drone_model,
-                self.camera_make,
-                self.sensor_model,
-                self.sensor_width,
-                self.sensor_height,
-                self.lens_FOV_width,
-                self.lens_FOV_height,
-                self.focal_length,
-                self.max_aperture_value,
+            properties["FlightYawDegree"] = self.gimbal_yaw_degree
+            properties["FlightPitchDegree"] = self.gimbal_pitch_degree
+            properties["FlightRollDegree"] = self.gimbal_roll_degree
+        return properties
+
+
+def find_declinations(images: list) -> np.ndarray:
+    """
+    Magnetic declinations of many images in one call to the shared declination service.
+
+    Args:
+        images (list): ImageClass views.
+
+    Returns:
+        np.ndarray: Declination in degrees per image, NaN where the capture date is invalid or no model covers it.
+    """
+    if not images:
+        return np.empty(0)
+    return get_declination_service().declinations(
+        [image.latitude for image in images],
+        [image.longitude for image in images],
+        [image.absolute_altitude for image in images],
+        np.array(
+            [image.table["capture_time"][image.index] for image in images],
+            dtype="datetime64[s]",
+        ),
+    )
+
+
+def _parse_row(md: dict) -> dict:
+    """
+    Per-image values of one metadata dict, in priority order of their source tags.
+    """
+    return dict(
+        file_name=str(md.get("File:FileName")),
+        # Extracting latitude, longitude, and altitude details
+        latitude=float(md.get("Composite:GPSLatitude") or md.get("EXIF:GPSLatitude")),
+        longitude=float(
+            md.get("Composite:GPSLongitude") or md.get("EXIF:GPSLongitude")
+        ),
+        focal_length=float(md.get("EXIF:FocalLength")),
+        focal_length35mm=float(md.get("EXIF:FocalLengthIn35mmFormat")),
+        relative_altitude=float(
+            md.get("XMP:RelativeAltitude") or md.get("Composite:GPSAltitude")
+        ),
+        absolute_altitude=float(
+            md.get("XMP:AbsoluteAltitude") or md.get("Composite:GPSAltitude")
+        ),
+        # Extracting gimbal and flight orientation details
+        gimbal_roll_degree=_get_float(
+            md, "XMP:GimbalRollDegree", "MakerNotes:CameraRoll", "XMP:Roll"
+        ),
+        gimbal_pitch_degree=_get_float(
+            md, "XMP:GimbalPitchDegree", "MakerNotes:CameraPitch", "XMP:Pitch"
+        ),
+        gimbal_yaw_degree=_get_float(
+            md, "XMP:GimbalYawDegree", "MakerNotes:CameraYaw", "XMP:Yaw"
+        ),
+        flight_pitch_degree=_get_float(
+            md, "XMP:FlightPitchDegree", "MakerNotes:Pitch", default=999
+        ),
+        flight_roll_degree=_get_float(
+            md, "XMP:FlightRollDegree", "MakerNotes:Roll", default=999
+        ),
+        flight_yaw_degree=_get_float(
+            md, "XMP:FlightYawDegree", "MakerNotes:Yaw", default=999
+        ),
+        # Extracting image and sensor details, in pixels
+        image_width=int(md.get("EXIF:ImageWidth") or md.get("EXIF:ExifImageWidth")),
+        image_height=int(md.get("EXIF:ImageHeight") or md.get("EXIF:ExifImageHeight")),
+        max_aperture_value=md.get("EXIF:MaxApertureValue"),
+        # date/time of original image capture
+        datetime_original=md.get("EXIF:DateTimeOriginal"),
+        # Get sensor model and rig camera index from metadata
+        sensor_model_data=md.get("EXIF:Model"),
+        sensor_index=str(md.get("XMP:RigCameraIndex") or md.get("XMP:SensorIndex")),
+    )
+
+
+def _lookup_sensor(row: dict, sensor_database: SensorDatabase, sensors: list):
+    """
+    Find the sensor info of an image and append it to `sensors`.
+
+    Returns:
+        int | Exception: Index into `sensors`, or the error raised when no sensor info is usable.
+    """
+    sensor_model_data = row["sensor_model_data"]
+    sensor_index = row["sensor_index"]
+    sensor_info = sensor_database.lookup(sensor_model_data, sensor_index)
+    if sensor_info is None:
+        if sensor_model_data:
+            print(
+                f"No sensor information found for {row['file_name']} with sensor model {sensor_model_data} and rig camera index {sensor_index}. Using defaults."
             )
+        sensor_info = sensor_database.default
+    if sensor_info is None or None in sensor_info[5:7]:
+        return ValueError(
+            f"No sensor dimensions for sensor model {sensor_model_data}. Add it to the sensor info CSV or pass sensor_width_mm and sensor_height_mm."
+        )
+
+    try:
+        drone_make, drone_model, camera_make, sensor_model, cam_index = sensor_info[:5]
+        dimensions = [float(value) for value in sensor_info[5:9]]
+    except Exception as e:
+        return e
+    # Special case
+    if sensor_model in ["FC2103", "FC220", "FC300X", "FC200"]:
+        sensor_model = f"{drone_model} {sensor_model}"
+    if sensor_model and drone_make is None:
+        drone_model = ""
+        drone_make = "Unknown Drone"
+
+    sensors.append(
+        (drone_make, drone_model, camera_make, sensor_model, cam_index, *dimensions)
+    )
+    return len(sensors) - 1
+
+
+def _drone_hash(sensor_info: tuple, focal_length: float, max_aperture_value) -> int:
+    drone_make, drone_model, camera_make, sensor_model, _, *dimensions = sensor_info
+    return hash(
+        (
+            drone_make,
+            drone_model,
+            camera_make,
+            sensor_model,
+            *dimensions,
+            float(focal_length),
+            max_aperture_value,
         )
+    )
+
+
+def _capture_time(datetime_original) -> str:
+    try:
+        date = datetime.strptime(str(datetime_original), "%Y:%m:%d %H:%M:%S")
+    except ValueError:
+        return "NaT"
+    return date.isoformat()
 
 
 def _get_float(md, *keys, default=0.0):
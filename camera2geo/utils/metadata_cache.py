@@ -0,0 +1,219 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+from pathlib import Path
+from typing import Iterable
+
+from .cache import resolve_cache_path
+
+METADATA_CACHE_ENTRIES: int = 1_000_000
+
+# EXIF and XMP segments sit at the start of a JPEG and each is at most 64 KiB
+CONTENT_HASH_BYTES = 128 * 1024
+
+
+def resolve_metadata_cache(metadata_cache: str | bool) -> str | None:
+    """
+    Map the user-facing `metadata_cache` option to a cache file path.
+
+    Args:
+        metadata_cache (str | bool): False to disable the cache, True for the default cache file, or a cache file path.
+
+    Returns:
+        str | None: Path of the SQLite cache file, or None when disabled.
+    """
+    return resolve_cache_path(metadata_cache, "metadata.sqlite", "metadata_cache")
+
+
+def file_identity(path: str, content_hash: bool = False) -> tuple | None:
+    """
+    Identify the current version of a file by its size and modification time, plus a hash of its leading bytes when `content_hash` is True.
+
+    Returns:
+        tuple | None: (size, mtime_ns, hash or None), or None if the file cannot be read.
+    """
+    try:
+        stat = os.stat(path)
+        digest = None
+        if content_hash:
+            with open(path, "rb") as f:
+                digest = hashlib.blake2b(f.read(CONTENT_HASH_BYTES)).hexdigest()
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns, digest
+
+
+class MetadataCache:
+    """
+    SQLite store of image metadata read by exiftool or the in-process JPEG reader, shared by every run on the machine. Entries are keyed by absolute path and requested tag set, are only returned while the file's size, modification time and optional content hash still match, and are evicted least recently used first once `max_entries` is exceeded.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = METADATA_CACHE_ENTRIES,
+        content_hash: bool = False,
+    ):
+        """
+        Args:
+            path (str): SQLite file, created if missing.
+            max_entries (int): Maximum number of cached images.
+            content_hash (bool): If True, also validate entries against a hash of the first bytes of each file, for file systems or copy tools that preserve modification times.
+        """
+        self.path = str(path)
+        self.max_entries = max_entries
+        self.content_hash = content_hash
+        self.hits = 0
+        self.misses = 0
+
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS metadata (
+                    path TEXT NOT NULL,
+                    tags TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    content_hash TEXT,
+                    data TEXT NOT NULL,
+                    used REAL NOT NULL,
+                    PRIMARY KEY (path, tags)
+                ) WITHOUT ROWID
+                """)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS metadata_used ON metadata (used)"
+            )
+            self._entries = self._count()
+
+    def identify(self, path: str) -> tuple | None:
+        """
+        File identity of `path` as compared by this cache; see `file_identity`.
+        """
+        return file_identity(path, self.content_hash)
+
+    def get_many(self, tags: Iterable[str] | None, identities: dict) -> dict:
+        """
+        Cached metadata of files whose identity still matches. Hits are marked as recently used.
+
+        Args:
+            tags (Iterable[str] | None): Tag set the metadata was read with; None for every tag.
+            identities (dict): Identity from `identify` per image path.
+
+        Returns:
+            dict: Metadata per image path found in the cache, with "SourceFile" set to the path as given.
+        """
+        tags_key = _tags_key(tags)
+        paths = {os.path.abspath(p): p for p, ident in identities.items() if ident}
+        found = {}
+        items = list(paths.items())
+        with self._lock:
+            # Stay below SQLite's bound parameter limit
+            for start in range(0, len(items), 500):
+                chunk = items[start : start + 500]
+                rows = self._conn.execute(
+                    "SELECT path, size, mtime_ns, content_hash, data FROM metadata "
+                    f"WHERE tags = ? AND path IN ({', '.join('?' * len(chunk))})",
+                    [tags_key] + [key for key, _ in chunk],
+                ).fetchall()
+                for key, size, mtime_ns, digest, data in rows:
+                    path = paths[key]
+                    size_now, mtime_now, digest_now = identities[path]
+                    if (size, mtime_ns) != (size_now, mtime_now):
+                        continue
+                    if self.content_hash and digest != digest_now:
+                        continue
+                    metadata = json.loads(data)
+                    metadata["SourceFile"] = str(path)
+                    found[path] = metadata
+
+            if found:
+                now = time.time()
+                with self._conn:
+                    self._conn.executemany(
+                        "UPDATE metadata SET used = ? WHERE path = ? AND tags = ?",
+                        [(now, os.path.abspath(p), tags_key) for p in found],
+                    )
+            self.hits += len(found)
+            self.misses += len(identities) - len(found)
+        return found
+
+    def put_many(self, tags: Iterable[str] | None, entries: dict):
+        """
+        Store metadata read with `tags`, evicting the least recently used entries beyond `max_entries`.
+
+        Args:
+            tags (Iterable[str] | None): Tag set the metadata was read with.
+            entries (dict): (identity, metadata) per image path, with the identity taken before the file was read. Entries without an identity are not stored.
+        """
+        tags_key = _tags_key(tags)
+        now = time.time()
+        rows = [
+            (
+                os.path.abspath(path),
+                tags_key,
+                identity[0],
+                identity[1],
+                identity[2],
+                json.dumps(metadata),
+                now,
+            )
+            for path, (identity, metadata) in entries.items()
+            if identity is not None and metadata is not None
+        ]
+        if not rows:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO metadata (path, tags, size, mtime_ns, content_hash, data, used) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            # Rows are only counted once the running estimate passes the cap
+            self._entries += len(rows)
+            if self._entries > self.max_entries:
+                self._entries = self._count()
+                excess = self._entries - self.max_entries
+                if excess > 0:
+                    self._conn.execute(
+                        "DELETE FROM metadata WHERE (path, tags) IN "
+                        "(SELECT path, tags FROM metadata ORDER BY used LIMIT ?)",
+                        (excess,),
+                    )
+                    self._entries -= excess
+
+    def invalidate(self, paths: Iterable[str]):
+        """
+        Drop every cached entry of `paths`, for files whose metadata was just rewritten.
+        """
+        keys = [(os.path.abspath(p),) for p in paths]
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM metadata WHERE path = ?", keys)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._count()
+
+    def stats(self) -> dict:
+        """
+        Hit and miss counts of this process and the number of cached entries.
+        """
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self)}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM metadata").fetchone()[0]
+
+
+def _tags_key(tags: Iterable[str] | None) -> str:
+    if tags is None:
+        return "*"
+    return hashlib.sha1("\n".join(sorted(tags)).encode()).hexdigest()
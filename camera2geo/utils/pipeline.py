@@ -0,0 +1,93 @@
+import queue
+import threading
+
+from typing import Callable, Iterable, Iterator, List, Tuple
+
+_END = object()
+
+
+def run_pipeline(
+    items: Iterable,
+    stages: List[Callable],
+    queue_size: int = 2,
+) -> Iterator[Tuple[object, Exception | None]]:
+    """
+    Run items through a chain of stages with each stage on its own thread. Stages are connected by bounded queues so reading, compute and writing of neighbouring items overlap while at most `queue_size` items wait between any two stages.
+
+    Args:
+        items (Iterable): Inputs passed to the first stage. Consumed lazily by a feeder thread.
+        stages (List[Callable]): Callables applied in order; each receives the previous stage's output.
+        queue_size (int): Maximum number of items buffered between two stages.
+
+    Yields:
+        Tuple[object, Exception | None]: The last stage's output and None, or the last successful value and the exception that stopped the item. Results are yielded in input order.
+    """
+    if queue_size < 1:
+        raise ValueError("queue_size must be 1 or greater.")
+
+    stop = threading.Event()
+    queues = [queue.Queue(maxsize=queue_size) for _ in range(len(stages) + 1)]
+    source_error = []
+
+    def put(q, item):
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(q):
+        while not stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _END
+
+    def feed():
+        try:
+            for item in items:
+                if not put(queues[0], (item, None)):
+                    return
+        except Exception as e:
+            source_error.append(e)
+        finally:
+            put(queues[0], _END)
+
+    def work(stage, q_in, q_out):
+        while True:
+            job = get(q_in)
+            if job is _END:
+                put(q_out, _END)
+                return
+            value, error = job
+            if error is None:
+                try:
+                    value = stage(value)
+                except Exception as e:
+                    error = e
+            if not put(q_out, (value, error)):
+                return
+
+    threads = [threading.Thread(target=feed, daemon=True)]
+    for stage, q_in, q_out in zip(stages, queues[:-1], queues[1:]):
+        threads.append(
+            threading.Thread(target=work, args=(stage, q_in, q_out), daemon=True)
+        )
+    for thread in threads:
+        thread.start()
+
+    try:
+        while True:
+            job = get(queues[-1])
+            if job is _END:
+                break
+            yield job
+        if source_error:
+            raise source_error[0]
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
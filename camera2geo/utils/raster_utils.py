@@ -11,7 +11,6 @@ import cv2 as cv
 import warnings
 import math
 import cv2
-import lensfunpy
 
 from shapely import Polygon
 from contextlib import contextmanager
@@ -25,12 +24,39 @@ from skimage.exposure import equalize_adapthist
 from PIL import Image, ImageOps
 from pathlib import Path
 
-from .metadata import ImageClass
+from .lens import image_lens_maps
+from .timing import timed
+from .warp import (
+    GridRaster,
+    TiledWarp,
+    decode_factor,
+    is_png,
+    open_tiled_source,
+    output_resolution,
+    plan_tiled_warp,
+    to_rgb,
+    warp_to_grid,
+    write_grid_raster,
+    write_tiled_warp,
+)
 
 IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".tif", ".tiff"}
 
+# Formats cv2 can downscale while decoding (in the DCT domain)
+JPEG_EXTENSIONS = {".jpg", ".jpeg"}
 
-def warp_image_to_polygon(img_arry, polygon, coordinate_array):
+# cv2 reduced-size decode flags per (scale denominator, grayscale)
+REDUCED_IMREAD_FLAGS = {
+    (2, False): cv2.IMREAD_REDUCED_COLOR_2,
+    (4, False): cv2.IMREAD_REDUCED_COLOR_4,
+    (8, False): cv2.IMREAD_REDUCED_COLOR_8,
+    (2, True): cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    (4, True): cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    (8, True): cv2.IMREAD_REDUCED_GRAYSCALE_8,
+}
+
+
+def warp_image_to_polygon(img_arry, polygon, coordinate_array, image_equalize=False):
     """
     Warps an image array to fit within a specified polygon using coordinates mapping
     after applying auto-leveling for color, brightness, and contrast adjustments.
@@ -39,13 +65,15 @@ def warp_image_to_polygon(img_arry, polygon, coordinate_array):
     - img_arry: The image array to be auto-leveled and then warped.
     - polygon: The polygon to which the image should be warped.
     - coordinate_array: Array of coordinates defining the mapping from image to polygon.
+    - image_equalize: If True, apply CLAHE before warping.
 
     Returns:
     - The auto-leveled and then warped image array.
     """
 
-    if ImageClass.image_equalize:
-        img_arry_equalized = equalize_adapthist(img_arry, clip_limit=0.03)
+    if image_equalize:
+        with timed("clahe"):
+            img_arry_equalized = equalize_adapthist(img_arry, clip_limit=0.03)
     else:
         img_arry_equalized = img_arry
 
@@ -74,14 +102,15 @@ def warp_image_to_polygon(img_arry, polygon, coordinate_array):
 
     # Apply warping to the CLAHE-processed image
     try:
-        h_matrix, _ = cv.findHomography(src_points, dst_points, cv.RANSAC, 5)
-        georef_image_array = cv.warpPerspective(
-            img_arry_equalized,
-            h_matrix,
-            (img_arry_equalized.shape[1], img_arry_equalized.shape[0]),
-            borderMode=cv.BORDER_CONSTANT,
-            borderValue=(0, 0, 0),
-        )
+        with timed("warp_perspective"):
+            h_matrix, _ = cv.findHomography(src_points, dst_points, cv.RANSAC, 5)
+            georef_image_array = cv.warpPerspective(
+                img_arry_equalized,
+                h_matrix,
+                (img_arry_equalized.shape[1], img_arry_equalized.shape[0]),
+                borderMode=cv.BORDER_CONSTANT,
+                borderValue=(0, 0, 0),
+            )
     except Exception as e:
         warnings.warn(f"Error warping image to polygon: {e}")
         return None
@@ -134,7 +163,8 @@ def gps_to_pixel(gps_coord, x_min, y_max, resolution_x, resolution_y):
     return int(Px), int(Py)
 
 
-def array2ds(cv2_array, polygon_wkt):
+@timed("array2ds")
+def array2ds(cv2_array, polygon_wkt, epsg=4326):
     """
     Converts an OpenCV image array to a rasterio dataset with geospatial data.
 
@@ -151,7 +181,7 @@ def array2ds(cv2_array, polygon_wkt):
         warnings.warn(f"cv2_array must be a numpy array.")
     if not isinstance(polygon_wkt, str):
         warnings.warn(f"polygon_wkt must be a string.")
-    if not isinstance(ImageClass.epsg, int):
+    if not isinstance(epsg, int):
         warnings.warn(f"epsg_code must be an integer.")
 
     polygon = loads(polygon_wkt)
@@ -165,7 +195,7 @@ def array2ds(cv2_array, polygon_wkt):
         bands = 1
 
     transform = from_bounds(minx, miny, maxx, maxy, width, height)
-    crs = rasterio.crs.CRS.from_epsg(ImageClass.epsg)
+    crs = rasterio.crs.CRS.from_epsg(epsg)
 
     memfile = rasterio.MemoryFile()
     dataset = memfile.open(
@@ -202,20 +232,30 @@ def suppress_stdout_stderr():
             sys.stdout, sys.stderr = old_stdout, old_stderr
 
 
-def warp_to_geotiff_file(geotiff_file: str, dataset):
+def warp_to_geotiff_file(
+    geotiff_file: str, dataset, epsg=4326, cog=False, resolution=None
+):
     """
     Warps a georeferenced image array into a GeoTIFF file.
 
     Parameters:
     - dst_utf8_path: Destination path for the output GeoTIFF file.
     - ds: rasterio dataset object to be warped.
+    - epsg: EPSG code of the output coordinate reference system.
+    - cog: If True, convert the output to a Cloud Optimized GeoTIFF.
+    - resolution: (x, y) output pixel size in CRS units. If None, the pixel count follows the dataset.
 
     No return value.
     """
-    dst_crs = rasterio.crs.CRS.from_epsg(ImageClass.epsg)
+    dst_crs = rasterio.crs.CRS.from_epsg(epsg)
 
     transform, width, height = calculate_default_transform(
-        dataset.crs, dst_crs, dataset.width, dataset.height, *dataset.bounds
+        dataset.crs,
+        dst_crs,
+        dataset.width,
+        dataset.height,
+        *dataset.bounds,
+        resolution=resolution,
     )
 
     kwargs = dataset.meta.copy()
@@ -229,7 +269,7 @@ def warp_to_geotiff_file(geotiff_file: str, dataset):
         }
     )
 
-    with rasterio.open(geotiff_file, "w", **kwargs) as dst:
+    with timed("reproject"), rasterio.open(geotiff_file, "w", **kwargs) as dst:
         for i in range(1, dataset.count + 1):
             reproject(
                 source=rasterio.band(dataset, i),
@@ -241,16 +281,26 @@ def warp_to_geotiff_file(geotiff_file: str, dataset):
                 resampling=Resampling.nearest,
             )
 
-    if ImageClass.cog:
-        # Convert the GeoTIFF to a Cloud Optimized GeoTIFF (COG)
-        cogeo_profile = "deflate"
-        with suppress_stdout_stderr():
-            cog_translate(
-                geotiff_file,
-                geotiff_file,
-                cog_profiles.get(cogeo_profile),
-                in_memory=True,
-            )
+    if cog:
+        translate_to_cog(geotiff_file)
+
+
+def translate_to_cog(geotiff_file: str, in_memory: bool = True):
+    """
+    Convert a GeoTIFF file in place to a Cloud Optimized GeoTIFF (COG).
+
+    Parameters:
+    - geotiff_file: Path of the GeoTIFF to convert.
+    - in_memory: If True, build the COG in memory; otherwise in a temporary file next to the output.
+    """
+    cogeo_profile = "deflate"
+    with timed("cog_translate"), suppress_stdout_stderr():
+        cog_translate(
+            geotiff_file,
+            geotiff_file,
+            cog_profiles.get(cogeo_profile),
+            in_memory=in_memory,
+        )
 
 
 def calculate_grid(num_images):
@@ -333,131 +383,174 @@ def create_mosaic(
 
 
 def set_raster_extents(image):
-    try:
-        jpeg_img = cv2.imread(image.image_path, cv2.IMREAD_UNCHANGED)
-        if jpeg_img is None:
-            warnings.warn(f"File not found: {image.image_path}")
-            return
-        fixed_polygon = Polygon(image.coord_array)
-        if image.lens_correction:
-            try:
-                focal_length = image.focal_length
-                distance = image.center_distance
-                cam_maker = image.camera_make
-                cam_model = image.sensor_model
-                aperture = image.max_aperture_value
-
-                # Load camera and lens from lensfun database
-                db = lensfunpy.Database()
-                cam = db.find_cameras(cam_maker, cam_model, True)[0]
-                lens = db.find_lenses(cam, cam_maker, cam_model, True)[0]
-
-                height, width = jpeg_img.shape[:2]
-                mod = lensfunpy.Modifier(lens, cam.crop_factor, width, height)
-
-                # Determine rasterio data type based on cv2_array data type
-                if jpeg_img.dtype == np.uint8:
-                    pixel_format = np.uint8
-                elif jpeg_img.dtype == np.int16:
-                    pixel_format = np.int16
-                elif jpeg_img.dtype == np.uint16:
-                    pixel_format = np.uint16
-                elif jpeg_img.dtype == np.int32:
-                    pixel_format = np.int32
-                elif jpeg_img.dtype == np.float32:
-                    pixel_format = np.float32
-                elif jpeg_img.dtype == np.float64:
-                    pixel_format = np.float64
-                else:
-                    warnings.warn(f"Unsupported data type: {str(jpeg_img.dtype)}")
-
-                mod.initialize(
-                    focal_length, aperture, distance, pixel_format=pixel_format
-                )
-
-                # Apply geometry distortion correction and obtain distortion maps
-                maps = mod.apply_geometry_distortion()
-                map_x = maps[:, :, 0]
-                map_y = maps[:, :, 1]
-
-                img_undistorted = cv2.remap(
-                    jpeg_img, map_x, map_y, interpolation=cv2.INTER_LANCZOS4
-                )
-            except IndexError as e:
-                ImageClass.lens_correction = False
-                img_undistorted = np.array(jpeg_img)
-                warnings.warn(
-                    "Cannot correct lens distortion. Camera properties not found in database."
-                )
-                warnings.warn(f"Index error: {e} for {image.image_path}")
-        else:
-            img_undistorted = np.array(jpeg_img)
+    jpeg_img = read_raster(image)
+    dataset = rectify_raster(image, jpeg_img)
+    write_raster(image, dataset)
 
-        if jpeg_img.ndim == 2:  # Single band image
-            adjImg = img_undistorted
-        elif jpeg_img.ndim == 3:  # Multiband image
-            adjImg = cv2.cvtColor(img_undistorted, cv2.COLOR_BGR2RGB)
-        else:
-            adjImg = cv2.cvtColor(img_undistorted, cv2.COLOR_BGR2RGBA)
 
-        rectify_and_warp_to_geotiff(
-            adjImg, image.geotiff_file, fixed_polygon, image.coord_array
+def read_raster(image):
+    """
+    Decode the source image of an ImageClass from disk. When the run's target resolution is coarser than the image's GSD, it is downscaled while decoding. With `memory_budget_mb` set, the image is only opened for windowed reads.
+
+    Parameters:
+    - image: ImageClass with `image_path` set.
+
+    Returns:
+    - The decoded image array (an open rasterio dataset with `memory_budget_mb`).
+
+    Raises:
+    - FileNotFoundError: If the image cannot be read.
+    """
+    with timed("imread"):
+        if use_tiled_warp(image):
+            return open_tiled_source(image.image_path)
+        jpeg_img = imread_reduced(image.image_path, decode_factor(image))
+    if jpeg_img is None:
+        raise FileNotFoundError(f"File not found: {image.image_path}")
+    return jpeg_img
+
+
+def use_tiled_warp(image) -> bool:
+    """
+    Whether an ImageClass is rendered tile by tile within the run's memory budget. PNG outputs are written whole.
+    """
+    return bool(image.settings.memory_budget_mb) and not is_png(image.geotiff_file)
+
+
+def imread_reduced(path: str, factor: int = 1):
+    """
+    Decode an image downscaled by an integer factor. JPEGs are decoded at 1/2, 1/4 or 1/8 scale in the DCT domain, so the full frame is never decompressed; what remains of the factor is applied with area resampling.
+
+    Parameters:
+    - path: Path of the image.
+    - factor: Downscale factor; 1 decodes the image unchanged.
+
+    Returns:
+    - The decoded image array, or None if it cannot be read.
+    """
+    scale = 1
+    flags = cv2.IMREAD_UNCHANGED
+    if factor >= 2 and Path(path).suffix.lower() in JPEG_EXTENSIONS:
+        scale = 8 if factor >= 8 else 4 if factor >= 4 else 2
+        with Image.open(path) as img:
+            grayscale = img.mode == "L"
+        # Reduced decodes would otherwise apply the EXIF orientation
+        flags = REDUCED_IMREAD_FLAGS[scale, grayscale] | cv2.IMREAD_IGNORE_ORIENTATION
+
+    img = cv2.imread(path, flags)
+    remaining = factor // scale
+    if img is not None and remaining >= 2:
+        height, width = img.shape[:2]
+        img = cv2.resize(
+            img,
+            (max(1, width // remaining), max(1, height // remaining)),
+            interpolation=cv2.INTER_AREA,
         )
-    except FileNotFoundError as e:
-        warnings.warn(f"File not found: {image.image_path}. {e}")
-    except Exception as e:
-        warnings.warn(f"Error opening or processing image: {e}")
+    return img
 
 
-def rectify_and_warp_to_geotiff(
-    jpeg_img_array, geotiff_file, fixed_polygon, coordinate_array
-):
+def rectify_raster(image, jpeg_img):
     """
-    Warps and rectifies a JPEG image array to a GeoTIFF format based on a fixed polygon and coordinate array.
+    Lens-correct a decoded image and warp it onto its ground footprint. With `fused_warp` or `preview` set, the image is resampled straight onto its output grid instead; with `memory_budget_mb`, only its output grid is planned and tiles are resampled while writing.
 
     Parameters:
-    - jpeg_img_array: The NumPy array of the JPEG image.
-    - dst_utf8_path: Destination path for the output GeoTIFF image.
-    - fixed_polygon: The shapely Polygon object defining the target area.
-    - coordinate_array: Array of coordinates used for warping the image.
+    - image: ImageClass with `coord_array` set.
+    - jpeg_img: The decoded image array or opened dataset from `read_raster`.
+
+    Returns:
+    - An in-memory rasterio dataset (a GridRaster with `fused_warp` or `preview`, a TiledWarp with `memory_budget_mb`). Errors are raised to the caller.
     """
-    # Convert the Polygon to WKT format
-    polygon_wkt = str(fixed_polygon)
+    settings = image.settings
+    if isinstance(jpeg_img, rasterio.io.DatasetReader):
+        try:
+            return plan_tiled_warp(image, jpeg_img)
+        except Exception:
+            jpeg_img.close()
+            raise
 
-    try:
-        georef_image_array = warp_image_to_polygon(
-            jpeg_img_array, fixed_polygon, coordinate_array
-        )
-        dsArray = array2ds(georef_image_array, polygon_wkt)
-    except Exception as e:
-        warnings.warn(f"Error during warping or dataset creation: {e}")
+    if settings.fused_warp or settings.preview:
+        return warp_to_grid(image, jpeg_img)
 
-    # Warp the rasterio dataset to the destination path
-    try:
-        warp_to_geotiff_file(geotiff_file, dsArray)
-    except Exception as e:
-        warnings.warn(f"Error writing GeoTIFF: {e}")
+    fixed_polygon = Polygon(image.coord_array)
+    if settings.lens_correction:
+        img_undistorted = correct_lens_distortion(image, jpeg_img)
+    else:
+        img_undistorted = np.array(jpeg_img)
 
+    adjImg = to_rgb(img_undistorted)
 
-def generate_geotiff(
-    self, input_dir: str, output_dir: str, output_path: str | None = None
-):
+    return warp_to_dataset(adjImg, fixed_polygon, image.coord_array, settings)
+
+
+@timed("lens_remap")
+def correct_lens_distortion(image, jpeg_img):
     """
-    Generate a GeoTIFF for this image.
+    Undistort a decoded image with the lensfun profile of its camera and lens. Undistortion maps come from the process-wide LensMapCache, so they are built once per camera setting and image size.
+
+    Parameters:
+    - image: ImageClass providing camera, lens, focal length, aperture and subject distance.
+    - jpeg_img: The decoded image array.
 
-    Args:
-        input_dir (str): Directory containing the input image.
-        output_dir (str): Default directory for saving output GeoTIFFs.
-        output_path (str | None): Explicit output path. If provided, overrides output_dir.
+    Returns:
+    - The undistorted image array, or a copy of the input if the camera is not in the lensfun database.
     """
-    input_image = Path(input_dir) / self.file_name
-    output_file = (
-        Path(output_path)
-        if output_path
-        else Path(output_dir) / f"{Path(self.file_name).stem}.tif"
-    )
+    height, width = jpeg_img.shape[:2]
+    maps = image_lens_maps(image, width, height)
+    if maps is None:
+        return np.array(jpeg_img)
+
+    return cv2.remap(jpeg_img, *maps, interpolation=cv2.INTER_LANCZOS4)
+
+
+def write_raster(image, dataset):
+    """
+    Write a warped in-memory dataset to the GeoTIFF path of an ImageClass and release it. Errors are raised to the caller.
+
+    Parameters:
+    - image: ImageClass with `geotiff_file` set.
+    - dataset: rasterio dataset, GridRaster or TiledWarp returned from `rectify_raster`.
+    """
+    settings = image.settings
+    try:
+        if isinstance(dataset, TiledWarp):
+            write_tiled_warp(image.geotiff_file, dataset, settings.memory_budget_mb)
+            if settings.cog:
+                # Translated on disk so the full frame is never held in memory
+                translate_to_cog(image.geotiff_file, in_memory=False)
+        elif isinstance(dataset, GridRaster):
+            with timed("write"):
+                write_grid_raster(image.geotiff_file, dataset)
+            if settings.cog and not is_png(image.geotiff_file):
+                translate_to_cog(image.geotiff_file)
+        else:
+            warp_to_geotiff_file(
+                image.geotiff_file,
+                dataset,
+                settings.epsg,
+                settings.cog,
+                output_resolution(image),
+            )
+    finally:
+        dataset.close()
+
+
+def warp_to_dataset(jpeg_img_array, fixed_polygon, coordinate_array, settings):
+    """
+    Warps a JPEG image array onto a fixed polygon and wraps it in an in-memory rasterio dataset.
 
-    self.image_path = str(input_image)
-    self.geotiff_file = str(output_file)
+    Parameters:
+    - jpeg_img_array: The NumPy array of the JPEG image.
+    - fixed_polygon: The shapely Polygon object defining the target area.
+    - coordinate_array: Array of coordinates used for warping the image.
+    - settings: RunSettings controlling equalization and output CRS.
+
+    Returns:
+    - rasterio dataset object.
+    """
+    # Convert the Polygon to WKT format
+    polygon_wkt = str(fixed_polygon)
 
-    set_raster_extents(self)
+    georef_image_array = warp_image_to_polygon(
+        jpeg_img_array, fixed_polygon, coordinate_array, settings.image_equalize
+    )
+    return array2ds(georef_image_array, polygon_wkt, settings.epsg)
@@ -0,0 +1,263 @@
+import os
+import re
+import csv
+import pickle
+import threading
+import warnings
+
+from functools import lru_cache
+from pathlib import Path
+from typing import List
+
+# Sensor table shipped with camera2geo
+DEFAULT_SENSOR_INFO_CSV = str(Path(__file__).parents[1] / "sensors.csv")
+
+SENSOR_DATABASE_VERSION = 1
+
+# Extensions of sensor databases saved with `SensorDatabase.save`
+PICKLE_SUFFIXES = (".pkl", ".pickle")
+
+DEFAULT_KEY = ("default", "default")
+
+
+class SensorDatabase:
+    """
+    Camera sensor table with hash indexes on (sensor model, rig camera index), on sensor model alone and on normalized make/model aliases. Entries are (drone make, drone model, camera make, sensor model, rig camera index, sensor width, sensor height, lens FOVw, lens FOVh) tuples as read from the sensor info CSV, and lookups are memoized.
+    """
+
+    def __init__(self, entries: dict):
+        """
+        Args:
+            entries (dict): Sensor info tuple per (sensor model, rig camera index), in priority order.
+        """
+        self.entries = dict(entries)
+        self._by_model = {}
+        self._by_alias = {}
+        for (model, _), info in self.entries.items():
+            self._by_model.setdefault(model, info)
+            drone_make, drone_model, camera_make, sensor_model = info[:4]
+            for alias in (
+                sensor_model,
+                f"{camera_make} {sensor_model}",
+                f"{drone_make} {drone_model}",
+                drone_model,
+            ):
+                if _normalize(alias):
+                    self._by_alias.setdefault(_normalize(alias), info)
+        self._memo = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_csv(
+        cls,
+        csv_filepath: str,
+        default_sensor_width: float | None = 0,
+        default_sensor_height: float | None = 0,
+        default_lens_FOVw: float = 0,
+        default_lens_FOVh: float = 0,
+    ) -> "SensorDatabase":
+        """
+        Read and validate a sensor info CSV. Rows with missing or invalid sensor dimensions are skipped with a warning. Files ending in .pkl or .pickle are loaded as databases saved with `save`.
+
+        Args:
+            csv_filepath (str): CSV with columns DroneMake,DroneModel,CameraMake,SensorModel,RigCameraIndex,SensorWidth,SensorHeight,LensFOVw,LensFOVh.
+            default_sensor_width (float | None): Sensor width used for empty cells and the default entry.
+            default_sensor_height (float | None): Sensor height used for empty cells and the default entry.
+            default_lens_FOVw (float): Lens FOVw used for empty cells and the default entry.
+            default_lens_FOVh (float): Lens FOVh used for empty cells and the default entry.
+
+        Returns:
+            SensorDatabase: Entries of the file plus a ("default", "default") entry if the file has none.
+        """
+        if Path(csv_filepath).suffix.lower() in PICKLE_SUFFIXES:
+            return cls.load(csv_filepath)
+
+        entries = {}
+        try:
+            with open(csv_filepath, newline="", encoding="utf-8") as f:
+                # Line 1 is the header
+                for line, row in enumerate(csv.DictReader(f), start=2):
+                    try:
+                        key, info = _parse_row(
+                            row,
+                            default_sensor_width,
+                            default_sensor_height,
+                            default_lens_FOVw,
+                            default_lens_FOVh,
+                        )
+                    except ValueError as e:
+                        warnings.warn(f"Skipping {csv_filepath} line {line}: {e}")
+                        continue
+                    entries[key] = info
+        except FileNotFoundError:
+            warnings.warn(f"Error: The file {csv_filepath} was not found.")
+        except Exception as e:
+            warnings.warn(
+                f"An unexpected error occurred while reading {csv_filepath}: {e}"
+            )
+
+        # Ensure fallback default entry exists
+        if DEFAULT_KEY not in entries:
+            entries[DEFAULT_KEY] = (
+                "Unknown",
+                "Unknown",
+                "Unknown",
+                "default",
+                "default",
+                default_sensor_width,
+                default_sensor_height,
+                default_lens_FOVw,
+                default_lens_FOVh,
+            )
+        return cls(entries)
+
+    @classmethod
+    def load(cls, path: str) -> "SensorDatabase":
+        """
+        Load a database saved with `save`. Only load files you trust; they are unpickled.
+        """
+        with open(path, "rb") as f:
+            payload = pickle.load(f)
+        if payload.get("version") != SENSOR_DATABASE_VERSION:
+            raise ValueError(f"Unsupported sensor database version in {path}.")
+        return cls(payload["entries"])
+
+    def save(self, path: str):
+        """
+        Save the entries in binary form, so large sensor catalogues load without parsing and validating the CSV again.
+        """
+        with open(path, "wb") as f:
+            pickle.dump(
+                {"version": SENSOR_DATABASE_VERSION, "entries": self.entries},
+                f,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+
+    def merge(self, other: "SensorDatabase") -> "SensorDatabase":
+        """
+        New database with the entries of `other` added, replacing entries with the same key.
+        """
+        entries = dict(self.entries)
+        for key, info in other.entries.items():
+            # Defaults added by `from_csv` must not hide a default defined earlier
+            if key == DEFAULT_KEY and key in entries and _is_generated(info):
+                continue
+            entries[key] = info
+        return SensorDatabase(entries)
+
+    def lookup(self, sensor_model: str | None, sensor_index: str) -> tuple | None:
+        """
+        Sensor info for an image's EXIF model and rig camera index: the exact (model, index) entry, else the first entry of the model, else the first entry whose sensor model, camera make and model, or drone make and model normalize to the same alias.
+
+        Returns:
+            tuple | None: Sensor info, or None if the model is unknown.
+        """
+        key = (sensor_model, sensor_index)
+        with self._lock:
+            if key in self._memo:
+                return self._memo[key]
+        info = None
+        if sensor_model:
+            info = (
+                self.entries.get(key)
+                or self._by_model.get(sensor_model)
+                or self._by_alias.get(_normalize(sensor_model))
+            )
+        with self._lock:
+            self._memo[key] = info
+        return info
+
+    @property
+    def default(self) -> tuple | None:
+        """
+        Sensor info used for images whose model is missing or unknown.
+        """
+        return self.entries.get(DEFAULT_KEY)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+def load_sensor_database(
+    csv_paths: str | List[str],
+    default_sensor_width: float | None = 0,
+    default_sensor_height: float | None = 0,
+) -> SensorDatabase:
+    """
+    Sensor database of one or more sensor info CSVs (or saved databases), later files replacing entries of earlier ones. Databases are loaded once per process and reloaded only when a file changes.
+
+    Args:
+        csv_paths (str | List[str]): Sensor info CSV or list of CSVs to merge.
+        default_sensor_width (float | None): Sensor width used for empty cells and the default entry.
+        default_sensor_height (float | None): Sensor height used for empty cells and the default entry.
+
+    Returns:
+        SensorDatabase: Shared, read-only database.
+    """
+    paths = [csv_paths] if isinstance(csv_paths, (str, os.PathLike)) else csv_paths
+    signature = tuple((str(path), _file_stat(path)) for path in paths)
+    return _load_sensor_database(signature, default_sensor_width, default_sensor_height)
+
+
+@lru_cache(maxsize=8)
+def _load_sensor_database(
+    signature: tuple, default_sensor_width, default_sensor_height
+) -> SensorDatabase:
+    database = None
+    for path, _ in signature:
+        loaded = SensorDatabase.from_csv(
+            path, default_sensor_width, default_sensor_height
+        )
+        database = loaded if database is None else database.merge(loaded)
+    return database if database is not None else SensorDatabase({})
+
+
+def _parse_row(
+    row: dict,
+    default_sensor_width,
+    default_sensor_height,
+    default_lens_FOVw,
+    default_lens_FOVh,
+) -> tuple:
+    drone_make = row.get("DroneMake", "Unknown")
+    drone_model = row.get("DroneModel", "Unknown")
+    camera_make = row.get("CameraMake", "Unknown")
+    sensor_model = row.get("SensorModel", "default")
+    cam_index = str(row.get("RigCameraIndex", "default"))
+
+    dimensions = []
+    for column, default in (
+        ("SensorWidth", default_sensor_width),
+        ("SensorHeight", default_sensor_height),
+        ("LensFOVw", default_lens_FOVw),
+        ("LensFOVh", default_lens_FOVh),
+    ):
+        value = row.get(column) or default
+        if value is None:
+            raise ValueError(f"missing {column}")
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{column} {value!r} is not a number") from None
+        if value < 0:
+            raise ValueError(f"{column} {value} is negative")
+        dimensions.append(value)
+
+    info = (drone_make, drone_model, camera_make, sensor_model, cam_index, *dimensions)
+    return (sensor_model, cam_index), info
+
+
+def _is_generated(info: tuple) -> bool:
+    return info[:5] == ("Unknown", "Unknown", "Unknown", "default", "default")
+
+
+def _normalize(name) -> str:
+    return re.sub(r"[^0-9a-z]", "", str(name or "").lower())
+
+
+def _file_stat(path) -> tuple | None:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
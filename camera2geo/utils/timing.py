@@ -0,0 +1,129 @@
+import json
+import time
+
+import numpy as np
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_active = ContextVar("camera2geo_timings", default=None)
+
+
+class _Recorder:
+    __slots__ = ("timings", "nested")
+
+    def __init__(self, timings: dict):
+        self.timings = timings
+        # Seconds spent in nested stages, one entry per open stage
+        self.nested = []
+
+
+@contextmanager
+def record_timings(timings: dict):
+    """
+    Collect the seconds spent in each `timed` stage into `timings` while the block runs. Recording is per thread and per context, so concurrent images never share a recorder.
+
+    Args:
+        timings (dict): Mapping of stage name to seconds, updated in place.
+    """
+    token = _active.set(_Recorder(timings))
+    try:
+        yield timings
+    finally:
+        _active.reset(token)
+
+
+@contextmanager
+def timed(stage: str):
+    """
+    Time a stage of the current image. Usable as a context manager or decorator, and a no-op when no `record_timings` block is active. Times are exclusive: seconds spent in a nested stage are only counted for the nested stage.
+
+    Args:
+        stage (str): Stage name used in timings and run reports.
+    """
+    recorder = _active.get()
+    if recorder is None:
+        yield
+        return
+
+    recorder.nested.append(0.0)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        nested = recorder.nested.pop()
+        timings = recorder.timings
+        timings[stage] = timings.get(stage, 0.0) + elapsed - nested
+        if recorder.nested:
+            recorder.nested[-1] += elapsed
+
+
+class RunReport:
+    """
+    Per-image and aggregate stage timings of a run, written as JSON.
+    """
+
+    def __init__(self):
+        self.images = []
+
+    def add(self, result):
+        """
+        Record the timings of a finished ImageResult.
+        """
+        self.images.append(
+            {
+                "input_path": result.input_path,
+                "output_path": result.output_path,
+                "seconds": result.seconds,
+                "skipped": result.skipped,
+                "error": result.error,
+                "timings": dict(result.timings),
+            }
+        )
+
+    def summary(self) -> dict:
+        """
+        Aggregate timings per stage.
+
+        Returns:
+            dict: Stage name to count, total, p50, p95 and max seconds.
+        """
+        per_stage = {}
+        for image in self.images:
+            for stage, seconds in image["timings"].items():
+                per_stage.setdefault(stage, []).append(seconds)
+
+        summary = {}
+        for stage, values in per_stage.items():
+            values = np.asarray(values, dtype=float)
+            summary[stage] = {
+                "count": int(values.size),
+                "total": float(values.sum()),
+                "p50": float(np.percentile(values, 50)),
+                "p95": float(np.percentile(values, 95)),
+                "max": float(values.max()),
+            }
+        return summary
+
+    def write(self, path: str, wall_seconds: float):
+        """
+        Write the report to `path`.
+
+        Args:
+            path (str): Destination JSON file.
+            wall_seconds (float): Elapsed time of the whole run.
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "wall_seconds": wall_seconds,
+                    "images": len(self.images),
+                    "skipped": sum(image["skipped"] for image in self.images),
+                    "failed": sum(image["error"] is not None for image in self.images),
+                    "stages": self.summary(),
+                    "per_image": self.images,
+                },
+                f,
+                indent=2,
+            )
@@ -0,0 +1,204 @@
+import os
+import json
+import sqlite3
+import struct
+
+from typing import List
+
+from shapely.geometry import shape
+
+GPKG_APPLICATION_ID = 0x47504B47  # "GPKG"
+GPKG_USER_VERSION = 10200
+WGS84_DEFINITION = (
+    'GEOGCS["WGS 84",DATUM["WGS_1984",SPHEROID["WGS 84",6378137,298.257223563,'
+    'AUTHORITY["EPSG","7030"]],AUTHORITY["EPSG","6326"]],PRIMEM["Greenwich",0,'
+    'AUTHORITY["EPSG","8901"]],UNIT["degree",0.0174532925199433,'
+    'AUTHORITY["EPSG","9122"]],AXIS["Latitude",NORTH],AXIS["Longitude",EAST],'
+    'AUTHORITY["EPSG","4326"]]'
+)
+
+
+def write_features(features: List[dict], output_path: str, layer_name: str):
+    """
+    Write GeoJSON feature dicts in WGS84 to a GeoJSON or GeoPackage file, chosen by the file extension.
+
+    Args:
+        features (List[dict]): GeoJSON features with geometries in longitude, latitude order.
+        output_path (str): Destination ending in .geojson, .json or .gpkg. An existing file is replaced.
+        layer_name (str): Table name used for GeoPackage output.
+    """
+    extension = os.path.splitext(output_path)[1].lower()
+    if extension in (".geojson", ".json"):
+        write_geojson(features, output_path)
+    elif extension == ".gpkg":
+        write_geopackage(features, output_path, layer_name)
+    else:
+        raise ValueError(
+            f"Unsupported vector format '{extension}'. Use .geojson, .json or .gpkg."
+        )
+
+
+def write_geojson(features: List[dict], output_path: str):
+    """
+    Write features as a GeoJSON FeatureCollection.
+    """
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(
+            {"type": "FeatureCollection", "features": features}, f, default=_to_json
+        )
+
+
+def write_geopackage(features: List[dict], output_path: str, layer_name: str):
+    """
+    Write features to a single-layer GeoPackage using the standard library sqlite3 module. Property columns are typed INTEGER, REAL or TEXT from their values; lists and other values are stored as JSON text.
+    """
+    if os.path.exists(output_path):
+        os.remove(output_path)
+
+    geometries = [shape(feature["geometry"]) for feature in features]
+    geometry_type = geometries[0].geom_type.upper() if geometries else "GEOMETRY"
+    columns = _property_columns(features)
+
+    con = sqlite3.connect(output_path)
+    try:
+        con.execute(f"PRAGMA application_id = {GPKG_APPLICATION_ID}")
+        con.execute(f"PRAGMA user_version = {GPKG_USER_VERSION}")
+        con.executescript("""
+            CREATE TABLE gpkg_spatial_ref_sys (
+                srs_name TEXT NOT NULL,
+                srs_id INTEGER NOT NULL PRIMARY KEY,
+                organization TEXT NOT NULL,
+                organization_coordsys_id INTEGER NOT NULL,
+                definition TEXT NOT NULL,
+                description TEXT
+            );
+            CREATE TABLE gpkg_contents (
+                table_name TEXT NOT NULL PRIMARY KEY,
+                data_type TEXT NOT NULL,
+                identifier TEXT UNIQUE,
+                description TEXT DEFAULT '',
+                last_change DATETIME NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ','now')),
+                min_x DOUBLE, min_y DOUBLE, max_x DOUBLE, max_y DOUBLE,
+                srs_id INTEGER,
+                CONSTRAINT fk_gc_r_srs_id FOREIGN KEY (srs_id) REFERENCES gpkg_spatial_ref_sys(srs_id)
+            );
+            CREATE TABLE gpkg_geometry_columns (
+                table_name TEXT NOT NULL,
+                column_name TEXT NOT NULL,
+                geometry_type_name TEXT NOT NULL,
+                srs_id INTEGER NOT NULL,
+                z TINYINT NOT NULL,
+                m TINYINT NOT NULL,
+                CONSTRAINT pk_geom_cols PRIMARY KEY (table_name, column_name),
+                CONSTRAINT fk_gc_tn FOREIGN KEY (table_name) REFERENCES gpkg_contents(table_name),
+                CONSTRAINT fk_gc_srs FOREIGN KEY (srs_id) REFERENCES gpkg_spatial_ref_sys (srs_id)
+            );
+            """)
+        con.executemany(
+            "INSERT INTO gpkg_spatial_ref_sys VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                ("Undefined cartesian SRS", -1, "NONE", -1, "undefined", None),
+                ("Undefined geographic SRS", 0, "NONE", 0, "undefined", None),
+                ("WGS 84 geodetic", 4326, "EPSG", 4326, WGS84_DEFINITION, None),
+            ],
+        )
+
+        column_sql = "".join(f', "{name}" {sql_type}' for name, sql_type in columns)
+        con.execute(
+            f'CREATE TABLE "{layer_name}" '
+            f"(fid INTEGER PRIMARY KEY AUTOINCREMENT, geom {geometry_type}{column_sql})"
+        )
+        placeholders = ", ".join("?" * (len(columns) + 1))
+        names = "".join(f', "{name}"' for name, _ in columns)
+        con.executemany(
+            f'INSERT INTO "{layer_name}" (geom{names}) VALUES ({placeholders})',
+            [
+                [_geopackage_blob(geometry)]
+                + [
+                    _to_column(feature["properties"].get(name), sql_type)
+                    for name, sql_type in columns
+                ]
+                for feature, geometry in zip(features, geometries)
+            ],
+        )
+
+        bounds = _total_bounds(geometries)
+        con.execute(
+            "INSERT INTO gpkg_contents "
+            "(table_name, data_type, identifier, min_x, min_y, max_x, max_y, srs_id) "
+            "VALUES (?, 'features', ?, ?, ?, ?, ?, 4326)",
+            (layer_name, layer_name, *bounds),
+        )
+        con.execute(
+            "INSERT INTO gpkg_geometry_columns VALUES (?, 'geom', ?, 4326, 0, 0)",
+            (layer_name, geometry_type),
+        )
+        con.commit()
+    finally:
+        con.close()
+
+
+def _geopackage_blob(geometry) -> bytes:
+    # Header: magic, version 0, little-endian flags with an [minx, maxx, miny, maxy] envelope, srs id
+    minx, miny, maxx, maxy = geometry.bounds
+    header = b"GP" + struct.pack("<BBi4d", 0, 0b00000011, 4326, minx, maxx, miny, maxy)
+    return header + geometry.wkb
+
+
+def _property_columns(features: List[dict]) -> list:
+    names = []
+    for feature in features:
+        for name in feature["properties"]:
+            if name not in names:
+                names.append(name)
+
+    columns = []
+    for name in names:
+        values = [
+            feature["properties"].get(name)
+            for feature in features
+            if feature["properties"].get(name) is not None
+        ]
+        if values and all(
+            isinstance(v, int) and not isinstance(v, bool) for v in values
+        ):
+            columns.append((name, "INTEGER"))
+        elif values and all(
+            isinstance(v, (int, float)) and not isinstance(v, bool) for v in values
+        ):
+            columns.append((name, "REAL"))
+        else:
+            columns.append((name, "TEXT"))
+    return columns
+
+
+def _to_column(value, sql_type: str):
+    if value is None:
+        return None
+    if sql_type == "INTEGER":
+        return int(value)
+    if sql_type == "REAL":
+        return float(value)
+    if isinstance(value, str):
+        return value
+    return json.dumps(value, default=_to_json)
+
+
+def _total_bounds(geometries) -> tuple:
+    if not geometries:
+        return None, None, None, None
+    bounds = [g.bounds for g in geometries]
+    return (
+        min(b[0] for b in bounds),
+        min(b[1] for b in bounds),
+        max(b[2] for b in bounds),
+        max(b[3] for b in bounds),
+    )
+
+
+def _to_json(value):
+    # NumPy scalars
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return str(value)
@@ -0,0 +1,585 @@
+import cv2
+import numpy as np
+import rasterio
+import warnings
+
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from rasterio.crs import CRS
+from rasterio.enums import Resampling
+from rasterio.errors import NotGeoreferencedWarning
+from rasterio.io import DatasetReader
+from rasterio.transform import Affine
+from rasterio.warp import calculate_default_transform
+from rasterio.windows import Window
+from shapely import Polygon
+from skimage.exposure import equalize_adapthist
+
+from .geospatial import metres_to_crs_units
+from .lens import LensNodes, image_lens_nodes
+from .timing import timed
+
+# Outputs written as PNG with a world file
+PNG_EXTENSIONS = {".png"}
+
+# Output rows resampled per strip
+STRIP_ROWS = 256
+
+# Output tile sides of the tiled engine; tiles are MIN_TILE_SIZE times a power of 2,
+# so quartered tiles still line up with GeoTIFF blocks
+MAX_TILE_SIZE = 1024
+MIN_TILE_SIZE = 16
+
+# Bytes per output pixel of a tile's coordinate maps and their temporaries
+MAP_BYTES_PER_PIXEL = 32
+
+# Pixel spacing of the coordinates sampled to find a tile's source window
+TILE_SAMPLE_STEP = 8
+
+
+@dataclass
+class GridRaster:
+    """
+    Image array already resampled onto its output grid, ready to be written without reprojection.
+    """
+
+    array: np.ndarray
+    transform: Affine
+    crs: CRS
+
+    def close(self):
+        self.array = None
+
+
+def to_rgb(image_array: np.ndarray) -> np.ndarray:
+    """
+    Reorder the channels of a cv2-decoded array from BGR(A) to RGB(A). Single band arrays are returned as is.
+    """
+    if image_array.ndim == 2:
+        return image_array
+    if image_array.ndim == 3:
+        return cv2.cvtColor(image_array, cv2.COLOR_BGR2RGB)
+    return cv2.cvtColor(image_array, cv2.COLOR_BGR2RGBA)
+
+
+def target_resolution_m(image) -> float | None:
+    """
+    Output pixel size in meters requested by the run settings of an ImageClass: `resolution_m`, or `gsd_multiple` times the image's GSD.
+
+    Returns:
+        float | None: Pixel size in meters, or None for the native grid.
+    """
+    settings = image.settings
+    if settings.resolution_m:
+        return settings.resolution_m
+    if settings.gsd_multiple and image.gsd > 0:
+        return settings.gsd_multiple * image.gsd
+    return None
+
+
+def decode_factor(image) -> int:
+    """
+    Integer factor an image can be downscaled by when decoding while staying at least as fine as its target resolution, or the preview scale if that is coarser.
+    """
+    factor = image.settings.preview or 1
+    target = target_resolution_m(image)
+    if target is not None and image.gsd > 0:
+        factor = max(factor, int(target / image.gsd))
+    return factor
+
+
+def output_resolution(image) -> tuple | None:
+    """
+    Target pixel size of an ImageClass in output CRS units, measured at its footprint centre.
+
+    Returns:
+        tuple | None: (x resolution, y resolution), or None for the native grid.
+    """
+    target = target_resolution_m(image)
+    if target is None:
+        if image.settings.gsd_multiple:
+            warnings.warn(
+                f"No GSD for {image.image_path}; writing it at native resolution."
+            )
+        return None
+    x, y = np.asarray(image.coord_array, dtype=np.float64)[:4].mean(axis=0)
+    return metres_to_crs_units(target, image.settings.epsg, x, y)
+
+
+def output_grid(
+    bounds: tuple,
+    width: int,
+    height: int,
+    crs: CRS,
+    resolution: tuple | None = None,
+) -> tuple:
+    """
+    North-up output grid of a footprint, sized like `warp_to_geotiff_file` sizes the reprojection of an image-sized canvas over the footprint bounds.
+
+    Args:
+        bounds (tuple): (minx, miny, maxx, maxy) of the footprint in `crs`.
+        width (int): Source image width in pixels.
+        height (int): Source image height in pixels.
+        crs (CRS): Output coordinate reference system.
+        resolution (tuple | None): (x, y) pixel size in `crs` units. If None, the pixel count follows the source image.
+
+    Returns:
+        tuple: (transform, width, height) of the output grid.
+    """
+    return calculate_default_transform(
+        crs, crs, width, height, *bounds, resolution=resolution
+    )
+
+
+def grid_to_source(
+    coordinate_array,
+    width: int,
+    height: int,
+    transform: Affine,
+    cols,
+    rows,
+) -> tuple:
+    """
+    Source pixel coordinates of the output grid pixel centres in a block of columns and rows, through the homography that maps the image corners onto the footprint corners.
+
+    Args:
+        coordinate_array: Footprint corners matching the image's top-left, top-right, bottom-right and bottom-left corners.
+        width (int): Source image width in pixels.
+        height (int): Source image height in pixels.
+        transform (Affine): North-up transform of the output grid.
+        cols: Output grid columns to map, as a range or array.
+        rows: Output grid rows to map, as a range or array.
+
+    Returns:
+        tuple: (map_x, map_y) float32 arrays of shape (len(rows), len(cols)) for `cv2.remap`. Pixels outside the image are mapped to -1.
+    """
+    corners = np.asarray(coordinate_array, dtype=np.float64)[:4]
+    minx, maxy = corners[:, 0].min(), corners[:, 1].max()
+    # Scale the footprint to image-sized pixels to keep float32 precise
+    scale_x = (corners[:, 0].max() - minx) / width
+    scale_y = (maxy - corners[:, 1].min()) / height
+    footprint = np.float32(
+        np.column_stack(
+            [(corners[:, 0] - minx) / scale_x, (maxy - corners[:, 1]) / scale_y]
+        )
+    )
+    image_corners = np.float32([[0, 0], [width, 0], [width, height], [0, height]])
+    h = cv2.getPerspectiveTransform(footprint, image_corners)
+
+    centres_x = transform.c + transform.a * (np.asarray(cols) + 0.5)
+    centres_y = transform.f + transform.e * (np.asarray(rows) + 0.5)
+    px = np.float32((centres_x - minx) / scale_x)[np.newaxis, :]
+    py = np.float32((maxy - centres_y) / scale_y)[:, np.newaxis]
+
+    w = np.float32(h[2, 0]) * px + np.float32(h[2, 1]) * py + np.float32(h[2, 2])
+    # Image corners are pixel edges; cv2.remap samples at pixel centres
+    map_x = (
+        np.float32(h[0, 0]) * px + np.float32(h[0, 1]) * py + np.float32(h[0, 2])
+    ) / w - 0.5
+    map_y = (
+        np.float32(h[1, 0]) * px + np.float32(h[1, 1]) * py + np.float32(h[1, 2])
+    ) / w - 0.5
+    outside = w <= 0
+    map_x[outside] = -1
+    map_y[outside] = -1
+    return map_x, map_y
+
+
+def undistorted_to_source(
+    nodes: LensNodes, map_x: np.ndarray, map_y: np.ndarray
+) -> tuple:
+    """
+    Compose pixel coordinates in the undistorted image with the lens undistortion, giving coordinates in the distorted source image. The displacement is interpolated bilinearly between LensNodes, so no full-size map is needed.
+
+    Args:
+        nodes (LensNodes): Undistortion nodes from the LensMapCache.
+        map_x (np.ndarray): Undistorted x coordinates.
+        map_y (np.ndarray): Undistorted y coordinates.
+
+    Returns:
+        tuple: (map_x, map_y) float32 source coordinates. Coordinates outside the undistorted image are mapped to -1.
+    """
+    width = nodes.nodes_x[-1] + 1
+    height = nodes.nodes_y[-1] + 1
+    displacement = cv2.remap(
+        nodes.displacement,
+        np.interp(map_x, nodes.nodes_x, np.arange(len(nodes.nodes_x))).astype(
+            np.float32
+        ),
+        np.interp(map_y, nodes.nodes_y, np.arange(len(nodes.nodes_y))).astype(
+            np.float32
+        ),
+        cv2.INTER_LINEAR,
+        borderMode=cv2.BORDER_REPLICATE,
+    )
+
+    # The undistorted image spans half a pixel beyond its outer pixel centres
+    outside = (
+        (map_x < -0.5) | (map_x > width - 0.5) | (map_y < -0.5) | (map_y > height - 0.5)
+    )
+    source_x = map_x + displacement[..., 0]
+    source_y = map_y + displacement[..., 1]
+    source_x[outside] = -1
+    source_y[outside] = -1
+    return source_x, source_y
+
+
+@timed("fused_warp")
+def warp_to_grid(image, jpeg_img: np.ndarray) -> GridRaster:
+    """
+    Resample a decoded image straight onto its output grid in one pass. Lens undistortion, the image-to-footprint homography and the output grid are composed into one destination-to-source coordinate map, so the source is interpolated once and no intermediate full-size frames are allocated. Maps are built for one strip of output rows at a time.
+
+    Args:
+        image: ImageClass with `coord_array` and `settings` set.
+        jpeg_img (np.ndarray): The decoded image array from `read_raster`.
+
+    Returns:
+        GridRaster: RGB(A) or single band array on a north-up grid in the output CRS.
+    """
+    settings = image.settings
+    height, width = jpeg_img.shape[:2]
+    crs = CRS.from_epsg(settings.epsg)
+    transform, grid_width, grid_height = output_grid(
+        Polygon(image.coord_array).bounds,
+        width,
+        height,
+        crs,
+        output_resolution(image),
+    )
+    nodes = None
+    if settings.lens_correction:
+        nodes = image_lens_nodes(image, width, height)
+
+    if settings.image_equalize:
+        # CLAHE needs the whole frame, so it runs on the source before resampling
+        with timed("clahe"):
+            source = equalize_adapthist(to_rgb(jpeg_img), clip_limit=0.03)
+    else:
+        source = jpeg_img
+
+    # Coordinate maps are built a strip at a time so only the output is full-size
+    array = None
+    for start in range(0, grid_height, STRIP_ROWS):
+        rows = range(start, min(start + STRIP_ROWS, grid_height))
+        map_x, map_y = grid_to_source(
+            image.coord_array, width, height, transform, range(grid_width), rows
+        )
+        if nodes is not None:
+            map_x, map_y = undistorted_to_source(nodes, map_x, map_y)
+        strip = cv2.remap(
+            source, map_x, map_y, cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT
+        )
+        if not settings.image_equalize:
+            strip = to_rgb(strip)
+        if array is None:
+            array = np.empty((grid_height,) + strip.shape[1:], strip.dtype)
+        array[rows.start : rows.stop] = strip
+    return GridRaster(array, transform, crs)
+
+
+def is_png(path: str) -> bool:
+    """
+    Whether an output path is written as a PNG with a world file instead of a GeoTIFF.
+    """
+    return Path(path).suffix.lower() in PNG_EXTENSIONS
+
+
+def write_grid_raster(geotiff_file: str, raster: GridRaster):
+    """
+    Write a GridRaster with 0 as nodata. Paths ending in .png are written as PNGs whose georeferencing is kept in a world file (.wld) and a .aux.xml sidecar carrying the CRS; other paths as GeoTIFFs.
+    """
+    array = raster.array
+    bands = 1 if array.ndim == 2 else array.shape[2]
+    options = {"driver": "GTiff"}
+    if is_png(geotiff_file):
+        # Fast compression; previews are written far more often than kept
+        options = {"driver": "PNG", "worldfile": "YES", "zlevel": 1}
+        if array.dtype.kind == "f":
+            # Equalized images are floats in [0, 1]; PNG holds integers
+            array = np.uint8(np.clip(array, 0, 1) * 255)
+    with rasterio.open(
+        geotiff_file,
+        "w",
+        **options,
+        height=array.shape[0],
+        width=array.shape[1],
+        count=bands,
+        dtype=array.dtype,
+        crs=raster.crs,
+        transform=raster.transform,
+        nodata=0,
+    ) as dst:
+        if bands == 1:
+            dst.write(array, 1)
+        else:
+            for i in range(bands):
+                dst.write(array[:, :, i], i + 1)
+
+
+@dataclass
+class TiledWarp:
+    """
+    Output grid of an image whose source is read window by window while its tiles are resampled and written, so only one tile and its source window are held in memory.
+    """
+
+    image: object
+    source: DatasetReader
+    factor: int
+    width: int
+    height: int
+    transform: Affine
+    crs: CRS
+    grid_width: int
+    grid_height: int
+    nodes: LensNodes | None
+
+    def close(self):
+        self.source.close()
+
+
+def open_tiled_source(path: str) -> DatasetReader:
+    """
+    Open a source image for windowed reads. Bands are read in file order, which GDAL keeps as RGB(A) for JPEGs.
+    """
+    with warnings.catch_warnings():
+        # Camera images carry no georeferencing of their own
+        warnings.simplefilter("ignore", NotGeoreferencedWarning)
+        return rasterio.open(path)
+
+
+def plan_tiled_warp(image, source: DatasetReader) -> TiledWarp:
+    """
+    Output grid and lens nodes of an image opened with `open_tiled_source`. Nothing is decoded; pixels are only read by `write_tiled_warp`.
+
+    Args:
+        image: ImageClass with `coord_array` and `settings` set.
+        source (DatasetReader): The opened source image.
+
+    Returns:
+        TiledWarp: The plan, owning `source`.
+    """
+    settings = image.settings
+    factor = decode_factor(image)
+    width = max(1, source.width // factor)
+    height = max(1, source.height // factor)
+    crs = CRS.from_epsg(settings.epsg)
+    transform, grid_width, grid_height = output_grid(
+        Polygon(image.coord_array).bounds,
+        width,
+        height,
+        crs,
+        output_resolution(image),
+    )
+    nodes = None
+    if settings.lens_correction:
+        nodes = image_lens_nodes(image, width, height)
+    return TiledWarp(
+        image,
+        source,
+        factor,
+        width,
+        height,
+        transform,
+        crs,
+        grid_width,
+        grid_height,
+        nodes,
+    )
+
+
+def tile_size(budget_bytes: int, pixel_bytes: int) -> int:
+    """
+    Side of the largest square output tile, MIN_TILE_SIZE times a power of 2 up to MAX_TILE_SIZE, whose coordinate maps, output and copy of its source window fit in `budget_bytes`. The window is taken to be about as large as the tile.
+    """
+    per_pixel = MAP_BYTES_PER_PIXEL + 2 * pixel_bytes
+    size = MIN_TILE_SIZE
+    while size < MAX_TILE_SIZE and (2 * size) ** 2 * per_pixel <= budget_bytes:
+        size *= 2
+    return size
+
+
+def _tile_maps(plan: TiledWarp, cols, rows) -> tuple:
+    map_x, map_y = grid_to_source(
+        plan.image.coord_array, plan.width, plan.height, plan.transform, cols, rows
+    )
+    if plan.nodes is not None:
+        map_x, map_y = undistorted_to_source(plan.nodes, map_x, map_y)
+    return map_x, map_y
+
+
+def _source_window(plan: TiledWarp, cols: range, rows: range):
+    # Source pixels a tile samples, from its maps every TILE_SAMPLE_STEP pixels
+    # padded by how far they move between samples
+    map_x, map_y = _tile_maps(plan, _samples(cols), _samples(rows))
+    outside = (map_x == -1) & (map_y == -1)
+    map_x = np.where(outside, np.nan, map_x)
+    map_y = np.where(outside, np.nan, map_y)
+    steps = [np.abs(np.diff(m, axis=a)) for m in (map_x, map_y) for a in (0, 1)]
+    steps = [step for step in steps if np.isfinite(step).any()]
+    pad = 1 + max((np.nanmax(step) for step in steps), default=0)
+    with np.errstate(invalid="ignore"):
+        valid = (
+            (map_x > -1 - pad)
+            & (map_x < plan.width + pad)
+            & (map_y > -1 - pad)
+            & (map_y < plan.height + pad)
+        )
+    if not valid.any():
+        return None
+    xs, ys = map_x[valid], map_y[valid]
+    col_off = max(0, int(np.floor(xs.min() - pad)))
+    row_off = max(0, int(np.floor(ys.min() - pad)))
+    col_end = min(plan.width, int(np.floor(xs.max() + pad)) + 2)
+    row_end = min(plan.height, int(np.floor(ys.max() + pad)) + 2)
+    if col_end <= col_off or row_end <= row_off:
+        return None
+    return Window(col_off, row_off, col_end - col_off, row_end - row_off)
+
+
+def _samples(pixels: range) -> np.ndarray:
+    return np.unique(np.append(np.asarray(pixels[::TILE_SAMPLE_STEP]), pixels[-1]))
+
+
+def plan_tiles(plan: TiledWarp, size: int, max_rows: int) -> list:
+    """
+    Output tiles of a TiledWarp with the source window each one samples. Tiles whose window spans more than `max_rows` source rows, as near a steep horizon, are split into quarters down to MIN_TILE_SIZE. Tiles outside the image are dropped. Tiles are ordered by the last source row they need, so sources are read in one forward pass.
+
+    Args:
+        plan (TiledWarp): The plan from `plan_tiled_warp`.
+        size (int): Side of the output tiles in pixels.
+        max_rows (int): Source rows a tile's window may span.
+
+    Returns:
+        list: (cols, rows, window) per tile, with `window` in reduced source pixels.
+    """
+    pending = [
+        (
+            range(col, min(col + size, plan.grid_width)),
+            range(row, min(row + size, plan.grid_height)),
+        )
+        for row in range(0, plan.grid_height, size)
+        for col in range(0, plan.grid_width, size)
+    ]
+    tiles = []
+    while pending:
+        cols, rows = pending.pop()
+        window = _source_window(plan, cols, rows)
+        if window is None:
+            continue
+        if window.height > max_rows and max(len(cols), len(rows)) > MIN_TILE_SIZE:
+            mid_col = cols.start + (len(cols) + 1) // 2
+            mid_row = rows.start + (len(rows) + 1) // 2
+            for part_cols in (range(cols.start, mid_col), range(mid_col, cols.stop)):
+                for part_rows in (
+                    range(rows.start, mid_row),
+                    range(mid_row, rows.stop),
+                ):
+                    if len(part_cols) and len(part_rows):
+                        pending.append((part_cols, part_rows))
+            continue
+        tiles.append((cols, rows, window))
+    tiles.sort(key=lambda tile: (tile[2].row_off + tile[2].height, tile[2].row_off))
+    return tiles
+
+
+def _pixel_bytes(source: DatasetReader) -> int:
+    return source.count * np.dtype(source.dtypes[0]).itemsize
+
+
+def _read_rows(plan: TiledWarp, start: int, stop: int) -> np.ndarray:
+    # Full-width reduced source rows as a (rows, width, bands) array
+    source, factor = plan.source, plan.factor
+    pixels = source.read(
+        window=Window(0, start * factor, plan.width * factor, (stop - start) * factor),
+        out_shape=(source.count, stop - start, plan.width),
+        resampling=Resampling.average,
+    )
+    return np.moveaxis(pixels, 0, -1)
+
+
+@timed("tiled_warp")
+def write_tiled_warp(geotiff_file: str, plan: TiledWarp, budget_mb: int):
+    """
+    Resample a TiledWarp onto its output grid tile by tile and write it as a tiled GeoTIFF with 0 as nodata. Source rows are read forward into a rolling buffer that only keeps the rows later tiles still need, since JPEG decoders restart from the top whenever an earlier row is read again. With the tiles, the buffer and GDAL's block cache each held to a share of the budget, peak memory follows `budget_mb` rather than the frame size.
+
+    Args:
+        geotiff_file (str): Output GeoTIFF path.
+        plan (TiledWarp): The plan from `plan_tiled_warp`.
+        budget_mb (int): Memory budget of the image in MB.
+    """
+    source = plan.source
+    budget_bytes = budget_mb * 1024 * 1024
+    # A quarter of the budget for a tile, a quarter for source rows read ahead
+    # of twice the rows a window may span, and a quarter for GDAL's block cache
+    size = tile_size(budget_bytes // 4, _pixel_bytes(source))
+    max_rows = max(2, budget_bytes // 8 // (plan.width * _pixel_bytes(source)))
+    tiles = plan_tiles(plan, size, max_rows)
+    # Tiles are not split below MIN_TILE_SIZE, so tight budgets may need more rows
+    max_rows = max([max_rows] + [window.height for _, _, window in tiles])
+    # First source row needed by each tile or any tile after it
+    needed = np.minimum.accumulate([window.row_off for _, _, window in tiles][::-1])
+    needed = needed[::-1]
+    # Blocks match the most common tile side, so tiles fill whole blocks
+    sides = Counter(len(cols) for cols, _, _ in tiles if len(cols) % MIN_TILE_SIZE == 0)
+    block = sides.most_common(1)[0][0] if sides else size
+
+    buffer = np.empty(
+        (min(2 * max_rows, plan.height), plan.width, source.count), source.dtypes[0]
+    )
+    top = end = 0
+    with (
+        rasterio.Env(GDAL_CACHEMAX=max(1, budget_mb // 4)),
+        rasterio.open(
+            geotiff_file,
+            "w",
+            driver="GTiff",
+            tiled=True,
+            blockxsize=block,
+            blockysize=block,
+            height=plan.grid_height,
+            width=plan.grid_width,
+            count=source.count,
+            dtype=source.dtypes[0],
+            crs=plan.crs,
+            transform=plan.transform,
+            nodata=0,
+        ) as dst,
+    ):
+        for (cols, rows, window), first in zip(tiles, needed):
+            bottom = window.row_off + window.height
+            if bottom > end:
+                # Drop rows no later tile needs; tiles are sorted by bottom row and
+                # span at most max_rows rows, so this window is always kept
+                keep = max(first, bottom - max_rows, top)
+                kept = max(0, end - keep)
+                buffer[:kept] = buffer[keep - top : end - top]
+                top, end = keep, keep + kept
+                stop = min(plan.height, top + len(buffer))
+                buffer[end - top : stop - top] = _read_rows(plan, end, stop)
+                end = stop
+
+            pixels = buffer[
+                window.row_off - top : bottom - top,
+                window.col_off : window.col_off + window.width,
+            ]
+            map_x, map_y = _tile_maps(plan, cols, rows)
+            map_x -= np.float32(window.col_off)
+            map_y -= np.float32(window.row_off)
+            # cv2.remap takes at most 4 channels, so band stacks are remapped in groups
+            tile = np.dstack(
+                [
+                    cv2.remap(
+                        np.ascontiguousarray(pixels[..., band : band + 4]),
+                        map_x,
+                        map_y,
+                        cv2.INTER_LINEAR,
+                        borderMode=cv2.BORDER_CONSTANT,
+                    )
+                    for band in range(0, source.count, 4)
+                ]
+            )
+            dst.write(
+                np.moveaxis(tile, -1, 0),
+                window=Window(cols.start, rows.start, len(cols), len(rows)),
+            )
@@ -1,3 +1,5 @@
+import json
+import numpy as np
 import pytest
 from pathlib import Path
 from PIL import Image
@@ -6,6 +8,13 @@ import exiftool
 from camera2geo import *
 
 
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    """Keep the persistent caches of every test out of the user's cache directory."""
+    monkeypatch.setenv("CAMERA2GEO_CACHE_DIR", str(tmp_path / "cache"))
+    return tmp_path / "cache"
+
+
 @pytest.fixture(scope="session")
 def test_image(tmp_path_factory):
     """Create a tiny test image with realistic EXIF/XMP metadata."""
@@ -87,6 +96,690 @@ def test_camera2geo_param_sweep(
     assert produced.exists(), f"Expected output GeoTIFF missing: {produced}"
 
 
+@pytest.mark.parametrize("run_options", [{"workers": 2}, {"prefetch": 2}])
+def test_camera2geo_parallel_matches_serial(test_image, tmp_path, run_options):
+    """Process-pool and staged pipeline runs must write the same bytes as serial runs."""
+    serial = camera2geo(
+        input_images=str(test_image),
+        output_images=str(tmp_path / "serial" / "$_Geo.tif"),
+    )
+    parallel = camera2geo(
+        input_images=str(test_image),
+        output_images=str(tmp_path / "parallel" / "$_Geo.tif"),
+        **run_options,
+    )
+
+    assert len(serial) == len(parallel) == 1
+    assert Path(serial[0]).read_bytes() == Path(parallel[0]).read_bytes()
+
+
+@pytest.mark.parametrize("run_options", [{}, {"workers": 2}, {"prefetch": 2}])
+def test_camera2geo_iter_reports_raster_failures(test_image, tmp_path, run_options):
+    """An output that cannot be written is reported on the image's result."""
+    # A directory in place of the output file makes the write fail
+    (tmp_path / f"{test_image.stem}_Geo.tif").mkdir()
+
+    results = list(
+        camera2geo_iter(
+            input_images=str(test_image),
+            output_images=str(tmp_path / "$_Geo.tif"),
+            **run_options,
+        )
+    )
+
+    assert len(results) == 1
+    assert results[0].error is not None
+
+
+def test_camera2geo_iter_yields_results(test_image, tmp_path):
+    """Each image yields a result record with its footprint and no error."""
+    results = list(
+        camera2geo_iter(
+            input_images=str(test_image),
+            output_images=str(tmp_path / "$_Geo.tif"),
+            chunk_size=1,
+        )
+    )
+
+    assert len(results) == 1
+    result = results[0]
+    assert result.error is None
+    assert result.input_path == str(test_image)
+    assert Path(result.output_path).exists()
+    assert len(result.footprint) == 4
+    assert result.seconds > 0
+
+
+def test_camera2geo_iter_skips_unchanged(test_image, tmp_path):
+    """A second run with the same settings skips the image unless forced."""
+    kwargs = dict(
+        input_images=str(test_image),
+        output_images=str(tmp_path / "$_Geo.tif"),
+    )
+    first = list(camera2geo_iter(**kwargs))
+    second = list(camera2geo_iter(**kwargs))
+    changed = list(camera2geo_iter(**kwargs, cog=True))
+    forced = list(camera2geo_iter(**kwargs, cog=True, force=True))
+
+    assert not first[0].skipped
+    assert second[0].skipped
+    assert second[0].footprint == first[0].footprint
+    assert not changed[0].skipped
+    assert not forced[0].skipped
+
+
+def test_camera2geo_report(test_image, tmp_path):
+    """The run report aggregates stage timings across images."""
+    report_path = tmp_path / "report.json"
+    camera2geo(
+        input_images=str(test_image),
+        output_images=str(tmp_path / "$_Geo.tif"),
+        report_path=str(report_path),
+    )
+
+    report = json.loads(report_path.read_text())
+    assert report["images"] == 1
+    for stage in ("exiftool", "fov", "imread", "warp_perspective", "reproject"):
+        timing = report["stages"][stage]
+        assert timing["p50"] <= timing["p95"] <= timing["max"] <= timing["total"]
+
+
+@pytest.mark.parametrize("extension", [".geojson", ".gpkg"])
+def test_camera2geo_footprints(test_image, tmp_path, extension):
+    """Footprints are written to a vector file without creating any GeoTIFF."""
+    output = camera2geo_footprints(
+        input_images=str(test_image),
+        output_path=str(tmp_path / f"footprints{extension}"),
+    )
+
+    assert Path(output).exists()
+    assert not list(tmp_path.glob("*.tif"))
+
+    # Every image survives chunk boundaries
+    output = camera2geo_footprints(
+        input_images=[str(test_image)] * 3,
+        output_path=str(tmp_path / "chunked.geojson"),
+        chunk_size=2,
+    )
+    assert len(json.loads(Path(output).read_text())["features"]) == 3
+
+
+# Corner offsets (m) recorded from the previous 50-digit mpmath implementation.
+# focal, sensor w/h, lens FOV w/h, yaw, pitch, roll, declination, altitude
+FOOTPRINT_CASES = [
+    (
+        (10.26, 13.2, 8.8, 1.0, 1.0, -86.1, -89.9, 0.0, 0.0, 74.9),
+        [
+            (-35.480523, -45.910548),
+            (-28.921475, 50.301036),
+            (35.1668, 45.859642),
+            (28.617563, -50.208024),
+        ],
+    ),
+    (
+        (4.5, 6.17, 4.55, 0.98, 0.95, 12.0, -60.0, 1.5, 9.7, 120.0),
+        [
+            (-51.53538, 214.030268),
+            (181.691922, 109.756987),
+            (68.535201, -18.879941),
+            (-65.082437, 37.997927),
+        ],
+    ),
+    (
+        (24.0, 35.9, 24.0, 1.0, 1.0, 170.0, -45.0, -2.0, -13.2, 40.0),
+        [
+            (21.359989, 24.701097),
+            (-29.77371, 0.764295),
+            (-119.662834, 70.537601),
+            (29.340396, 152.602825),
+        ],
+    ),
+    (
+        (8.8, 13.2, 8.8, 1.02, 0.97, -179.0, -120.0, 3.0, 0.0, 300.0),
+        [
+            (198.196976, 9.211014),
+            (-218.697835, 36.234083),
+            (-360.720384, 478.762928),
+            (376.56373, 403.894273),
+        ],
+    ),
+    (
+        (12.29, 17.3, 13.0, 1.0, 1.0, 95.5, -30.0, 0.0, 0.0, 55.5),
+        [
+            (1.260746, 34.592467),
+            (-5.362971, -34.197467),
+            (-94.20104, -56.162245),
+            (-81.75404, 73.104792),
+        ],
+    ),
+]
+
+
+def test_footprint_offsets_match_reference():
+    """The vectorized float64 engine agrees with the mpmath implementation to the millimetre."""
+    from camera2geo.utils.footprint import footprint_offsets
+
+    params = np.array([case for case, _ in FOOTPRINT_CASES])
+    expected = np.array([corners for _, corners in FOOTPRINT_CASES])
+    focal, sensor_w, sensor_h, fov_w, fov_h, yaw, pitch, roll, declination, altitude = (
+        params.T
+    )
+
+    offsets = footprint_offsets(
+        focal, sensor_w, sensor_h, yaw, pitch, roll, altitude, fov_w, fov_h, declination
+    )
+
+    assert offsets.shape == (len(FOOTPRINT_CASES), 4, 2)
+    np.testing.assert_allclose(offsets, expected, rtol=0, atol=1e-3)
+
+
+def test_camera_models_are_shared_per_drone_hash():
+    """Images of one camera share a single ray template; unknown cameras are not cached."""
+    from camera2geo.utils.footprint import camera_models, camera_rays, fov_dimensions
+
+    models = camera_models([7, 7, 0, 7], 13.2, 8.8, [10.26, 10.26, 4.5, 10.26])
+    assert models[0] is models[1] is models[3]
+    assert models[2] is not models[0]
+    assert camera_models(7, 13.2, 8.8, 10.26)[0] is models[0]
+
+    fov_w, fov_h = fov_dimensions(13.2, 8.8, 10.26)
+    assert models[0].fov_w == float(fov_w)
+    np.testing.assert_array_equal(models[0].rays, camera_rays(fov_w, fov_h)[0])
+    assert not models[0].rays.flags.writeable
+
+
+def test_edge_sampled_rays_follow_terrain():
+    """Edge rays are intersected with a surface in one pass and land on it."""
+    from camera2geo.utils.footprint import (
+        camera_rays,
+        edge_rays,
+        fov_dimensions,
+        ground_intersections,
+        orientation_radians,
+        rotate_rays,
+        terrain_intersections,
+    )
+
+    fov_w, fov_h = fov_dimensions(13.2, 8.8, 10.26)
+    np.testing.assert_array_equal(edge_rays(fov_w, fov_h, 1), camera_rays(fov_w, fov_h))
+
+    angles = orientation_radians([-86.1, 10.0], [-89.9, -50.0], [0.0, 3.0])
+    rays = rotate_rays(np.repeat(edge_rays(fov_w, fov_h, 8), 2, axis=0), angles)
+    altitude = np.array([74.9, 60.0])
+    assert rays.shape == (2, 32, 3)
+
+    flat = terrain_intersections(rays, altitude, lambda xy: np.zeros(xy.shape[:2]))
+    np.testing.assert_allclose(flat, ground_intersections(rays, altitude), atol=1e-9)
+
+    def hill(xy):
+        return 30 * np.exp(-((xy[..., 0] - 20) ** 2 + xy[..., 1] ** 2) / 400)
+
+    points = terrain_intersections(rays, altitude, hill)
+    distance = np.linalg.norm(points, axis=-1) / np.linalg.norm(rays[..., :2], axis=-1)
+    height = altitude[:, None] + rays[..., 2] * distance
+    np.testing.assert_allclose(height, hill(points), atol=1e-6)
+
+
+def test_camera2geo_with_local_dsm(test_image, tmp_path):
+    """A local DSM is sampled through the shared windowed reader."""
+    import rasterio
+    from rasterio.transform import from_origin
+    from camera2geo.utils.elevation import get_dsm_reader
+    from camera2geo.utils.geospatial import gps_to_utm
+
+    x, y, _, _ = gps_to_utm(19.5134089444444, -154.857994916667)
+    dsm_path = tmp_path / "dsm.tif"
+    with rasterio.open(
+        dsm_path,
+        "w",
+        driver="GTiff",
+        width=400,
+        height=400,
+        count=1,
+        dtype="float32",
+        crs="EPSG:32605",
+        transform=from_origin(x - 200, y + 200, 1.0, 1.0),
+    ) as dst:
+        dst.write(np.full((1, 400, 400), 100, dtype="float32"))
+
+    reader = get_dsm_reader(str(dsm_path))
+    assert reader is get_dsm_reader(str(dsm_path))
+    assert reader.sample([x], [y])[0] == pytest.approx(100)
+
+    results = list(
+        camera2geo_iter(
+            input_images=str(test_image),
+            output_images=str(tmp_path / "$_Geo.tif"),
+            elevation_data=str(dsm_path),
+        )
+    )
+
+    assert results[0].error is None
+    assert len(results[0].footprint) == 4
+
+    # Dense footprints sample 8 points per edge on the DSM
+    results = list(
+        camera2geo_iter(
+            input_images=str(test_image),
+            output_images=str(tmp_path / "$_Geo.tif"),
+            elevation_data=str(dsm_path),
+            footprint_samples=8,
+        )
+    )
+    assert results[0].error is None
+    assert len(results[0].footprint) == 32
+
+
+@pytest.fixture
+def elevation_service():
+    """Local Open-Elevation compatible stub answering 100 m everywhere."""
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    service = type("Service", (), {"requests": [], "failures": 0})()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            service.requests.append(body["locations"])
+            if service.failures:
+                service.failures -= 1
+                self.send_response(503)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            payload = json.dumps(
+                {"results": [{**loc, "elevation": 100} for loc in body["locations"]]}
+            ).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    service.url = f"http://127.0.0.1:{server.server_port}/api/v1/lookup"
+    yield service
+    server.shutdown()
+
+
+def test_elevation_client_batches_and_retries(test_image, tmp_path, elevation_service):
+    """Online lookups are deduplicated, sent in bulk and retried on errors."""
+    from camera2geo.utils.elevation_client import ElevationClient
+
+    elevation_service.failures = 1
+    client = ElevationClient(
+        elevation_service.url, batch_size=2, max_concurrency=1, backoff_seconds=0.01
+    )
+    points = [(19.5, -154.8), (19.6, -154.8), (19.5, -154.8), (19.7, -154.8)]
+    assert client.lookup(points) == [100.0] * 4
+    # The first batch fails once, then both batches of distinct points succeed
+    assert [len(batch) for batch in elevation_service.requests] == [2, 2, 1]
+    client.lookup(points)
+    assert client.requests_sent == 3
+    client.close()
+
+    results = list(
+        camera2geo_iter(
+            input_images=str(test_image),
+            output_images=str(tmp_path / "$_Geo.tif"),
+            elevation_data=True,
+            elevation_url=elevation_service.url,
+            elevation_cache=False,
+        )
+    )
+
+    assert results[0].error is None
+    assert len(results[0].footprint) == 4
+    assert results[0].timings["elevation"] > 0
+
+
+def test_elevation_client_forgets_failures(elevation_service):
+    """Failed points are not memoized and are tried again after a reset."""
+    from camera2geo.utils.elevation_client import ElevationClient
+
+    elevation_service.failures = 2
+    client = ElevationClient(
+        elevation_service.url, max_attempts=2, backoff_seconds=0.01, memo_entries=2
+    )
+    points = [(19.5, -154.8), (19.6, -154.8)]
+    with pytest.warns(UserWarning, match="failed for 2 points"):
+        assert client.lookup(points) == [None, None]
+    # Failed points are not asked for again during the same run
+    assert client.lookup(points) == [None, None]
+    assert client.requests_sent == 2
+
+    client.reset_failures()
+    assert client.lookup(points) == [100.0, 100.0]
+    assert client.lookup(points) == [100.0, 100.0]
+    assert client.requests_sent == 3
+
+    # The memo keeps only the most recently used points
+    assert client.lookup([(19.7, -154.8)]) == [100.0]
+    assert client.lookup(points[1:]) == [100.0]
+    assert client.requests_sent == 4
+    assert client.lookup(points[:1]) == [100.0]
+    assert client.requests_sent == 5
+    client.close()
+
+
+def test_warm_elevation_cache(test_image, tmp_path, elevation_service):
+    """A warmed cache answers later runs without network requests."""
+    from camera2geo.utils.elevation_cache import ElevationCache
+
+    # Box around the flat-ground footprint with room for the online altitude
+    footprint = np.array(
+        next(
+            camera2geo_iter(
+                input_images=str(test_image),
+                output_images=str(tmp_path / "plane" / "$_Geo.tif"),
+            )
+        ).footprint
+    )
+    bbox = [*(footprint.min(axis=0) - 0.0005), *(footprint.max(axis=0) + 0.0005)]
+
+    cache_path = tmp_path / "elevation.sqlite"
+    stats = warm_elevation_cache(
+        bbox, elevation_url=elevation_service.url, elevation_cache=str(cache_path)
+    )
+    assert stats["points"] == stats["misses"] == stats["entries"] > 0
+    stats_again = warm_elevation_cache(
+        bbox, elevation_url=elevation_service.url, elevation_cache=str(cache_path)
+    )
+    assert stats_again["hits"] == stats["points"]
+
+    sent = len(elevation_service.requests)
+    results = list(
+        camera2geo_iter(
+            input_images=str(test_image),
+            output_images=str(tmp_path / "$_Geo.tif"),
+            elevation_data=True,
+            elevation_url=elevation_service.url,
+            elevation_cache=str(cache_path),
+        )
+    )
+    assert results[0].error is None
+    assert len(elevation_service.requests) == sent
+
+    cache = ElevationCache(str(tmp_path / "small.sqlite"), max_entries=2)
+    cache.put_many("service", {(1.0, 1.0): 1.0, (2.0, 2.0): 2.0})
+    cache.get_many("service", [(1.0, 1.0)])
+    cache.put_many("service", {(3.0, 3.0): 3.0})
+    assert cache.get_many("service", [(1.0, 1.0), (2.0, 2.0), (3.0, 3.0)]) == {
+        (1.0, 1.0): 1.0,
+        (3.0, 3.0): 3.0,
+    }
+
+
+def test_transformer_cache_is_shared_across_threads():
+    """Transformers are built once per CRS pair and give identical results from threads."""
+    from concurrent.futures import ThreadPoolExecutor
+    from camera2geo.utils.geospatial import get_transformer, gps_to_utm
+
+    assert get_transformer(4326, 32605) is get_transformer(4326, 32605)
+
+    points = [(19.5 + i * 1e-4, -154.85 - i * 1e-4) for i in range(200)]
+    serial = [gps_to_utm(lat, lon) for lat, lon in points]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        threaded = list(pool.map(lambda p: gps_to_utm(*p), points))
+
+    assert threaded == serial
+
+
+def test_footprints_are_reentrant_across_threads():
+    """Thousands of footprints computed on a thread pool match a serial run exactly."""
+    from concurrent.futures import ThreadPoolExecutor
+    from camera2geo.utils.fov import FOVCalculator
+    from camera2geo.utils.metadata import FlightTable, RunSettings
+    from camera2geo.utils.sensors import DEFAULT_SENSOR_INFO_CSV, load_sensor_database
+
+    rng = np.random.default_rng(0)
+    metadata = [
+        {
+            "EXIF:GPSLatitude": 19.5 + rng.uniform(-0.5, 0.5),
+            "EXIF:GPSLongitude": -154.8 + rng.uniform(-0.5, 0.5),
+            "EXIF:FocalLength": 10.26,
+            "EXIF:FocalLengthIn35mmFormat": 24,
+            "XMP:RelativeAltitude": rng.uniform(30, 120),
+            "XMP:AbsoluteAltitude": 500.0,
+            "XMP:GimbalYawDegree": rng.uniform(-180, 180),
+            "XMP:GimbalPitchDegree": rng.uniform(-90, -45),
+            "XMP:GimbalRollDegree": 0.0,
+            "EXIF:ImageWidth": 5472,
+            "EXIF:ImageHeight": 3648,
+            "EXIF:DateTimeOriginal": "2024:05:01 10:00:00",
+            "EXIF:Model": "FC6310",
+        }
+        for _ in range(2000)
+    ]
+    table = FlightTable.from_metadata(
+        metadata,
+        load_sensor_database(DEFAULT_SENSOR_INFO_CSV),
+        RunSettings(epsg=4326, correct_magnetic_declination=True),
+    )
+
+    def footprint(index):
+        image = table.image(index)
+        coords, polygon = FOVCalculator(image).get_fov_bbox(image)
+        return repr((coords, polygon, image.center_distance))
+
+    serial = [footprint(i) for i in range(len(table))]
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        threaded = list(pool.map(footprint, range(len(table))))
+
+    assert threaded == serial
+
+
+def test_lens_map_cache_reuses_fixed_point_maps():
+    """Undistortion maps are built once per camera setting and size, in CV_16SC2 format."""
+    from camera2geo.utils.lens import LensMapCache
+
+    cache = LensMapCache(cache_mb=1)
+    maps = cache.get("DJI", "FC6310", 8.8, 2.8, 75.0, 400, 300)
+    assert maps[0].dtype == np.int16 and maps[0].shape == (300, 400, 2)
+    assert maps[1].dtype == np.uint16
+
+    # Nearby focus distances share a bucket
+    assert cache.get("DJI", "FC6310", 8.8, 2.8, 76.0, 400, 300) is maps
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.get("Nobody", "Nothing", 8.8, 2.8, 75.0, 400, 300) is None
+
+    # The memory cap evicts least recently used maps
+    cache.get("DJI", "FC6310", 8.8, 2.8, 75.0, 800, 600)
+    assert len(cache) == 1
+
+
+def test_lens_map_cache_builds_once_across_threads():
+    """Concurrent requests for the same maps wait for a single build."""
+    from concurrent.futures import ThreadPoolExecutor
+    from camera2geo.utils.lens import LensMapCache
+
+    cache = LensMapCache()
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        maps = list(
+            pool.map(
+                lambda _: cache.get("DJI", "FC6310", 8.8, 2.8, 75.0, 800, 600),
+                range(8),
+            )
+        )
+    assert all(m is maps[0] for m in maps)
+    assert (cache.hits, cache.misses) == (7, 1)
+
+
+def test_fused_warp_composes_lens_and_footprint_maps(test_image, tmp_path):
+    """The single-resample engine maps output pixels to source pixels through the footprint and lens maps."""
+    import cv2
+    import rasterio
+    from affine import Affine
+    from camera2geo.utils.lens import LensMapCache
+    from camera2geo.utils.warp import grid_to_source, undistorted_to_source
+
+    # An axis-aligned footprint over a same-sized grid maps pixel centres to themselves
+    footprint = [(0, 300), (400, 300), (400, 0), (0, 0)]
+    map_x, map_y = grid_to_source(
+        footprint, 400, 300, Affine(1, 0, 0, 0, -1, 300), range(400), range(100, 110)
+    )
+    assert np.allclose(map_x, np.arange(400)[np.newaxis, :], atol=1e-3)
+    assert np.allclose(map_y, np.arange(100, 110)[:, np.newaxis], atol=1e-3)
+
+    cache = LensMapCache()
+    nodes = cache.nodes("DJI", "FC6310", 8.8, 2.8, 75.0, 400, 300)
+    maps = cache.get("DJI", "FC6310", 8.8, 2.8, 75.0, 400, 300)
+    map_x = np.float32([[-5, 0, 123.4, 399]])
+    map_y = np.float32([[10, 0, 77.7, 299]])
+    source_x, source_y = undistorted_to_source(nodes, map_x, map_y)
+    float_x, float_y = cv2.convertMaps(*maps, cv2.CV_32FC1)
+    expected_x = cv2.remap(float_x, map_x, map_y, cv2.INTER_LINEAR)
+    expected_y = cv2.remap(float_y, map_x, map_y, cv2.INTER_LINEAR)
+    assert source_x[0, 0] == source_y[0, 0] == -1
+    assert np.allclose(source_x[0, 1:], expected_x[0, 1:], atol=0.1)
+    assert np.allclose(source_y[0, 1:], expected_y[0, 1:], atol=0.1)
+
+    outputs = {}
+    for fused_warp in (False, True):
+        outputs[fused_warp] = camera2geo(
+            input_images=str(test_image),
+            output_images=str(tmp_path / str(fused_warp) / "$_Geo.tif"),
+            lens_correction=True,
+            fused_warp=fused_warp,
+        )[0]
+    with (
+        rasterio.open(outputs[False]) as chained,
+        rasterio.open(outputs[True]) as fused,
+    ):
+        assert fused.crs == chained.crs
+        assert fused.shape == chained.shape
+        assert np.allclose(fused.bounds, chained.bounds)
+        assert fused.nodata == 0
+
+
+@pytest.mark.parametrize("fused_warp", [False, True])
+def test_camera2geo_target_resolution(test_image, tmp_path, fused_warp):
+    """Outputs are rendered at the requested resolution in meters or GSD multiples."""
+    import rasterio
+    from camera2geo.utils.geospatial import metres_to_crs_units
+
+    by_meters = camera2geo(
+        input_images=str(test_image),
+        output_images=str(tmp_path / "meters" / "$_Geo.tif"),
+        resolution_m=0.05,
+        fused_warp=fused_warp,
+    )[0]
+    by_gsd = camera2geo(
+        input_images=str(test_image),
+        output_images=str(tmp_path / "gsd" / "$_Geo.tif"),
+        epsg=32605,
+        gsd_multiple=4,
+        fused_warp=fused_warp,
+    )[0]
+
+    with rasterio.open(by_meters) as ds:
+        left, bottom, right, top = ds.bounds
+        expected = metres_to_crs_units(
+            0.05, 4326, (left + right) / 2, (bottom + top) / 2
+        )
+        assert np.allclose(ds.res, expected, rtol=1e-3)
+    gsd = 13.2 * 74.9 / (10.26 * 5472)
+    with rasterio.open(by_gsd) as ds:
+        assert np.allclose(ds.res, (4 * gsd, 4 * gsd))
+
+    with pytest.raises(ValueError):
+        camera2geo(
+            input_images=str(test_image),
+            output_images=str(tmp_path / "$_Geo.tif"),
+            resolution_m=0.05,
+            gsd_multiple=4,
+        )
+
+
+def test_imread_reduced_scales_while_decoding(tmp_path):
+    """JPEGs are decoded at reduced size, and any remaining factor is applied by resampling."""
+    from camera2geo.utils.raster_utils import imread_reduced
+
+    path = tmp_path / "frame.jpg"
+    Image.new("RGB", (640, 480), (10, 20, 30)).save(path)
+    gray = tmp_path / "gray.jpg"
+    Image.new("L", (640, 480), 128).save(gray)
+
+    assert imread_reduced(str(path)).shape == (480, 640, 3)
+    assert imread_reduced(str(path), 2).shape == (240, 320, 3)
+    assert imread_reduced(str(path), 3).shape == (240, 320, 3)
+    assert imread_reduced(str(path), 16).shape == (30, 40, 3)
+    assert imread_reduced(str(gray), 4).shape == (120, 160)
+
+
+def test_camera2geo_preview_writes_png_with_world_file(test_image, tmp_path):
+    """Previews are written as georeferenced PNGs covering the same footprint."""
+    import rasterio
+
+    full = camera2geo(
+        input_images=str(test_image),
+        output_images=str(tmp_path / "full" / "$_Geo.tif"),
+    )[0]
+    preview = camera2geo(
+        input_images=str(test_image),
+        output_images=str(tmp_path / "preview" / "$_Geo.png"),
+        preview=8,
+    )[0]
+
+    assert Path(preview).with_suffix(".wld").exists()
+    with rasterio.open(full) as chained, rasterio.open(preview) as quick:
+        assert quick.driver == "PNG"
+        assert quick.crs == chained.crs
+        assert np.allclose(quick.bounds, chained.bounds)
+
+    with pytest.raises(ValueError):
+        camera2geo(
+            input_images=str(test_image),
+            output_images=str(tmp_path / "$_Geo.png"),
+            preview=3,
+        )
+
+
+def test_camera2geo_memory_budget_renders_tiles(test_image, tmp_path):
+    """Tiled rendering within a memory budget matches the one-pass fused warp."""
+    import rasterio
+
+    outputs = {}
+    for name, budget in (("fused", None), ("tiled", 4)):
+        outputs[name] = camera2geo(
+            input_images=str(test_image),
+            output_images=str(tmp_path / name / "$_Geo.tif"),
+            lens_correction=True,
+            fused_warp=True,
+            memory_budget_mb=budget,
+        )[0]
+
+    with (
+        rasterio.open(outputs["fused"]) as fused,
+        rasterio.open(outputs["tiled"]) as tiled,
+    ):
+        assert tiled.crs == fused.crs
+        assert tiled.shape == fused.shape
+        assert np.allclose(tiled.bounds, fused.bounds)
+        assert tiled.nodata == 0
+        assert tiled.profile["tiled"]
+        # GDAL and OpenCV decode JPEGs slightly differently, so compare coverage
+        # and overall brightness rather than single pixels
+        tiled_array, fused_array = tiled.read(), fused.read()
+        assert np.mean((tiled_array == 0).all(0) != (fused_array == 0).all(0)) < 0.01
+        assert abs(tiled_array.mean() - fused_array.mean()) < 1
+
+    with pytest.raises(ValueError):
+        camera2geo(
+            input_images=str(test_image),
+            output_images=str(tmp_path / "$_Geo.tif"),
+            image_equalize=True,
+            memory_budget_mb=64,
+        )
+
+
 def test_search_cameras_and_lenses():
     """Ensure that camera + lens lookup returns something at all."""
 
@@ -111,6 +804,207 @@ def test_read_metadata_focal_length(test_image):
     assert value == 10.26, f"Expected focal length 10.26, got {value}"
 
 
+def test_read_metadata_chunks_extracts_only_pipeline_tags(test_image):
+    from camera2geo.utils.exif import read_metadata_chunks
+    from camera2geo.utils.metadata import IMAGE_METADATA_KEYS
+
+    (md,) = read_metadata_chunks([str(test_image)], chunk_size=1)
+    assert set(md) <= {"SourceFile", *IMAGE_METADATA_KEYS}
+    assert md["EXIF:FocalLength"] == pytest.approx(10.26)
+
+
+def test_flight_table_rows_and_views(test_image):
+    import pickle
+    from camera2geo.utils.exif import read_metadata_chunks
+    from camera2geo.utils.metadata import FlightTable
+    from camera2geo.utils.sensors import DEFAULT_SENSOR_INFO_CSV, load_sensor_database
+
+    (md,) = read_metadata_chunks([str(test_image)], chunk_size=1)
+    sensors = load_sensor_database(DEFAULT_SENSOR_INFO_CSV)
+    table = FlightTable.from_metadata([md, {}, md], sensors)
+
+    assert len(table) == 3
+    assert table["latitude"].dtype == np.float64
+    assert table["image_width"].dtype == np.int64
+    assert isinstance(table.errors[1], TypeError)
+    with pytest.raises(TypeError):
+        table.image(1)
+
+    image = table.image(2)
+    assert image.focal_length == pytest.approx(10.26)
+    assert image.gsd == pytest.approx(
+        image.sensor_width
+        * image.relative_altitude
+        / (image.focal_length * image.image_width)
+    )
+    assert image.properties["GSD"] == image.gsd
+
+    # Worker processes receive only the image's own row
+    copy = pickle.loads(pickle.dumps(image))
+    assert len(copy.table) == 1
+    assert copy.properties == image.properties
+
+
+def test_sensor_database_lookups_and_merging(tmp_path):
+    from camera2geo.utils.sensors import (
+        DEFAULT_SENSOR_INFO_CSV,
+        SensorDatabase,
+        load_sensor_database,
+    )
+
+    extra = tmp_path / "extra.csv"
+    extra.write_text(
+        "DroneMake,DroneModel,CameraMake,SensorModel,RigCameraIndex,SensorWidth,SensorHeight,LensFOVw,LensFOVh\n"
+        "Acme,Hawk,Acme,AC-100,5,6.3,4.7,1.0,1.0\n"
+        "Acme,Broken,Acme,AC-200,5,wide,4.7,1.0,1.0\n"
+    )
+    with pytest.warns(UserWarning, match="line 3"):
+        sensors = load_sensor_database([DEFAULT_SENSOR_INFO_CSV, str(extra)])
+    assert load_sensor_database([DEFAULT_SENSOR_INFO_CSV, str(extra)]) is sensors
+
+    # Exact key, model only and normalized make/model aliases
+    assert sensors.lookup("FC6310", "5")[3] == "FC6310"
+    assert sensors.lookup("FC6310", "1")[3] == "FC6310"
+    assert sensors.lookup("Acme AC100", "5")[5] == 6.3
+    assert sensors.lookup("AC-200", "5") is None
+    assert sensors.default[3] == "default"
+
+    saved = tmp_path / "sensors.pkl"
+    sensors.save(saved)
+    assert load_sensor_database(str(saved)).entries == sensors.entries
+    assert isinstance(SensorDatabase.load(saved), SensorDatabase)
+
+
+def test_declination_service_matches_magnetismi(monkeypatch):
+    """Vectorized offline declinations match magnetismi and are memoized per grid cell."""
+    import datetime
+    import magnetismi.magnetismi as api
+    from camera2geo.utils.declination import DeclinationService, load_models
+
+    service = DeclinationService(load_models(), online=False)
+    evaluated = []
+    evaluate = service._evaluate
+
+    def counting_evaluate(cells):
+        evaluated.append(len(cells))
+        return evaluate(cells)
+
+    monkeypatch.setattr(service, "_evaluate", counting_evaluate)
+    lat = np.full(500, 19.5134)
+    lon = np.linspace(-154.858, -154.8579, 500)
+    dates = np.full(500, "2024-05-01T10:00:00", dtype="datetime64[s]")
+    values = service.declinations(lat, lon, np.full(500, 50.0), dates)
+
+    # Cells are evaluated at their centre
+    model = api.Model(2024)
+    expected = model.at(19.51, -154.86, 0.0, datetime.date(2024, 5, 1)).dec
+    assert np.allclose(values, expected, atol=1e-6)
+
+    # A nearby point in the same 0.01° cell is answered from the memo
+    nearby = service.declination(19.5131, -154.8581, 50.0, dates[0])
+    assert nearby == values[0]
+    assert evaluated == [1]
+
+    # Missing dates and dates without offline coefficients are NaN
+    dates = np.array(["NaT", "2001-01-01"], dtype="datetime64[s]")
+    missing = service.declinations([19.5, 19.5], [-154.8, -154.8], [0, 0], dates)
+    assert np.isnan(missing).all()
+
+
+def test_metadata_cache_skips_unchanged_images(test_image, tmp_path, monkeypatch):
+    import shutil
+    from camera2geo.utils import exif as exif_module
+    from camera2geo.utils.exif import read_metadata_chunks
+
+    image = tmp_path / "DJI_0001.JPG"
+    shutil.copy2(test_image, image)
+    cache = str(tmp_path / "metadata.sqlite")
+    (first,) = read_metadata_chunks([str(image)], cache_path=cache)
+    reported = read_metadata(str(image), metadata_cache=cache)
+
+    # A warm cache reads neither the file nor exiftool
+    def fail(*args, **kwargs):
+        raise AssertionError("metadata was read again")
+
+    with monkeypatch.context() as m:
+        m.setattr(exif_module, "read_jpeg_metadata", fail)
+        m.setattr(exiftool, "ExifToolHelper", fail)
+        (cached,) = read_metadata_chunks([str(image)], cache_path=cache)
+        assert read_metadata(str(image), metadata_cache=cache) == reported
+    assert cached == first
+
+    apply_metadata(str(image), {"EXIF:FocalLength": 12.0}, metadata_cache=cache)
+    (updated,) = read_metadata_chunks([str(image)], cache_path=cache)
+    assert updated["EXIF:FocalLength"] == pytest.approx(12.0)
+
+
+def test_read_jpeg_metadata_matches_exiftool_output(tmp_path):
+    """The in-process reader returns exiftool's -G -n keys and JSON values."""
+    from PIL.TiffImagePlugin import IFDRational
+    from camera2geo.utils.jpeg_metadata import read_jpeg_metadata
+
+    exif = Image.Exif()
+    exif[0x010F] = "DJI"
+    exif[0x0110] = "FC6310"
+    exif_ifd = exif.get_ifd(0x8769)
+    exif_ifd[0x9003] = "2025:10:10 13:53:58"
+    exif_ifd[0x920A] = IFDRational(1026, 100)
+    exif_ifd[0x9205] = IFDRational(297, 100)
+    exif_ifd[0xA405] = 28
+    exif_ifd[0xA002] = 5472
+    exif_ifd[0xA003] = 3648
+    gps = exif.get_ifd(0x8825)
+    gps[1], gps[2] = "N", (19.0, 30.0, IFDRational(48272, 1000))
+    gps[3], gps[4] = "W", (154.0, 51.0, IFDRational(28782, 1000))
+    gps[5], gps[6] = b"\x00", IFDRational(18195, 100)
+
+    xmp = (
+        b'<x:xmpmeta xmlns:x="adobe:ns:meta/"><rdf:RDF xmlns:rdf='
+        b'"http://www.w3.org/1999/02/22-rdf-syntax-ns#"><rdf:Description '
+        b'xmlns:drone-dji="http://www.dji.com/drone-dji/1.0/" '
+        b'drone-dji:AbsoluteAltitude="+181.95" drone-dji:RelativeAltitude="+74.90" '
+        b'drone-dji:GimbalRollDegree="+0.00" drone-dji:GimbalYawDegree="-86.10" '
+        b'drone-dji:GimbalPitchDegree="-89.90" drone-dji:FlightRollDegree="-4.30" '
+        b'drone-dji:FlightYawDegree="-77.80" drone-dji:FlightPitchDegree="-2.30"/>'
+        b"</rdf:RDF></x:xmpmeta>"
+    )
+    path = tmp_path / "DJI_0001.JPG"
+    Image.new("RGB", (8, 8)).save(path, exif=exif)
+    data = path.read_bytes()
+    segment = b"http://ns.adobe.com/xap/1.0/\x00" + xmp
+    app1 = b"\xff\xe1" + (len(segment) + 2).to_bytes(2, "big") + segment
+    path.write_bytes(data[:2] + app1 + data[2:])
+
+    md = read_jpeg_metadata(str(path))
+    assert md == {
+        "SourceFile": str(path),
+        "File:FileName": "DJI_0001.JPG",
+        "Composite:GPSLatitude": 19.5134088888889,
+        "EXIF:GPSLatitude": 19.5134088888889,
+        "Composite:GPSLongitude": -154.857995,
+        "EXIF:GPSLongitude": 154.857995,
+        "EXIF:FocalLength": 10.26,
+        "EXIF:FocalLengthIn35mmFormat": 28,
+        "XMP:RelativeAltitude": "+74.90",
+        "XMP:AbsoluteAltitude": "+181.95",
+        "Composite:GPSAltitude": 181.95,
+        "XMP:GimbalRollDegree": "+0.00",
+        "XMP:GimbalPitchDegree": -89.9,
+        "XMP:GimbalYawDegree": -86.1,
+        "XMP:FlightPitchDegree": -2.3,
+        "XMP:FlightRollDegree": -4.3,
+        "XMP:FlightYawDegree": -77.8,
+        "EXIF:ExifImageWidth": 5472,
+        "EXIF:ExifImageHeight": 3648,
+        "EXIF:MaxApertureValue": 2.79917173119039,
+        "EXIF:DateTimeOriginal": "2025:10:10 13:53:58",
+        "EXIF:Model": "FC6310",
+    }
+    # Files without EXIF are left to exiftool
+    Image.new("RGB", (8, 8)).save(tmp_path / "plain.jpg")
+    assert read_jpeg_metadata(str(tmp_path / "plain.jpg")) is None
+
+
 def test_apply_metadata_update_and_verify(test_image, tmp_path):
     """Change focal length, then re-read metadata to confirm update."""
     new_focal = 12.5